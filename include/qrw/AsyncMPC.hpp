@@ -0,0 +1,202 @@
+///////////////////////////////////////////////////////////////////////////////////////////////////
+///
+/// \brief This is the header for AsyncMPC class
+///
+/// \details Runs the OSQP MPC in a background thread. Inputs are sent to the thread and results
+///          are retrieved from it through lock-free single-slot mailboxes so that the control loop
+///          never waits for the solver
+///
+//////////////////////////////////////////////////////////////////////////////////////////////////
+
+#ifndef ASYNCMPC_H_INCLUDED
+#define ASYNCMPC_H_INCLUDED
+
+#include <atomic>
+#include <chrono>
+#include <condition_variable>
+#include <mutex>
+#include <thread>
+
+#include "qrw/MPC.hpp"
+#include "qrw/Params.hpp"
+#include "qrw/Types.h"
+
+////////////////////////////////////////////////////////////////////////////////////////////////
+///
+/// \brief Single producer / single consumer mailbox holding the latest value only. The producer
+///        fills back() then publishes it, the consumer grabs the latest published value with
+///        update() then reads front(). Publishing never blocks and overwrites an unread value.
+///
+////////////////////////////////////////////////////////////////////////////////////////////////
+template <typename T>
+class Mailbox
+{
+public:
+    Mailbox() : middle_(1), back_(0), front_(2) {}
+
+    T& back() { return buffers_[back_]; }    ///< Slot owned by the producer
+    T& front() { return buffers_[front_]; }  ///< Slot owned by the consumer
+    T const& front() const { return buffers_[front_]; }
+
+    ////////////////////////////////////////////////////////////////////////////////////////////////
+    ///
+    /// \brief Publish the content of back() (producer side)
+    ///
+    ////////////////////////////////////////////////////////////////////////////////////////////////
+    void publish() { back_ = middle_.exchange(back_ | FRESH) & INDEX; }
+
+    ////////////////////////////////////////////////////////////////////////////////////////////////
+    ///
+    /// \brief Swap front() with the latest published value if there is one (consumer side)
+    ///
+    /// \retval true if front() now holds a value that has not been read yet
+    ///
+    ////////////////////////////////////////////////////////////////////////////////////////////////
+    bool update()
+    {
+        if (!(middle_.load() & FRESH)) return false;
+        front_ = middle_.exchange(front_) & INDEX;
+        return true;
+    }
+
+    bool fresh() const { return middle_.load() & FRESH; }  ///< True if a value is waiting to be read
+
+private:
+    static const int INDEX = 3;  // Bits storing the index of the middle slot
+    static const int FRESH = 4;  // Bit set when the middle slot holds an unread value
+
+    T buffers_[3];
+    std::atomic<int> middle_;  // Index of the slot exchanged between both sides, with the FRESH bit
+    int back_;                 // Index of the slot written by the producer
+    int front_;                // Index of the slot read by the consumer
+};
+
+class AsyncMPC
+{
+public:
+    ////////////////////////////////////////////////////////////////////////////////////////////////
+    ///
+    /// \brief Constructor, creates the MPC and starts the background thread
+    ///
+    /// \param[in] params Object that stores parameters, must outlive the AsyncMPC
+    ///
+    ////////////////////////////////////////////////////////////////////////////////////////////////
+    AsyncMPC(Params& params);
+
+    ////////////////////////////////////////////////////////////////////////////////////////////////
+    ///
+    /// \brief Destructor, stops the background thread
+    ///
+    ////////////////////////////////////////////////////////////////////////////////////////////////
+    ~AsyncMPC();
+
+    ////////////////////////////////////////////////////////////////////////////////////////////////
+    ///
+    /// \brief Send new inputs to the background thread and wake it up. If the thread is still busy
+    ///        with a previous problem, only the latest inputs will be solved
+    ///
+    /// \param[in] num_iter Number of MPC iterations since the start
+    /// \param[in] xref Desired state vector for the whole prediction horizon (12 x (n_steps+1))
+    /// \param[in] fsteps Desired position of each foot for each step of the horizon (N_gait x 12)
+    ///
+    ////////////////////////////////////////////////////////////////////////////////////////////////
+    void solve(int num_iter, MatrixN const& xref, MatrixN const& fsteps);
+
+    ////////////////////////////////////////////////////////////////////////////////////////////////
+    ///
+    /// \brief Return the latest result of the MPC (predicted trajectory and forces to apply). If
+    ///        no new result is available, the previous one is returned again
+    ///
+    ////////////////////////////////////////////////////////////////////////////////////////////////
+    MatrixN get_latest_result();
+
+    ////////////////////////////////////////////////////////////////////////////////////////////////
+    ///
+    /// \brief Return the number of MPC iterations of the inputs the latest result has been computed
+    ///        for (the result retrieved by the last call to get_latest_result)
+    ///
+    ////////////////////////////////////////////////////////////////////////////////////////////////
+    int get_latest_iteration() const { return results_.front().num_iter; }
+
+    ////////////////////////////////////////////////////////////////////////////////////////////////
+    ///
+    /// \brief Return the statistics of the solver for the latest result (the result retrieved by
+    ///        the last call to get_latest_result)
+    ///
+    ////////////////////////////////////////////////////////////////////////////////////////////////
+    OsqpStats const& get_latest_stats() const { return results_.front().stats; }
+
+    ////////////////////////////////////////////////////////////////////////////////////////////////
+    ///
+    /// \brief Stop and join the background thread (called by the destructor)
+    ///
+    ////////////////////////////////////////////////////////////////////////////////////////////////
+    void stop();
+
+    ////////////////////////////////////////////////////////////////////////////////////////////////
+    ///
+    /// \brief Pin the background thread to a single CPU core
+    ///
+    /// \param[in] cpu Index of the CPU core
+    ///
+    /// \retval true if the affinity of the thread has been changed
+    ///
+    ////////////////////////////////////////////////////////////////////////////////////////////////
+    bool set_cpu_affinity(int cpu);
+
+    bool result_ready() const { return results_.fresh(); }  ///< True if a result has not been retrieved yet
+
+    ////////////////////////////////////////////////////////////////////////////////////////////////
+    ///
+    /// \brief Return the delay [s] between the last call to solve() whose inputs have been solved
+    ///        and the wake up of the background thread
+    ///
+    ////////////////////////////////////////////////////////////////////////////////////////////////
+    double get_handoff_latency() const { return handoff_latency_.load(); }
+
+    ////////////////////////////////////////////////////////////////////////////////////////////////
+    ///
+    /// \brief Return the maximum delay [s] between a call to solve() and the wake up of the
+    ///        background thread since the start
+    ///
+    ////////////////////////////////////////////////////////////////////////////////////////////////
+    double get_handoff_latency_max() const { return handoff_latency_max_.load(); }
+
+private:
+    ////////////////////////////////////////////////////////////////////////////////////////////////
+    ///
+    /// \brief Loop of the background thread, sleeps until new inputs are available then solves
+    ///
+    ////////////////////////////////////////////////////////////////////////////////////////////////
+    void loop();
+
+    struct Inputs
+    {
+        int num_iter;
+        MatrixN xref;
+        MatrixN fsteps;
+        std::chrono::steady_clock::time_point t_dispatch;  // Time at which the inputs have been sent
+    };
+
+    struct Result
+    {
+        int num_iter;
+        MatrixN x_f;
+        OsqpStats stats;
+    };
+
+    MPC mpc_;  ///< OSQP MPC, only used by the background thread
+
+    Mailbox<Inputs> inputs_;    ///< From the control loop to the background thread
+    Mailbox<Result> results_;   ///< From the background thread to the control loop
+
+    std::atomic<bool> running_;   ///< Cleared to stop the background thread
+    std::atomic<double> handoff_latency_;      ///< Delay between the last dispatch and the wake up [s]
+    std::atomic<double> handoff_latency_max_;  ///< Maximum delay since the start [s]
+    bool first_;                  ///< True until the first problem has been solved
+    std::mutex mutex_;            ///< Only used to sleep on the condition variable
+    std::condition_variable cv_;  ///< Wakes up the background thread
+    std::thread thread_;          ///< Background thread running the MPC
+};
+
+#endif  // ASYNCMPC_H_INCLUDED
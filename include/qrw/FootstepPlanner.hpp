@@ -64,6 +64,14 @@ public:
     MatrixN updateFootsteps(bool refresh, int k, VectorN const& q, Vector6 const& b_v, Vector6 const& b_vref);
 
     MatrixN getFootsteps();
+
+    ////////////////////////////////////////////////////////////////////////////////////////////////
+    ///
+    /// \brief Return the footsteps sampled on the nodes of the prediction horizon of the MPC, the
+    ///        footsteps of each node are the ones of the time step at which the node starts
+    ///
+    ////////////////////////////////////////////////////////////////////////////////////////////////
+    MatrixN getMpcFootsteps();
     MatrixN getTargetFootsteps();
     MatrixN getRz();
 
@@ -86,6 +86,15 @@ public:
     ////////////////////////////////////////////////////////////////////////////////////////////////
     bool setGait(MatrixN const& gaitMatrix);
 
+    ////////////////////////////////////////////////////////////////////////////////////////////////
+    ///
+    /// \brief Return the current gait sampled on the nodes of the prediction horizon of the MPC,
+    ///        the contact state of each node is the one of the time step at which the node starts
+    ///
+    ////////////////////////////////////////////////////////////////////////////////////////////////
+    MatrixN getMpcGait();
+
+    std::vector<int> const& getMpcRows() { return mpcRows_; }
     MatrixN getPastGait() { return pastGait_; }
     MatrixN getCurrentGait() { return currentGait_; }
     double getCurrentGaitCoeff(int i, int j) { return currentGait_(i, j); }
@@ -147,6 +156,7 @@ private:
     double T_gait_;  // Gait period
     double T_mpc_;   // MPC period (prediction horizon)
     int n_steps_;        // Number of time steps in the prediction horizon
+    std::vector<int> mpcRows_;  // Row of the gait matrix at which each node of the MPC starts
 
     double remainingTime_;
 
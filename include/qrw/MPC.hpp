@@ -7,10 +7,15 @@
 #include <cmath>
 #include <limits>
 #include <vector>
+#include <chrono>
+#include <memory>
+#include <thread>
 #include <Eigen/Core>
 #include <Eigen/Dense>
 #include "osqp.h"
 #include "other/st_to_cc.hpp"
+#include "qrw/OsqpMemory.hpp"
+#include "qrw/OsqpStats.hpp"
 #include "qrw/Params.hpp"
 
 typedef Eigen::MatrixXd matXd;
@@ -30,6 +35,13 @@ class MPC {
   Eigen::Matrix<double, 12, 1> g = Eigen::Matrix<double, 12, 1>::Zero();
   Eigen::Matrix<double, 3, 1> offset_CoM = Eigen::Matrix<double, 3, 1>::Zero();
 
+  // Nodes of the prediction horizon, fine near the present and possibly coarser towards its end
+  Eigen::Matrix<double, Eigen::Dynamic, 1> dts;      // Duration of each node [s]
+  Eigen::Matrix<int, Eigen::Dynamic, 1> node_start;  // Number of time steps dt before the start of each node
+  double dt_AB;                                      // Duration for which A, g and B are currently set [s]
+  int set_node_duration(int k);
+  int shifted_node(int i, int shift);
+
   Eigen::Matrix<double, 12, 12> A = Eigen::Matrix<double, 12, 12>::Identity();
   Eigen::Matrix<double, 12, 12> B = Eigen::Matrix<double, 12, 12>::Zero();
   Eigen::Matrix<double, 12, 1> x0 = Eigen::Matrix<double, 12, 1>::Zero();
@@ -37,12 +49,12 @@ class MPC {
   Eigen::MatrixXd x_f_applied;
 
   // Matrix ML
-  const static int size_nz_ML = 5000;
+  int size_nz_ML;  // Number of non-zero coefficients of ML in the sparse formulation
   // int r_ML [size_nz_ML] = {}; // row indexes of non-zero values in matrix ML
   // int c_ML [size_nz_ML] = {}; // col indexes of non-zero values in matrix ML
   // double v_ML [size_nz_ML] = {};  // non-zero values in matrix ML
   // csc* ML_triplet; // Compressed Sparse Column matrix (triplet format)
-  csc *ML;  // Compressed Sparse Column matrix
+  CscPtr ML;  // Compressed Sparse Column matrix
   inline void add_to_ML(int i, int j, double v, int *r_ML, int *c_ML,
                         double *v_ML);                                            // function to fill the triplet r/c/v
   inline void add_to_P(int i, int j, double v, int *r_P, int *c_P, double *v_P);  // function to fill the triplet r/c/v
@@ -53,27 +65,61 @@ class MPC {
   int i_update_B[12 * 4] = {};
   // TODO FOR S ????
 
-  // Matrix NK
-  const static int size_nz_NK = 5000;
-  double v_NK_up[size_nz_NK] = {};   // maxtrix NK (upper bound)
-  double v_NK_low[size_nz_NK] = {};  // maxtrix NK (lower bound)
-  double v_warmxf[size_nz_NK] = {};  // maxtrix NK (lower bound)
+  // Matrix NK, sized for the number of constraints of the formulation
+  std::vector<double> v_NK_up;   // maxtrix NK (upper bound)
+  std::vector<double> v_NK_low;  // maxtrix NK (lower bound)
+  std::vector<double> v_warmxf;  // initial guess of the solver, sized for the number of variables
 
   // Matrix P
-  const static int size_nz_P = 5000;
+  int size_nz_P;  // Number of non-zero coefficients of P in the sparse formulation
   // c_int r_P [size_nz_P] = {}; // row indexes of non-zero values in matrix ML
   // c_int c_P [size_nz_P] = {}; // col indexes of non-zero values in matrix ML
   // c_float v_P [size_nz_P] = {};  // non-zero values in matrix ML
-  csc *P;  // Compressed Sparse Column matrix
-
-  // Matrix Q
-  const static int size_nz_Q = 5000;
-  double Q[size_nz_Q] = {};  // Q is full of zeros
-
-  // OSQP solver variables
-  OSQPWorkspace *workspce = new OSQPWorkspace();
-  OSQPData *data;
-  OSQPSettings *settings = (OSQPSettings *)c_malloc(sizeof(OSQPSettings));
+  CscPtr P;  // Compressed Sparse Column matrix
+
+  // Matrix Q, sized for the number of variables of the formulation
+  std::vector<double> Q;  // Q is full of zeros
+
+  // OSQP solver variables, released when the MPC is destroyed
+  OsqpWorkspacePtr workspce;  // Created by osqp_setup during the first iteration
+  OsqpDataPtr data;
+  OsqpSettingsPtr settings = OsqpSettingsPtr((OSQPSettings *)c_malloc(sizeof(OSQPSettings)));
+
+  // Condensed formulation: states are eliminated through the dynamics and only forces are optimized
+  // P holds the dense upper triangular part of the Hessian, ML the friction cones and Q the linear cost
+  bool condensed;
+  Eigen::MatrixXd B_cond;  // Lower half of the B matrix of each time step (6 x 12*n_steps)
+  Eigen::MatrixXd H_cond;  // Hessian of the cost with respect to forces (12*n_steps x 12*n_steps)
+  Eigen::Matrix<double, Eigen::Dynamic, 1> d_cond;  // Predicted states without forces minus reference
+  Eigen::Matrix<double, Eigen::Dynamic, 1> q_cond;  // Linear part of the cost with respect to forces
+  Eigen::Matrix<double, Eigen::Dynamic, 1> t_cond;   // Time at the end of each node
+  Eigen::Matrix<double, Eigen::Dynamic, 1> s1_cond;  // Sum of t_k-t_j over the nodes k >= j
+  Eigen::Matrix<double, Eigen::Dynamic, 1> s2_cond;  // Sum of (t_k-t_j)^2 over the nodes k >= j
+
+  // Duration of the creation/update of the matrices and of the solver for the latest iteration [s]
+  double duration_matrices, duration_solver;
+  OsqpStats stats;  // Statistics of the solver for the latest iteration
+
+  // Warm start of the solver with the previous solution shifted by the number of elapsed time steps
+  bool warm_start;
+  int num_iter_prev;  // MPC iteration (not loop iteration) of the previous solution, one node per iteration
+  Eigen::Matrix<int, Eigen::Dynamic, 1> S_gait_prev;  // Contact state of feet for the previous solution
+  Eigen::Matrix<double, Eigen::Dynamic, 1> y_prev;    // Dual variables of the previous solution
+  Eigen::Matrix<double, Eigen::Dynamic, 1> warmy;     // Initial guess for dual variables
+
+  // Wall-clock budget of each solve, update of the matrices included
+  double time_budget;     // Budget [s] (negative for no limit)
+  int timeout_fallback;   // Result on timeout (0: truncated solution, 1: previous solution shifted in time)
+  bool timed_out;         // True if the solver ran out of time during the latest iteration
+  int num_timeouts;       // Number of iterations during which the solver ran out of time
+  double time_per_iter;   // Duration of one iteration of the solver during the previous solve [s]
+  std::chrono::steady_clock::time_point t_start;  // Start of the latest iteration
+
+  // Values used by the latest update of ML, to only patch the coefficients that changed
+  Eigen::Matrix<double, 3, 3> gI_inv;   // Inverse of the inertia matrix in base frame
+  Eigen::Matrix<double, 3, 3> I_inv;    // Inverse of the inertia matrix for yaw_I_inv
+  double yaw_I_inv;                     // Yaw angle of I_inv
+  Eigen::Matrix<double, 4, Eigen::Dynamic> keys_ML;  // Lever arm and yaw angle of each foot for each time step
 
   // Matrices whose size depends on the arguments sent to the constructor function
   Eigen::Matrix<double, 12, Eigen::Dynamic> xref;
@@ -89,6 +135,10 @@ class MPC {
   MPC();
   MPC(Params& params);
 
+  // The MPC owns the memory of its solver, it can be moved but not copied
+  MPC(MPC&&) = default;
+  MPC& operator=(MPC&&) = default;
+
   int create_matrices();
   int create_ML();
   int create_NK();
@@ -96,10 +146,21 @@ class MPC {
   int update_matrices(Eigen::MatrixXd fsteps);
   int update_ML(Eigen::MatrixXd fsteps);
   int update_NK();
+  int create_condensed(const Eigen::MatrixXd &fsteps);
+  int update_condensed(const Eigen::MatrixXd &fsteps);
+  int update_B_condensed(const Eigen::MatrixXd &fsteps);
+  int update_cost_condensed();
+  int update_bounds_condensed();
+  int construct_warm_start(int shift);
+  int shift_previous_solution(int shift);
+  int limit_solver_time();
   int call_solver(int);
   int retrieve_result();
   double *get_x_next();
   int run(int num_iter, const Eigen::MatrixXd &xref_in, const Eigen::MatrixXd &fsteps_in);
+  Eigen::MatrixXd run_batch(const Eigen::MatrixXd &xrefs, const Eigen::MatrixXd &fsteps, int n_threads = 0);
+  Eigen::MatrixXd propagate_state(const Eigen::MatrixXd &x_in, const Eigen::MatrixXd &f_in,
+                                  const Eigen::MatrixXd &fsteps_in, double duration);
 
   Eigen::Matrix<double, 3, 3> getSkew(Eigen::Matrix<double, 3, 1> v);
   int construct_S();
@@ -109,6 +170,10 @@ class MPC {
   Eigen::MatrixXd get_latest_result();
   Eigen::MatrixXd get_gait();
   Eigen::MatrixXd get_Sgait();
+  Eigen::MatrixXd get_durations();
+  int get_iterations() { return stats.iter; }
+  OsqpStats const& get_stats() { return stats; }
+  int get_timeouts() { return num_timeouts; }
 
 
   // Utils
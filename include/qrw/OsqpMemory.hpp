@@ -0,0 +1,60 @@
+///////////////////////////////////////////////////////////////////////////////////////////////////
+///
+/// \brief This is the header for the owning pointers of OSQP objects
+///
+/// \details Objects allocated for or by the OSQP solver (workspace, settings, problem data and
+///          matrices in CSC format) are held in std::unique_ptr with deleters that release them
+///          with the OSQP functions, so that solvers free their memory when destroyed and can be
+///          moved but not copied
+///
+//////////////////////////////////////////////////////////////////////////////////////////////////
+
+#ifndef OSQPMEMORY_H_INCLUDED
+#define OSQPMEMORY_H_INCLUDED
+
+#include <memory>
+#include "osqp.h"
+
+////////////////////////////////////////////////////////////////////////////////////////////////
+///
+/// \brief Release a workspace created by osqp_setup, with its internal copy of the problem
+///
+////////////////////////////////////////////////////////////////////////////////////////////////
+struct OsqpWorkspaceDeleter
+{
+    void operator()(OSQPWorkspace* work) const { osqp_cleanup(work); }
+};
+
+////////////////////////////////////////////////////////////////////////////////////////////////
+///
+/// \brief Release a matrix in CSC format whose arrays have been allocated with malloc or c_malloc
+///
+////////////////////////////////////////////////////////////////////////////////////////////////
+struct CscDeleter
+{
+    void operator()(csc* M) const
+    {
+        c_free(M->p);
+        c_free(M->i);
+        c_free(M->x);
+        c_free(M);
+    }
+};
+
+////////////////////////////////////////////////////////////////////////////////////////////////
+///
+/// \brief Release a structure allocated with c_malloc (settings, problem data), the arrays it
+///        points to are owned elsewhere
+///
+////////////////////////////////////////////////////////////////////////////////////////////////
+struct CFreeDeleter
+{
+    void operator()(void* ptr) const { c_free(ptr); }
+};
+
+typedef std::unique_ptr<OSQPWorkspace, OsqpWorkspaceDeleter> OsqpWorkspacePtr;
+typedef std::unique_ptr<csc, CscDeleter> CscPtr;
+typedef std::unique_ptr<OSQPData, CFreeDeleter> OsqpDataPtr;
+typedef std::unique_ptr<OSQPSettings, CFreeDeleter> OsqpSettingsPtr;
+
+#endif  // OSQPMEMORY_H_INCLUDED
@@ -0,0 +1,87 @@
+///////////////////////////////////////////////////////////////////////////////////////////////////
+///
+/// \brief This is the header for OsqpStats struct
+///
+/// \details Statistics of the latest call of an OSQP solver (iterations, status, durations and
+///          residuals), copied from the workspace of the solver after each call of osqp_solve
+///
+//////////////////////////////////////////////////////////////////////////////////////////////////
+
+#ifndef OSQPSTATS_H_INCLUDED
+#define OSQPSTATS_H_INCLUDED
+
+#include "osqp.h"
+#include "qrw/Types.h"
+
+struct OsqpStats
+{
+    static const int SIZE = 9;  ///< Number of values returned by toVector
+
+    int iter;            ///< Number of ADMM iterations
+    int status;          ///< Status of the solver (OSQP_SOLVED, OSQP_MAX_ITER_REACHED, OSQP_PRIMAL_INFEASIBLE...)
+    double setup_time;   ///< Duration of the setup of the solver, only set by the first call [s]
+    double solve_time;   ///< Duration of the solve [s]
+    double update_time;  ///< Duration of the update of the problem before the solve [s]
+    double run_time;     ///< Total duration (setup or update, solve and polish) [s]
+    double pri_res;      ///< Norm of the primal residual
+    double dua_res;      ///< Norm of the dual residual
+    double obj_val;      ///< Value of the cost function
+
+    OsqpStats() { reset(); }
+
+    ////////////////////////////////////////////////////////////////////////////////////////////////
+    ///
+    /// \brief Set all statistics to zero
+    ///
+    ////////////////////////////////////////////////////////////////////////////////////////////////
+    void reset()
+    {
+        iter = 0;
+        status = 0;
+        setup_time = 0.0;
+        solve_time = 0.0;
+        update_time = 0.0;
+        run_time = 0.0;
+        pri_res = 0.0;
+        dua_res = 0.0;
+        obj_val = 0.0;
+    }
+
+    ////////////////////////////////////////////////////////////////////////////////////////////////
+    ///
+    /// \brief Copy the statistics of the latest call of osqp_solve. Durations are only measured
+    ///        by OSQP when it is compiled with PROFILING, they stay at zero otherwise
+    ///
+    /// \param[in] info Information structure of the workspace of the solver
+    ///
+    ////////////////////////////////////////////////////////////////////////////////////////////////
+    void fill(OSQPInfo const* info)
+    {
+        iter = (int)info->iter;
+        status = (int)info->status_val;
+        pri_res = info->pri_res;
+        dua_res = info->dua_res;
+        obj_val = info->obj_val;
+#ifdef PROFILING
+        setup_time = info->setup_time;
+        solve_time = info->solve_time;
+        update_time = info->update_time;
+        run_time = info->run_time;
+#endif
+    }
+
+    ////////////////////////////////////////////////////////////////////////////////////////////////
+    ///
+    /// \brief Return the statistics as a vector, to log them in a single call:
+    ///        [iter, status, setup_time, solve_time, update_time, run_time, pri_res, dua_res, obj_val]
+    ///
+    ////////////////////////////////////////////////////////////////////////////////////////////////
+    VectorN toVector() const
+    {
+        VectorN out(SIZE);
+        out << iter, status, setup_time, solve_time, update_time, run_time, pri_res, dua_res, obj_val;
+        return out;
+    }
+};
+
+#endif  // OSQPSTATS_H_INCLUDED
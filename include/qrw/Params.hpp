@@ -37,6 +37,15 @@ public:
     ////////////////////////////////////////////////////////////////////////////////////////////////
     void initialize(const std::string& file_path);
 
+    ////////////////////////////////////////////////////////////////////////////////////////////////
+    ///
+    /// \brief Return the duration of each node of the prediction horizon of the MPC [s]. The grid
+    ///        of mpc_grid is checked against dt_mpc and T_mpc, T_mpc/dt_mpc nodes of dt_mpc are
+    ///        returned if it is empty.
+    ///
+    ////////////////////////////////////////////////////////////////////////////////////////////////
+    VectorN getMpcGrid() const;
+
 
     // See .yaml file for meaning of parameters
     std::string interface;
@@ -50,6 +59,13 @@ public:
     int N_SIMULATION;
     bool enable_pyb_GUI;
     bool enable_multiprocessing;
+    bool predict_mpc_state;
+    bool enable_realtime;
+    int realtime_cpu_loop;
+    int realtime_cpu_mpc;
+    int realtime_priority;
+    bool realtime_lock_memory;
+    bool enable_load_shedding;
     bool perfect_estimator;
 
     std::vector<double> q_init;
@@ -58,6 +74,7 @@ public:
     double dt_mpc;
     double T_gait;
     double T_mpc;
+    std::vector<double> mpc_grid;
     int type_MPC;
     bool kf_enabled;
 
@@ -69,6 +86,13 @@ public:
     std::vector<double> osqp_w_states;
     std::vector<double> osqp_w_forces;
     double osqp_Nz_lim;
+    bool osqp_condensed;
+    bool osqp_warm_start;
+    double osqp_time_budget;
+    int osqp_timeout_fallback;
+
+    int crocoddyl_nthreads;
+    double crocoddyl_time_budget;
 
     double Kp_flyingfeet;
     double Kd_flyingfeet;
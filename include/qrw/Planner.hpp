@@ -0,0 +1,90 @@
+///////////////////////////////////////////////////////////////////////////////////////////////////
+///
+/// \brief This is the header for Planner class
+///
+/// \details Runs the whole planning pipeline of one iteration of the control loop (Gait, then
+///          FootstepPlanner, then StatePlanner, then FootTrajectoryGenerator) in a single call so
+///          that the control loop does not go back and forth between Python and C++
+///
+//////////////////////////////////////////////////////////////////////////////////////////////////
+
+#ifndef PLANNER_H_INCLUDED
+#define PLANNER_H_INCLUDED
+
+#include "qrw/FootTrajectoryGenerator.hpp"
+#include "qrw/FootstepPlanner.hpp"
+#include "qrw/Gait.hpp"
+#include "qrw/Params.hpp"
+#include "qrw/StatePlanner.hpp"
+#include "qrw/Types.h"
+
+class Planner
+{
+public:
+    ////////////////////////////////////////////////////////////////////////////////////////////////
+    ///
+    /// \brief Constructor, creates and initializes all the planning blocks
+    ///
+    /// \param[in] params Object that stores parameters, must outlive the Planner
+    ///
+    ////////////////////////////////////////////////////////////////////////////////////////////////
+    Planner(Params& params);
+
+    ////////////////////////////////////////////////////////////////////////////////////////////////
+    ///
+    /// \brief Destructor.
+    ///
+    ////////////////////////////////////////////////////////////////////////////////////////////////
+    ~Planner() {}
+
+    ////////////////////////////////////////////////////////////////////////////////////////////////
+    ///
+    /// \brief Run one iteration of the planning pipeline: update the gait, compute the target
+    ///        footsteps, the reference trajectory of the base and, if enabled, the position,
+    ///        velocity and acceleration references of feet in swing phase
+    ///
+    /// \param[in] k Number of time steps since the start of the simulation
+    /// \param[in] q Current position vector of the flying base in world frame (7x1)
+    /// \param[in] b_v Current velocity vector of the flying base in horizontal frame (6x1)
+    /// \param[in] b_vref Desired velocity vector of the flying base in horizontal frame (6x1)
+    /// \param[in] joystickCode Integer to trigger events with the joystick
+    /// \param[in] updateFeet False to skip the update of feet trajectories, to call
+    ///            updateFootTrajectories later with other targets
+    ///
+    ////////////////////////////////////////////////////////////////////////////////////////////////
+    void runPlanner(int k, VectorN const& q, Vector6 const& b_v, Vector6 const& b_vref, int joystickCode,
+                    bool updateFeet = true);
+
+    ////////////////////////////////////////////////////////////////////////////////////////////////
+    ///
+    /// \brief Update the references of feet in swing phase towards given targets instead of the
+    ///        ones of the footstep planner (should be called once per iteration after runPlanner
+    ///        with updateFeet set to false)
+    ///
+    /// \param[in] k Number of time steps since the start of the simulation
+    /// \param[in] targetFootstep Target locations of feet in world frame (3x4)
+    ///
+    ////////////////////////////////////////////////////////////////////////////////////////////////
+    void updateFootTrajectories(int k, MatrixN const& targetFootstep);
+
+    Gait& getGait() { return gait_; }                                        ///< Get the gait
+    FootstepPlanner& getFootstepPlanner() { return footstepPlanner_; }        ///< Get the footstep planner
+    StatePlanner& getStatePlanner() { return statePlanner_; }                 ///< Get the state planner
+    FootTrajectoryGenerator& getFootTrajectoryGenerator() { return footTrajectoryGenerator_; }  ///< Get the trajectory generator
+    MatrixN const& getTargetFootstep() const { return targetFootstep_; }      ///< Get the target footsteps in world frame
+
+private:
+    Planner(Planner const&);             // The blocks keep pointers to gait_, so no copy
+    Planner& operator=(Planner const&);
+
+    int k_mpc_;  ///< Number of wbc time steps for each MPC time step
+
+    Gait gait_;                                        ///< Current and future gait
+    FootstepPlanner footstepPlanner_;                  ///< Target location of footsteps
+    StatePlanner statePlanner_;                        ///< Reference trajectory of the base
+    FootTrajectoryGenerator footTrajectoryGenerator_;  ///< References of feet in swing phase
+
+    MatrixN targetFootstep_;  ///< Target location of footsteps in world frame (3x4)
+};
+
+#endif  // PLANNER_H_INCLUDED
@@ -2,6 +2,8 @@
 #define QPWBC_H_INCLUDED
 
 #include "qrw/InvKin.hpp" // For pseudoinverse
+#include "qrw/OsqpMemory.hpp"
+#include "qrw/OsqpStats.hpp"
 #include "qrw/Params.hpp"
 #include <iostream>
 #include <fstream>
@@ -30,7 +32,7 @@ class QPWBC {
   Eigen::Matrix<double, 12, 12> Q2 = Eigen::Matrix<double, 12, 12>::Identity();
 
   // Friction coefficient
-  const double mu = 0.9;
+  static constexpr double mu = 0.9;
 
   // Generatrix of the linearized friction cone
   Eigen::Matrix<double, 20, 12> G = Eigen::Matrix<double, 20, 12>::Zero();
@@ -51,7 +53,7 @@ class QPWBC {
   
   // Matrix ML
   const static int size_nz_ML = 20*12; //4 * (4 * 2 + 1);
-  csc *ML;  // Compressed Sparse Column matrix
+  CscPtr ML;  // Compressed Sparse Column matrix
 
   // Matrix NK
   const static int size_nz_NK = 20;
@@ -61,20 +63,25 @@ class QPWBC {
 
   // Matrix P
   const static int size_nz_P = 6*13; // 6*13; // 12*13/2;
-  csc *P;  // Compressed Sparse Column matrix
+  CscPtr P;  // Compressed Sparse Column matrix
 
   // Matrix Q
   const static int size_nz_Q = 12;
   double Q[size_nz_Q] = {};  // Q is full of zeros
 
-  // OSQP solver variables
-  OSQPWorkspace *workspce = new OSQPWorkspace();
-  OSQPData *data;
-  OSQPSettings *settings = (OSQPSettings *)c_malloc(sizeof(OSQPSettings));
+  // OSQP solver variables, released when the QPWBC is destroyed
+  OsqpWorkspacePtr workspce;  // Created by osqp_setup during the first call of the solver
+  OsqpDataPtr data;
+  OsqpSettingsPtr settings = OsqpSettingsPtr((OSQPSettings *)c_malloc(sizeof(OSQPSettings)));
+  OsqpStats stats;  // Statistics of the solver for the latest call
 
  public:
   
   QPWBC(); // Constructor
+
+  // The QPWBC owns the memory of its solver, it can be moved but not copied
+  QPWBC(QPWBC&&) = default;
+  QPWBC& operator=(QPWBC&&) = default;
   void initialize(Params& params);
 
   // Functions
@@ -93,6 +100,7 @@ class QPWBC {
   Eigen::MatrixXd get_f_res();
   Eigen::MatrixXd get_ddq_res();
   Eigen::MatrixXd get_H();
+  OsqpStats const& get_stats() { return stats; }
 
   // Utils
   void my_print_csc_matrix(csc *M, const char *name);
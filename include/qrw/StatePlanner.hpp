@@ -69,7 +69,7 @@ private:
     // the robot in column 0 and the N steps of the prediction horizon in the others
     MatrixN referenceStates_;
 
-    VectorN dt_vector_;  // Vector containing all time steps in the prediction horizon
+    VectorN dt_vector_;  // Time at the end of each node of the prediction horizon
 
 };
 
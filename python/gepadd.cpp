@@ -1,10 +1,12 @@
 #include "qrw/gepadd.hpp"
 #include "qrw/InvKin.hpp"
 #include "qrw/MPC.hpp"
+#include "qrw/AsyncMPC.hpp"
 #include "qrw/StatePlanner.hpp"
 #include "qrw/Gait.hpp"
 #include "qrw/FootstepPlanner.hpp"
 #include "qrw/FootTrajectoryGenerator.hpp"
+#include "qrw/Planner.hpp"
 #include "qrw/QPWBC.hpp"
 #include "qrw/Params.hpp"
 
@@ -13,6 +15,32 @@
 
 namespace bp = boost::python;
 
+// Copy a matrix into a NumPy array of doubles given by the caller, whatever its memory layout. The
+// buffer protocol gives direct access to the data of the array so that it is updated in place
+template <typename Derived>
+void copyToBuffer(Eigen::MatrixBase<Derived> const& src, bp::object const& dst)
+{
+    Py_buffer view;
+    if (PyObject_GetBuffer(dst.ptr(), &view, PyBUF_RECORDS) != 0) bp::throw_error_already_set();
+
+    bool valid = (std::string(view.format) == "d") && (view.ndim == 1 || view.ndim == 2);
+    Py_ssize_t rows = valid ? view.shape[0] : 0;
+    Py_ssize_t cols = (valid && view.ndim == 2) ? view.shape[1] : 1;
+    if (!valid || rows != src.rows() || cols != src.cols())
+    {
+        PyBuffer_Release(&view);
+        PyErr_SetString(PyExc_ValueError, "Output buffer must be a writable array of float64 with the shape of the result");
+        bp::throw_error_already_set();
+    }
+
+    Py_ssize_t rowStride = view.strides[0] / (Py_ssize_t)sizeof(double);
+    Py_ssize_t colStride = (view.ndim == 2) ? view.strides[1] / (Py_ssize_t)sizeof(double) : 0;
+    typedef Eigen::Stride<Eigen::Dynamic, Eigen::Dynamic> DynamicStride;
+    Eigen::Map<Eigen::MatrixXd, 0, DynamicStride>(static_cast<double*>(view.buf), rows, cols,
+                                                  DynamicStride(colStride, rowStride)) = src;
+    PyBuffer_Release(&view);
+}
+
 template <typename MPC>
 struct MPCPythonVisitor : public bp::def_visitor<MPCPythonVisitor<MPC>>
 {
@@ -25,15 +53,43 @@ struct MPCPythonVisitor : public bp::def_visitor<MPCPythonVisitor<MPC>>
 
             // Run MPC from Python
             .def("run", &MPC::run, bp::args("num_iter", "xref_in", "fsteps_in"), "Run MPC from Python.\n")
+            .def("run_batch", &runBatch, (bp::arg("self"), "xrefs", "fsteps", bp::arg("n_threads") = 0),
+                 "Solve K problems with a pool of threads, from K x 12 x (n+1) reference trajectories and\n"
+                 "K x N_gait x 12 footsteps, and return the K x 24 x n results.\n")
+            .def("propagate_state", &MPC::propagate_state, bp::args("x_in", "f_in", "fsteps_in", "duration"),
+                 "Propagate a state with the linearised dynamics of the MPC.\n")
             .def("get_latest_result", &MPC::get_latest_result,
                  "Get latest result (predicted trajectory  forces to apply).\n")
+            .def("get_latest_result", &getLatestResult, bp::args("self", "out"),
+                 "Write the latest result into the given array.\n")
             .def("get_gait", &MPC::get_gait, "Get gait matrix.\n")
-            .def("get_Sgait", &MPC::get_Sgait, "Get S_gait matrix.\n");
+            .def("get_Sgait", &MPC::get_Sgait, "Get S_gait matrix.\n")
+            .def("get_durations", &MPC::get_durations,
+                 "Get durations of the update of the matrices and of the solver for the latest iteration.\n")
+            .def("get_iterations", &MPC::get_iterations, "Get number of iterations of the solver for the latest iteration.\n")
+            .def("get_stats", &MPC::get_stats, bp::return_value_policy<bp::copy_const_reference>(),
+                 "Get statistics of the solver for the latest iteration.\n")
+            .def("get_timeouts", &MPC::get_timeouts,
+                 "Get number of iterations during which the solver ran out of time.\n");
+    }
+
+    static void getLatestResult(MPC& self, bp::object out) { copyToBuffer(self.get_latest_result(), out); }
+
+    // Stacked problems are reshaped into 2D matrices to go through the Eigen converters
+    static bp::object runBatch(MPC& self, bp::object xrefs, bp::object fsteps, int n_threads)
+    {
+        int K = bp::extract<int>(xrefs.attr("shape")[0]);
+        int n_cols = bp::extract<int>(xrefs.attr("shape")[2]);
+        int N_gait = bp::extract<int>(fsteps.attr("shape")[1]);
+        MatrixN xrefs_2d = bp::extract<MatrixN>(xrefs.attr("reshape")(12 * K, n_cols));
+        MatrixN fsteps_2d = bp::extract<MatrixN>(fsteps.attr("reshape")(N_gait * K, 12));
+        MatrixN results = self.run_batch(xrefs_2d, fsteps_2d, n_threads);
+        return bp::object(results).attr("reshape")(K, 24, n_cols - 1);
     }
 
     static void expose()
     {
-        bp::class_<MPC>("MPC", bp::no_init).def(MPCPythonVisitor<MPC>());
+        bp::class_<MPC, boost::noncopyable>("MPC", bp::no_init).def(MPCPythonVisitor<MPC>());
 
         ENABLE_SPECIFIC_MATRIX_TYPE(matXd);
     }
@@ -41,6 +97,102 @@ struct MPCPythonVisitor : public bp::def_visitor<MPCPythonVisitor<MPC>>
 
 void exposeMPC() { MPCPythonVisitor<MPC>::expose(); }
 
+/////////////////////////////////
+/// Binding OsqpStats struct
+/////////////////////////////////
+template <typename OsqpStats>
+struct OsqpStatsPythonVisitor : public bp::def_visitor<OsqpStatsPythonVisitor<OsqpStats>>
+{
+    template <class PyClassOsqpStats>
+    void visit(PyClassOsqpStats& cl) const
+    {
+        cl.def(bp::init<>(bp::arg(""), "Default constructor."))
+
+            .def_readonly("iter", &OsqpStats::iter)
+            .def_readonly("status", &OsqpStats::status)
+            .def_readonly("setup_time", &OsqpStats::setup_time)
+            .def_readonly("solve_time", &OsqpStats::solve_time)
+            .def_readonly("update_time", &OsqpStats::update_time)
+            .def_readonly("run_time", &OsqpStats::run_time)
+            .def_readonly("pri_res", &OsqpStats::pri_res)
+            .def_readonly("dua_res", &OsqpStats::dua_res)
+            .def_readonly("obj_val", &OsqpStats::obj_val)
+
+            .def("toVector", &OsqpStats::toVector,
+                 "Get [iter, status, setup_time, solve_time, update_time, run_time, pri_res, dua_res, obj_val].\n");
+    }
+
+    static void expose()
+    {
+        bp::class_<OsqpStats>("OsqpStats", bp::no_init).def(OsqpStatsPythonVisitor<OsqpStats>());
+    }
+};
+
+void exposeOsqpStats() { OsqpStatsPythonVisitor<OsqpStats>::expose(); }
+
+/////////////////////////////////
+/// Binding AsyncMPC class
+/////////////////////////////////
+
+// Release the GIL for the lifetime of the object
+struct ScopedGILRelease
+{
+    ScopedGILRelease() { state_ = PyEval_SaveThread(); }
+    ~ScopedGILRelease() { PyEval_RestoreThread(state_); }
+    PyThreadState* state_;
+};
+
+template <typename AsyncMPC>
+struct AsyncMPCPythonVisitor : public bp::def_visitor<AsyncMPCPythonVisitor<AsyncMPC>>
+{
+    template <class PyClassAsyncMPC>
+    void visit(PyClassAsyncMPC& cl) const
+    {
+        cl.def(bp::init<Params&>(bp::args("params"), "Constructor with parameters.")[bp::with_custodian_and_ward<1, 2>()])
+
+            // Send inputs to the background thread from Python
+            .def("solve", &solve, bp::args("self", "num_iter", "xref", "fsteps"),
+                 "Send new inputs to the background MPC.\n")
+            .def("get_latest_result", &AsyncMPC::get_latest_result,
+                 "Get latest result (predicted trajectory  forces to apply).\n")
+            .def("get_latest_result", &getLatestResult, bp::args("self", "out"),
+                 "Write the latest result into the given array.\n")
+            .def("get_latest_iteration", &AsyncMPC::get_latest_iteration,
+                 "Get the MPC iteration the latest result has been computed for.\n")
+            .def("get_latest_stats", &AsyncMPC::get_latest_stats, bp::return_value_policy<bp::copy_const_reference>(),
+                 "Get statistics of the solver for the latest result.\n")
+            .def("result_ready", &AsyncMPC::result_ready, "True if a new result has not been retrieved yet.\n")
+            .def("get_handoff_latency", &AsyncMPC::get_handoff_latency,
+                 "Get the delay between the last solved inputs being sent and the wake up of the thread.\n")
+            .def("get_handoff_latency_max", &AsyncMPC::get_handoff_latency_max,
+                 "Get the maximum delay between inputs being sent and the wake up of the thread.\n")
+            .def("set_cpu_affinity", &AsyncMPC::set_cpu_affinity, bp::args("cpu"),
+                 "Pin the background thread to a single CPU core.\n")
+            .def("stop", &stop, bp::args("self"), "Stop the background thread.\n");
+    }
+
+    static void solve(AsyncMPC& self, int num_iter, MatrixN const& xref, MatrixN const& fsteps)
+    {
+        ScopedGILRelease release;
+        self.solve(num_iter, xref, fsteps);
+    }
+
+    static void getLatestResult(AsyncMPC& self, bp::object out) { copyToBuffer(self.get_latest_result(), out); }
+
+    static void stop(AsyncMPC& self)
+    {
+        ScopedGILRelease release;
+        self.stop();
+    }
+
+    static void expose()
+    {
+        bp::class_<AsyncMPC, boost::noncopyable>("AsyncMPC", bp::no_init).def(AsyncMPCPythonVisitor<AsyncMPC>());
+    }
+};
+
+void exposeAsyncMPC() { AsyncMPCPythonVisitor<AsyncMPC>::expose(); }
+
 /////////////////////////////////
 /// Binding StatePlanner class
 /////////////////////////////////
@@ -84,6 +236,9 @@ struct GaitPythonVisitor : public bp::def_visitor<GaitPythonVisitor<Gait>>
         cl.def(bp::init<>(bp::arg(""), "Default constructor."))
 
             .def("getCurrentGait", &Gait::getCurrentGait, "Get currentGait_ matrix.\n")
+            .def("getMpcGait", &Gait::getMpcGait, "Get current gait sampled on the nodes of the MPC.\n")
+            .def("getMpcGait", &getMpcGait, bp::args("self", "out"),
+                 "Write the current gait sampled on the nodes of the MPC into the given array.\n")
             .def("isNewPhase", &Gait::isNewPhase, "Get newPhase_ boolean.\n")
             .def("getIsStatic", &Gait::getIsStatic, "Get is_static_ boolean.\n")
 
@@ -99,6 +254,8 @@ struct GaitPythonVisitor : public bp::def_visitor<GaitPythonVisitor<Gait>>
                  "Set current gait matrix from Python.\n");
     }
 
+    static void getMpcGait(Gait& self, bp::object out) { copyToBuffer(self.getMpcGait(), out); }
+
     static void expose()
     {
         bp::class_<Gait>("Gait", bp::no_init).def(GaitPythonVisitor<Gait>());
@@ -120,6 +277,7 @@ struct FootstepPlannerPythonVisitor : public bp::def_visitor<FootstepPlannerPyth
         cl.def(bp::init<>(bp::arg(""), "Default constructor."))
 
             .def("getFootsteps", &FootstepPlanner::getFootsteps, "Get footsteps_ matrix.\n")
+            .def("getMpcFootsteps", &FootstepPlanner::getMpcFootsteps, "Get footsteps sampled on the nodes of the MPC.\n")
             .def("getRz", &FootstepPlanner::getRz, "Get rotation along z matrix.\n")
 
             .def("initialize", &FootstepPlanner::initialize, bp::args("params", "gaitIn"),
@@ -173,6 +331,74 @@ struct FootTrajectoryGeneratorPythonVisitor : public bp::def_visitor<FootTraject
 };
 void exposeFootTrajectoryGenerator() { FootTrajectoryGeneratorPythonVisitor<FootTrajectoryGenerator>::expose(); }
 
+/////////////////////////////////
+/// Binding Planner class
+/////////////////////////////////
+
+template <typename Planner>
+struct PlannerPythonVisitor : public bp::def_visitor<PlannerPythonVisitor<Planner>>
+{
+    template <class PyClassPlanner>
+    void visit(PyClassPlanner& cl) const
+    {
+        cl.def(bp::init<Params&>(bp::args("params"), "Constructor with parameters.")[bp::with_custodian_and_ward<1, 2>()])
+
+            // Access to the planning blocks
+            .add_property("gait", bp::make_function(&Planner::getGait, bp::return_internal_reference<>()))
+            .add_property("footstepPlanner",
+                          bp::make_function(&Planner::getFootstepPlanner, bp::return_internal_reference<>()))
+            .add_property("statePlanner", bp::make_function(&Planner::getStatePlanner, bp::return_internal_reference<>()))
+            .add_property("footTrajectoryGenerator",
+                          bp::make_function(&Planner::getFootTrajectoryGenerator, bp::return_internal_reference<>()))
+
+            // Run Planner from Python
+            .def("runPlanner", &runPlanner,
+                 (bp::arg("self"), "k", "q", "b_v", "b_vref", "joystickCode", "updateFeet", "xref", "fsteps", "gait",
+                  "targetFootstep", "feet_p", "feet_v", "feet_a"),
+                 "Run the planning pipeline and write its results into the given arrays.\n")
+            .def("updateFootTrajectories", &updateFootTrajectories,
+                 bp::args("self", "k", "targetFootstep", "feet_p", "feet_v", "feet_a"),
+                 "Update the references of feet towards given targets and write them into the given arrays.\n");
+    }
+
+    static void runPlanner(Planner& self, int k, VectorN const& q, Vector6 const& b_v, Vector6 const& b_vref,
+                           int joystickCode, bool updateFeet, bp::object xref, bp::object fsteps, bp::object gait,
+                           bp::object targetFootstep, bp::object feet_p, bp::object feet_v, bp::object feet_a)
+    {
+        self.runPlanner(k, q, b_v, b_vref, joystickCode, updateFeet);
+
+        copyToBuffer(self.getStatePlanner().getReferenceStates(), xref);
+        copyToBuffer(self.getFootstepPlanner().getMpcFootsteps(), fsteps);
+        copyToBuffer(self.getGait().getCurrentGait(), gait);
+        copyToBuffer(self.getTargetFootstep(), targetFootstep);
+        if (updateFeet)
+        {
+            copyFeetReferences(self, feet_p, feet_v, feet_a);
+        }
+    }
+
+    static void updateFootTrajectories(Planner& self, int k, MatrixN const& targetFootstep, bp::object feet_p,
+                                       bp::object feet_v, bp::object feet_a)
+    {
+        self.updateFootTrajectories(k, targetFootstep);
+        copyFeetReferences(self, feet_p, feet_v, feet_a);
+    }
+
+    static void copyFeetReferences(Planner& self, bp::object feet_p, bp::object feet_v, bp::object feet_a)
+    {
+        copyToBuffer(self.getFootTrajectoryGenerator().getFootPosition(), feet_p);
+        copyToBuffer(self.getFootTrajectoryGenerator().getFootVelocity(), feet_v);
+        copyToBuffer(self.getFootTrajectoryGenerator().getFootAcceleration(), feet_a);
+    }
+
+    static void expose()
+    {
+        bp::class_<Planner, boost::noncopyable>("Planner", bp::no_init).def(PlannerPythonVisitor<Planner>());
+    }
+};
+
+void exposePlanner() { PlannerPythonVisitor<Planner>::expose(); }
+
 /////////////////////////////////
 /// Binding InvKin class
 /////////////////////////////////
@@ -187,12 +413,28 @@ struct InvKinPythonVisitor : public bp::def_visitor<InvKinPythonVisitor<InvKin>>
             .def("initialize", &InvKin::initialize, bp::args("params"), "Initialize InvKin from Python.\n")
 
             .def("get_q_step", &InvKin::get_q_step, "Get velocity goals matrix.\n")
+            .def("get_q_step", &getQStep, bp::args("self", "out"), "Write velocity goals into the given array.\n")
             .def("get_dq_cmd", &InvKin::get_dq_cmd, "Get acceleration goals matrix.\n")
+            .def("get_dq_cmd", &getDqCmd, bp::args("self", "out"), "Write acceleration goals into the given array.\n")
 
             // Run InvKin from Python
             .def("refreshAndCompute", &InvKin::refreshAndCompute,
                  bp::args("contacts", "goals", "vgoals", "agoals", "posf", "vf", "wf", "af", "Jf"),
-                 "Run InvKin from Python.\n");
+                 "Run InvKin from Python.\n")
+            .def("refreshAndCompute", &refreshAndCompute,
+                 bp::args("self", "contacts", "goals", "vgoals", "agoals", "posf", "vf", "wf", "af", "Jf", "out"),
+                 "Run InvKin from Python and write the accelerations into the given array.\n");
+    }
+
+    static void getQStep(InvKin& self, bp::object out) { copyToBuffer(self.get_q_step(), out); }
+    static void getDqCmd(InvKin& self, bp::object out) { copyToBuffer(self.get_dq_cmd(), out); }
+
+    static void refreshAndCompute(InvKin& self, const Eigen::MatrixXd& contacts, const Eigen::MatrixXd& goals,
+                                  const Eigen::MatrixXd& vgoals, const Eigen::MatrixXd& agoals,
+                                  const Eigen::MatrixXd& posf, const Eigen::MatrixXd& vf, const Eigen::MatrixXd& wf,
+                                  const Eigen::MatrixXd& af, const Eigen::MatrixXd& Jf, bp::object out)
+    {
+        copyToBuffer(self.refreshAndCompute(contacts, goals, vgoals, agoals, posf, vf, wf, af, Jf), out);
     }
 
     static void expose()
@@ -219,16 +461,23 @@ struct QPWBCPythonVisitor : public bp::def_visitor<QPWBCPythonVisitor<QPWBC>>
             .def("initialize", &QPWBC::initialize, bp::args("params"), "Initialize QPWBC from Python.\n")
 
             .def("get_f_res", &QPWBC::get_f_res, "Get velocity goals matrix.\n")
+            .def("get_f_res", &getFRes, bp::args("self", "out"), "Write velocity goals into the given array.\n")
             .def("get_ddq_res", &QPWBC::get_ddq_res, "Get acceleration goals matrix.\n")
+            .def("get_ddq_res", &getDdqRes, bp::args("self", "out"), "Write acceleration goals into the given array.\n")
             .def("get_H", &QPWBC::get_H, "Get H weight matrix.\n")
+            .def("get_stats", &QPWBC::get_stats, bp::return_value_policy<bp::copy_const_reference>(),
+                 "Get statistics of the solver for the latest call.\n")
 
             // Run QPWBC from Python
             .def("run", &QPWBC::run, bp::args("M", "Jc", "f_cmd", "RNEA", "k_contacts"), "Run QPWBC from Python.\n");
     }
 
+    static void getFRes(QPWBC& self, bp::object out) { copyToBuffer(self.get_f_res(), out); }
+    static void getDdqRes(QPWBC& self, bp::object out) { copyToBuffer(self.get_ddq_res(), out); }
+
     static void expose()
     {
-        bp::class_<QPWBC>("QPWBC", bp::no_init).def(QPWBCPythonVisitor<QPWBC>());
+        bp::class_<QPWBC, boost::noncopyable>("QPWBC", bp::no_init).def(QPWBCPythonVisitor<QPWBC>());
 
         ENABLE_SPECIFIC_MATRIX_TYPE(matXd);
     }
@@ -248,6 +497,7 @@ struct ParamsPythonVisitor : public bp::def_visitor<ParamsPythonVisitor<Params>>
 
             .def("initialize", &Params::initialize, bp::args("file_path"),
                  "Initialize Params from Python.\n")
+            .def("getMpcGrid", &Params::getMpcGrid, "Get the duration of each node of the MPC.\n")
 
             // Read Params from Python
             .def_readwrite("interface", &Params::interface)
@@ -262,6 +512,7 @@ struct ParamsPythonVisitor : public bp::def_visitor<ParamsPythonVisitor<Params>>
             .def_readwrite("dt_mpc", &Params::dt_mpc)
             .def_readwrite("T_gait", &Params::T_gait)
             .def_readwrite("T_mpc", &Params::T_mpc)
+            .def_readwrite("mpc_grid", &Params::mpc_grid)
             .def_readwrite("N_SIMULATION", &Params::N_SIMULATION)
             .def_readwrite("type_MPC", &Params::type_MPC)
             .def_readwrite("use_flat_plane", &Params::use_flat_plane)
@@ -269,12 +520,25 @@ struct ParamsPythonVisitor : public bp::def_visitor<ParamsPythonVisitor<Params>>
             .def_readwrite("kf_enabled", &Params::kf_enabled)
             .def_readwrite("enable_pyb_GUI", &Params::enable_pyb_GUI)
             .def_readwrite("enable_multiprocessing", &Params::enable_multiprocessing)
+            .def_readwrite("predict_mpc_state", &Params::predict_mpc_state)
+            .def_readwrite("enable_realtime", &Params::enable_realtime)
+            .def_readwrite("realtime_cpu_loop", &Params::realtime_cpu_loop)
+            .def_readwrite("realtime_cpu_mpc", &Params::realtime_cpu_mpc)
+            .def_readwrite("realtime_priority", &Params::realtime_priority)
+            .def_readwrite("realtime_lock_memory", &Params::realtime_lock_memory)
+            .def_readwrite("enable_load_shedding", &Params::enable_load_shedding)
             .def_readwrite("perfect_estimator", &Params::perfect_estimator)
+            .def_readwrite("osqp_condensed", &Params::osqp_condensed)
+            .def_readwrite("osqp_warm_start", &Params::osqp_warm_start)
+            .def_readwrite("osqp_time_budget", &Params::osqp_time_budget)
+            .def_readwrite("osqp_timeout_fallback", &Params::osqp_timeout_fallback)
+            .def_readwrite("crocoddyl_nthreads", &Params::crocoddyl_nthreads)
+            .def_readwrite("crocoddyl_time_budget", &Params::crocoddyl_time_budget)
             .def_readwrite("mass", &Params::mass)
             .def_readwrite("I_mat", &Params::I_mat)
             .def_readwrite("h_ref", &Params::h_ref)
             .def_readwrite("shoulders", &Params::shoulders)
-            .def_readwrite("lock_time", &Params::lock_time);
+            .def_readwrite("lock_time", &Params::lock_time)
             .def_readwrite("footsteps_init", &Params::footsteps_init)
             .def_readwrite("footsteps_under_shoulders", &Params::footsteps_under_shoulders);
 
@@ -299,11 +563,14 @@ BOOST_PYTHON_MODULE(libquadruped_reactive_walking)
 
     eigenpy::enableEigenPy();
 
+    exposeOsqpStats();
     exposeMPC();
+    exposeAsyncMPC();
     exposeStatePlanner();
     exposeGait();
     exposeFootstepPlanner();
     exposeFootTrajectoryGenerator();
+    exposePlanner();
     exposeInvKin();
     exposeQPWBC();
     exposeParams();
@@ -2,17 +2,24 @@
 
 import numpy as np
 import utils_mpc
+from utils_kinematics import cross, yaw_rotation, rpy_to_rotation, rpy_to_quaternion
 import time
-import math
 
 from QP_WBC import wbc_controller
 import MPC_Wrapper
+from Profiler import Profiler
+from LoadShedder import LoadShedder, SHED_CAMERA, SHED_FORCES
 import pybullet as pyb
 import pinocchio as pin
 from solopython.utils.viewerClient import viewerClient, NonBlockingViewerFromRobot
 import libquadruped_reactive_walking as lqrw
 from example_robot_data.robots_loader import Solo12Loader
 
+# Consecutive stages of one iteration of the control loop, and their index in the profiler
+PROFILER_STAGES = ["filter", "state", "planner", "mpc", "invkin", "qpwbc", "security", "camera", "logging"]
+ST_FILTER, ST_STATE, ST_PLANNER, ST_MPC, ST_INVKIN, ST_QPWBC, ST_SECURITY, ST_CAMERA, \
+    ST_LOGGING = range(len(PROFILER_STAGES))
+
 class Result:
     """Object to store the result of the control loop
     It contains what is sent to the robot (gains, desired positions and velocities,
@@ -20,8 +27,8 @@ class Result:
 
     def __init__(self):
 
-        self.P = 0.0
-        self.D = 0.0
+        self.P = np.zeros(12)
+        self.D = np.zeros(12)
         self.q_des = np.zeros(12)
         self.v_des = np.zeros(12)
         self.tau_ff = np.zeros(12)
@@ -77,15 +84,11 @@ class Controller:
         #                        Parameters definition                         #
         ########################################################################
 
-        # Lists to log the duration of 1 iteration of the MPC/TSID
-        self.t_list_filter = [0] * int(params.N_SIMULATION)
-        self.t_list_planner = [0] * int(params.N_SIMULATION)
-        self.t_list_mpc = [0] * int(params.N_SIMULATION)
-        self.t_list_wbc = [0] * int(params.N_SIMULATION)
-        self.t_list_loop = [0] * int(params.N_SIMULATION)
+        # Profiler to log the duration of each stage of the control loop
+        self.profiler = Profiler(PROFILER_STAGES, params.dt_wbc)
 
-        self.t_list_InvKin = [0] * int(params.N_SIMULATION)
-        self.t_list_QPWBC = [0] * int(params.N_SIMULATION)
+        # Shed non-critical work of the control loop when it is late
+        self.shedder = LoadShedder(params, size=params.N_SIMULATION)
 
         # Init joint torques to correct shape
         self.jointTorques = np.zeros((12, 1))
@@ -119,24 +122,31 @@ class Controller:
         self.b_v = np.zeros((18, 1))
         self.o_v_filt = np.zeros((18, 1))
 
-        self.statePlanner = lqrw.StatePlanner()
-        self.statePlanner.initialize(params)
-
-        self.gait = lqrw.Gait()
-        self.gait.initialize(params)
-
-        self.footstepPlanner = lqrw.FootstepPlanner()
-        self.footstepPlanner.initialize(params, self.gait)
-
-        self.footTrajectoryGenerator = lqrw.FootTrajectoryGenerator()
-        self.footTrajectoryGenerator.initialize(params, self.gait)
+        # Planning pipeline (gait, footsteps, reference trajectory of the base, feet trajectories) run in C++
+        self.planner = lqrw.Planner(params)
+        self.gait = self.planner.gait
+        self.footstepPlanner = self.planner.footstepPlanner
+        self.statePlanner = self.planner.statePlanner
+        self.footTrajectoryGenerator = self.planner.footTrajectoryGenerator
+
+        # Outputs of the planner, written in place at each iteration
+        n_steps = self.statePlanner.getNSteps()
+        self.xref = np.zeros((12, n_steps + 1))  # Reference trajectory of the base
+        self.fsteps = np.zeros((params.N_gait, 12))  # Footsteps for each node of the MPC
+        self.cgait = self.gait.getCurrentGait()  # Current and future gait, one row per time step of dt_mpc
+        self.mpc_gait = self.gait.getMpcGait()  # Current and future gait, one row per node of the MPC
+        self.o_targetFootstep = np.zeros((3, 4))  # Target footsteps in world frame
+        self.o_feet_p = self.footTrajectoryGenerator.getFootPosition()  # Feet references in world frame
+        self.o_feet_v = self.footTrajectoryGenerator.getFootVelocity()
+        self.o_feet_a = self.footTrajectoryGenerator.getFootAcceleration()
 
         # Wrapper that makes the link with the solver that you want to use for the MPC
         self.mpc_wrapper = MPC_Wrapper.MPC_Wrapper(params, self.q)
 
         # ForceMonitor to display contact forces in PyBullet with red lines
         # import ForceMonitor
-        # myForceMonitor = ForceMonitor.ForceMonitor(pyb_sim.robotId, pyb_sim.planeId)
+        # self.myForceMonitor = ForceMonitor.ForceMonitor(device.pyb_sim.robotId, device.pyb_sim.planeId)
+        self.myForceMonitor = None
 
         # Define the default controller
         self.myController = wbc_controller(params)
@@ -170,8 +180,28 @@ class Controller:
         self.feet_v_cmd = np.zeros((3, 4))
         self.feet_p_cmd = np.zeros((3, 4))
 
+        # Workspace buffers updated in place at each iteration to avoid allocations in the control loop
+        self.q_wbc = np.zeros((19, 1))
+        self.q_wbc[2, 0] = self.h_ref  # at position (0.0, 0.0, h_ref)
+        self.q_wbc[6, 0] = 1.0  # with orientation (0.0, 0.0, 0.0)
+        self.x_f_wbc = np.zeros(24)
+        self.oRh = np.eye(3)  # Rotation between world and horizontal frames
+        self.oTh = np.zeros((3, 1))  # Translation between world and horizontal frames
+        self.Ryaw = np.zeros((2, 2))
+        self.vxy_tmp = np.zeros((2, 1))
+        self.h_ref_vec = np.array([[0.0], [0.0], [self.h_ref]])
+        self.l_targetFootstep_zero = np.zeros((3, 4))
+        self.feet_tmp = np.zeros((3, 4))
+        self.cross_tmp = np.zeros((3, 4))
+        self.skew_tmp = np.zeros((3, 3))
+        self.hRb = np.eye(3)  # Rotation between horizontal and base frames
+        self.rpy_tmp = np.zeros(3)
+        self.rows_footsteps = 24 + 2 * np.arange(4)  # Rows of the footsteps optimized by the MPC (type 3)
+
         self.error_flag = 0
         self.q_security = np.array([np.pi*0.4, np.pi*80/180, np.pi] * 4)
+        self.abs_tmp = np.zeros(12)
+        self.over_tmp = np.zeros(12, dtype=bool)
 
         # Interface with the PD+ on the control board
         self.result = Result()
@@ -194,56 +224,52 @@ class Controller:
             device (object): Interface with the masterboard or the simulation
         """
 
-        t_start = time.time()
+        self.profiler.start()
 
         # Update the reference velocity coming from the gamepad
         self.joystick.update_v_ref(self.k, self.velID)
 
         # Process state estimator
-        self.estimator.run_filter(self.k, self.gait.getCurrentGait(),
-                                  device, self.footTrajectoryGenerator.getFootPosition())
+        self.estimator.run_filter(self.k, self.cgait, device, self.o_feet_p)
 
-        t_filter = time.time()
+        self.profiler.mark(ST_FILTER)
 
         # Update state vectors of the robot (q and v) + transformation matrices between world and horizontal frames
         oRh, oTh = self.updateState()
 
-        # Update gait
-        self.gait.updateGait(self.k, self.k_mpc, self.q[0:7, 0:1], self.joystick.joystick_code)
+        self.profiler.mark(ST_STATE)
 
-        # Compute target footstep based on current and reference velocities
-        o_targetFootstep = self.footstepPlanner.updateFootsteps(self.k % self.k_mpc == 0 and self.k != 0,
-                                                                int(self.k_mpc - self.k % self.k_mpc),
-                                                                self.q[0:7, 0:1],
-                                                                self.h_v[0:6, 0:1].copy(),
-                                                                self.v_ref[0:6, 0])
+        # Run the planner: update gait, compute target footsteps based on current and reference velocities,
+        # compute the reference trajectory of the base and update pos, vel and acc references for feet.
+        # With the MPC that optimizes footsteps, feet references are updated once the MPC has been solved
+        update_feet = (self.type_MPC != 3)
+        self.planner.runPlanner(self.k, self.q[0:7, 0:1], self.h_v[0:6, 0:1], self.v_ref[0:6, 0:1],
+                                self.joystick.joystick_code, update_feet, self.xref, self.fsteps, self.cgait,
+                                self.o_targetFootstep, self.o_feet_p, self.o_feet_v, self.o_feet_a)
+        self.gait.getMpcGait(self.mpc_gait)
+        xref = self.xref
+        fsteps = self.fsteps
+        cgait = self.cgait
+        mpc_gait = self.mpc_gait
+        o_targetFootstep = self.o_targetFootstep
 
-        # Run state planner (outputs the reference trajectory of the base)
-        self.statePlanner.computeReferenceStates(self.q[0:7, 0:1], self.h_v[0:6, 0:1].copy(),
-                                                 self.v_ref[0:6, 0:1], 0.0)
-
-        # Result can be retrieved with self.statePlanner.getReferenceStates()
-        xref = self.statePlanner.getReferenceStates()
-        fsteps = self.footstepPlanner.getFootsteps()
-        cgait = self.gait.getCurrentGait()
-
-        t_planner = time.time()
+        self.profiler.mark(ST_PLANNER)
 
         # Solve MPC problem once every k_mpc iterations of the main loop
         if (self.k % self.k_mpc) == 0:
             try:
                 if self.type_MPC == 3 :
                     # Compute the target foostep in local frame, to stop the optimisation around it when t_lock overpass
-                    l_targetFootstep = self.footstepPlanner.getRz().transpose() @ self.footTrajectoryGenerator.getFootPosition() - self.q[0:3,0:1]
-                    self.mpc_wrapper.solve(self.k, xref, fsteps, cgait, l_targetFootstep)
+                    l_targetFootstep = self.footstepPlanner.getRz().transpose() @ self.o_feet_p - self.q[0:3,0:1]
+                    self.mpc_wrapper.solve(self.k, xref, fsteps, mpc_gait, l_targetFootstep)
                 else :
-                    self.mpc_wrapper.solve(self.k, xref, fsteps, cgait, np.zeros((3,4)))
+                    self.mpc_wrapper.solve(self.k, xref, fsteps, mpc_gait, self.l_targetFootstep_zero)
 
             except ValueError:
                 print("MPC Problem")
 
         # Retrieve reference contact forces in horizontal frame
-        self.x_f_mpc = self.mpc_wrapper.get_latest_result()
+        self.x_f_mpc = self.mpc_wrapper.get_latest_result(self.k)
         """if self.k == 0:
             self.x_save = self.x_f_mpc[12:, :].copy()
         else:
@@ -252,21 +278,19 @@ class Controller:
         """from IPython import embed
         embed()"""
 
-        t_mpc = time.time()
-
         # If the MPC optimizes footsteps positions then we use them
         if self.k > 100 and self.type_MPC == 3 :
-            for foot in range(4):
-                id = 0
-                while cgait[id,foot] == 0 :
-                    id += 1
-                o_targetFootstep[:2,foot] = np.array(self.footstepPlanner.getRz()[:2, :2]) @ self.x_f_mpc[24 +  2*foot:24+2*foot+2, id] + np.array([self.q[0, 0] , self.q[1,0] ])
+            # First node of the MPC in which each foot is in stance phase
+            ids = np.argmax(mpc_gait != 0, axis=0)
+            xy = np.vstack((self.x_f_mpc[self.rows_footsteps, ids], self.x_f_mpc[self.rows_footsteps + 1, ids]))
+            o_targetFootstep[:2, :] = self.footstepPlanner.getRz()[:2, :2] @ xy + self.q[0:2, 0:1]
 
         # Update pos, vel and acc references for feet
-        self.footTrajectoryGenerator.update(self.k, o_targetFootstep)
+        if not update_feet:
+            self.planner.updateFootTrajectories(self.k, o_targetFootstep, self.o_feet_p, self.o_feet_v, self.o_feet_a)
 
         # Target state for the whole body control
-        self.x_f_wbc = (self.x_f_mpc[:24, 0]).copy()
+        self.x_f_wbc[:] = self.x_f_mpc[:24, 0]
         if not self.gait.getIsStatic():
             self.x_f_wbc[0] = self.myController.dt * xref[6, 1]
             self.x_f_wbc[1] = self.myController.dt * xref[7, 1]
@@ -279,32 +303,21 @@ class Controller:
             self.x_f_wbc[3:6] = self.planner.RPY_static[:, 0]
         self.x_f_wbc[6:12] = xref[6:, 1]
 
+        self.profiler.mark(ST_MPC)
+
         # Whole Body Control
         # If nothing wrong happened yet in the WBC controller
         if (not self.myController.error) and (not self.joystick.stop):
 
-            self.q_wbc = np.zeros((19, 1))
-            self.q_wbc[2, 0] = self.h_ref  # at position (0.0, 0.0, h_ref)
-            self.q_wbc[6, 0] = 1.0  # with orientation (0.0, 0.0, 0.0)
+            # Position (0.0, 0.0, h_ref) and orientation (0.0, 0.0, 0.0) are set once in the workspace
             self.q_wbc[7:, 0] = self.myController.qdes[7:]  # with reference angular positions of previous loop
 
             # Get velocity in base frame for Pinocchio (not current base frame but desired base frame)
-            self.b_v = self.v.copy()
             self.b_v[:6, 0] = self.v_ref[:6, 0]  # Base at reference velocity (TODO: add hRb once v_ref is considered in base frame)
             self.b_v[6:, 0] = self.myController.vdes[6:, 0]  # with reference angular velocities of previous loop
 
-            # Feet command acceleration in base frame
-            self.feet_a_cmd = oRh.transpose() @ self.footTrajectoryGenerator.getFootAcceleration() \
-                - self.cross12(self.v_ref[3:6, 0:1], self.cross12(self.v_ref[3:6, 0:1], self.feet_p_cmd)) \
-                - 2 * self.cross12(self.v_ref[3:6, 0:1], self.feet_v_cmd)
-
-            # Feet command velocity in base frame
-            self.feet_v_cmd = oRh.transpose() @ self.footTrajectoryGenerator.getFootVelocity()
-            self.feet_v_cmd = self.feet_v_cmd - self.v_ref[0:3, 0:1] - self.cross12(self.v_ref[3:6, 0:1], self.feet_p_cmd)
-
-            # Feet command position in base frame
-            self.feet_p_cmd = oRh.transpose() @ (self.footTrajectoryGenerator.getFootPosition()
-                                                 - np.array([[0.0], [0.0], [self.h_ref]]) - oTh)
+            # Feet commands in base frame
+            self.update_feet_cmd(oRh, oTh, self.o_feet_p, self.o_feet_v, self.o_feet_a)
 
             # Run InvKin + WBC QP
             self.myController.compute(self.q_wbc, self.b_v,
@@ -313,27 +326,40 @@ class Controller:
                                       self.feet_v_cmd,
                                       self.feet_a_cmd)
 
+            self.profiler.mark(ST_INVKIN, self.myController.tac)
+            self.profiler.mark(ST_QPWBC)
+
             # Quantities sent to the control board
-            self.result.P = 6.0 * np.ones(12)
-            self.result.D = 0.3 * np.ones(12)
+            self.result.P[:] = 6.0
+            self.result.D[:] = 0.3
             self.result.q_des[:] = self.myController.qdes[7:]
             self.result.v_des[:] = self.myController.vdes[6:, 0]
-            self.result.tau_ff[:] = 0.8 * self.myController.tau_ff
+            np.multiply(self.myController.tau_ff, 0.8, out=self.result.tau_ff)
 
             # Display robot in Gepetto corba viewer
             """if self.k % 5 == 0:
                 self.solo.display(self.q)"""
 
-        t_wbc = time.time()
-
         # Security check
         self.security_check()
 
+        self.profiler.mark(ST_SECURITY)
+
         # Update PyBullet camera
-        self.pyb_camera(device, 0.0)  # to have yaw update in simu: utils_mpc.quaternionToRPY(self.estimator.q_filt[3:7, 0])[2, 0]
+        if self.enable_pyb_GUI and self.shedder.run(SHED_CAMERA):
+            self.pyb_camera(device, 0.0)  # to have yaw update in simu: quaternion_to_rpy(self.estimator.q_filt[3:7, 0])[2]
+
+        # Display contact forces in PyBullet
+        if self.myForceMonitor is not None and self.shedder.run(SHED_FORCES):
+            self.myForceMonitor.display_contact_forces()
+
+        self.profiler.mark(ST_CAMERA)
 
         # Logs
-        self.log_misc(t_start, t_filter, t_planner, t_mpc, t_wbc)
+        self.log_misc()
+
+        self.profiler.mark(ST_LOGGING)
+        self.profiler.stop()
 
         # Increment loop counter
         self.k += 1
@@ -352,15 +378,16 @@ class Controller:
     def security_check(self):
 
         if (self.error_flag == 0) and (not self.myController.error) and (not self.joystick.stop):
-            if np.any(np.abs(self.estimator.q_filt[7:, 0]) > self.q_security):
+            np.abs(self.estimator.q_filt[7:, 0], out=self.abs_tmp)
+            if np.greater(self.abs_tmp, self.q_security, out=self.over_tmp).any():
                 self.myController.error = True
                 self.error_flag = 1
                 self.error_value = self.estimator.q_filt[7:, 0] * 180 / 3.1415
-            if np.any(np.abs(self.estimator.v_secu) > 50):
+            if np.abs(self.estimator.v_secu, out=self.abs_tmp).max() > 50:
                 self.myController.error = True
                 self.error_flag = 2
                 self.error_value = self.estimator.v_secu
-            if np.any(np.abs(self.myController.tau_ff) > 8):
+            if np.abs(self.myController.tau_ff, out=self.abs_tmp).max() > 8:
                 print(self.result.P)
                 print(self.result.D)
                 print(self.result.q_des)
@@ -374,26 +401,18 @@ class Controller:
         if self.myController.error or self.joystick.stop:
 
             # Quantities sent to the control board
-            self.result.P = np.zeros(12)
-            self.result.D = 0.1 * np.ones(12)
-            self.result.q_des[:] = np.zeros(12)
-            self.result.v_des[:] = np.zeros(12)
-            self.result.tau_ff[:] = np.zeros(12)
+            self.result.P[:] = 0.0
+            self.result.D[:] = 0.1
+            self.result.q_des[:] = 0.0
+            self.result.v_des[:] = 0.0
+            self.result.tau_ff[:] = 0.0
 
-    def log_misc(self, tic, t_filter, t_planner, t_mpc, t_wbc):
+    def log_misc(self):
 
         # Log joystick command
         if self.joystick is not None:
             self.estimator.v_ref = self.joystick.v_ref
 
-        self.t_list_filter[self.k] = t_filter - tic
-        self.t_list_planner[self.k] = t_planner - t_filter
-        self.t_list_mpc[self.k] = t_mpc - t_planner
-        self.t_list_wbc[self.k] = t_wbc - t_mpc
-        self.t_list_loop[self.k] = time.time() - tic
-        self.t_list_InvKin[self.k] = self.myController.tac - self.myController.tic
-        self.t_list_QPWBC[self.k] = self.myController.toc - self.myController.tac
-
     def updateState(self):
 
         # Update reference velocity vector
@@ -404,26 +423,28 @@ class Controller:
         # Update position and velocity state vectors
         if not self.gait.getIsStatic():
             # Integration to get evolution of perfect x, y and yaw
-            Ryaw = np.array([[math.cos(self.yaw_estim), -math.sin(self.yaw_estim)],
-                             [math.sin(self.yaw_estim), math.cos(self.yaw_estim)]])
-
-            self.q[0:2, 0:1] = self.q[0:2, 0:1] + Ryaw @ self.v_ref[0:2, 0:1] * self.myController.dt
+            yaw_rotation(self.yaw_estim, out=self.Ryaw)
+            np.matmul(self.Ryaw, self.v_ref[0:2, 0:1], out=self.vxy_tmp)
+            self.vxy_tmp *= self.myController.dt
+            self.q[0:2, 0:1] += self.vxy_tmp
 
             # Mix perfect x and y with height measurement
             self.q[2, 0] = self.estimator.q_filt[2, 0]
 
             # Mix perfect yaw with pitch and roll measurements
-            self.yaw_estim += self.v_ref[5, 0:1] * self.myController.dt
-            self.q[3:7, 0] = self.estimator.EulerToQuaternion([self.estimator.RPY[0], self.estimator.RPY[1], self.yaw_estim])
+            self.yaw_estim += self.v_ref[5, 0] * self.myController.dt
+            self.rpy_tmp[0:2] = self.estimator.RPY[0:2, 0]
+            self.rpy_tmp[2] = self.yaw_estim
+            rpy_to_quaternion(self.rpy_tmp, out=self.q[3:7, 0])
 
             # Actuators measurements
             self.q[7:, 0] = self.estimator.q_filt[7:, 0]
 
             # Velocities are the one estimated by the estimator
-            self.v = self.estimator.v_filt.copy()
-            hRb = utils_mpc.EulerToRotation(self.estimator.RPY[0], self.estimator.RPY[1], 0.0)
-            self.h_v[0:3, 0:1] = hRb @ self.v[0:3, 0:1]
-            self.h_v[3:6, 0:1] = hRb @ self.v[3:6, 0:1]
+            self.v[:, :] = self.estimator.v_filt
+            hRb = rpy_to_rotation(self.estimator.RPY[0, 0], self.estimator.RPY[1, 0], 0.0, out=self.hRb)
+            np.matmul(hRb, self.v[0:3, 0:1], out=self.h_v[0:3, 0:1])
+            np.matmul(hRb, self.v[3:6, 0:1], out=self.h_v[3:6, 0:1])
 
             # self.v[:6, 0] = self.joystick.v_ref[:6, 0]
         else:
@@ -433,24 +454,41 @@ class Controller:
             # TODO: Adapt static mode to new version of the code
 
         # Transformation matrices between world and horizontal frames
-        oRh = np.eye(3)
-        c = math.cos(self.yaw_estim)
-        s = math.sin(self.yaw_estim)
-        oRh[0:2, 0:2] = np.array([[c, -s], [s, c]])
-        oTh = np.array([[self.q[0, 0]], [self.q[1, 0]], [0.0]])
+        yaw_rotation(self.yaw_estim, out=self.oRh)
+        self.oTh[0, 0] = self.q[0, 0]
+        self.oTh[1, 0] = self.q[1, 0]
 
-        return oRh, oTh
+        return self.oRh, self.oTh
 
-    def cross12(self, left, right):
-        """Numpy is inefficient for this
+    def update_feet_cmd(self, oRh, oTh, o_feet_p, o_feet_v, o_feet_a):
+        """Update the position, velocity and acceleration commands of the feet in base frame, in place
 
         Args:
-            left (3x1 array): left term of the cross product
-            right (3x4 array): right term of the cross product
+            oRh (3x3 array): rotation between world and horizontal frames
+            oTh (3x1 array): translation between world and horizontal frames
+            o_feet_p (3x4 array): reference position of the feet in world frame
+            o_feet_v (3x4 array): reference velocity of the feet in world frame
+            o_feet_a (3x4 array): reference acceleration of the feet in world frame
         """
-        res = np.zeros((3, 4))
-        for i in range(4):
-            res[:, i] = np.array([left[1, 0] * right[2, i] - left[2, 0] * right[1, i],
-                                  left[2, 0] * right[0, i] - left[0, 0] * right[2, i],
-                                  left[0, 0] * right[1, i] - left[1, 0] * right[0, i]])
-        return res
+
+        w = self.v_ref[3:6, 0:1]
+
+        # Feet command acceleration in base frame (uses the commands of the previous iteration)
+        np.matmul(oRh.transpose(), o_feet_a, out=self.feet_a_cmd)
+        cross(w, self.feet_p_cmd, self.feet_tmp, self.skew_tmp)
+        cross(w, self.feet_tmp, self.cross_tmp, self.skew_tmp)
+        self.feet_a_cmd -= self.cross_tmp
+        cross(w, self.feet_v_cmd, self.cross_tmp, self.skew_tmp)
+        self.cross_tmp *= 2.0
+        self.feet_a_cmd -= self.cross_tmp
+
+        # Feet command velocity in base frame
+        np.matmul(oRh.transpose(), o_feet_v, out=self.feet_v_cmd)
+        self.feet_v_cmd -= self.v_ref[0:3, 0:1]
+        cross(w, self.feet_p_cmd, self.cross_tmp, self.skew_tmp)
+        self.feet_v_cmd -= self.cross_tmp
+
+        # Feet command position in base frame
+        np.subtract(o_feet_p, self.h_ref_vec, out=self.feet_tmp)
+        self.feet_tmp -= oTh
+        np.matmul(oRh.transpose(), self.feet_tmp, out=self.feet_p_cmd)
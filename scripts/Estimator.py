@@ -3,6 +3,7 @@
 import numpy as np
 import pinocchio as pin
 from example_robot_data.robots_loader import Solo12Loader
+from utils_kinematics import cross, quaternion_to_rpy, rpy_to_quaternion, rpy_to_rotation
 
 
 class KFilter:
@@ -201,6 +202,7 @@ class ComplementaryFilter:
         self.HP_x = np.zeros(3)
         self.LP_x = np.zeros(3)
         self.filt_x = np.zeros(3)
+        self.tmp = np.zeros(3)
 
     def compute(self, x, dx, alpha=None):
         """Run one step of complementary filter
@@ -220,13 +222,18 @@ class ComplementaryFilter:
         self.dx = dx
 
         # Process high pass filter
-        self.HP_x[:] = self.alpha * (self.HP_x + dx * self.dt)
+        np.multiply(dx, self.dt, out=self.tmp)
+        self.HP_x += self.tmp
+        self.HP_x *= self.alpha
 
         # Process low pass filter
-        self.LP_x[:] = self.alpha * self.LP_x + (1.0 - self.alpha) * x
+        np.subtract(1.0, self.alpha, out=self.tmp)
+        self.tmp *= x
+        self.LP_x *= self.alpha
+        self.LP_x += self.tmp
 
         # Add both
-        self.filt_x[:] = self.HP_x + self.LP_x
+        np.add(self.HP_x, self.LP_x, out=self.filt_x)
 
         return self.filt_x
 
@@ -273,6 +280,7 @@ class Estimator:
         self.IMU_lin_acc = np.zeros((3, ))  # Linear acceleration (gravity debiased)
         self.IMU_ang_vel = np.zeros((3, ))  # Angular velocity (gyroscopes)
         self.IMU_ang_pos = np.zeros((4, ))  # Angular position (estimation of IMU)
+        self.RPY = np.zeros((3, 1))  # Roll, pitch and yaw of the base (estimation of IMU)
 
         # Forward Kinematics data
         self.FK_lin_vel = np.zeros((3, ))  # Linear velocity
@@ -320,8 +328,30 @@ class Estimator:
         self.actuators_vel = np.zeros((12, ))
 
         # Transform between the base frame and the IMU frame
-        self._1Mi = pin.SE3(pin.Quaternion(np.array([[0.0, 0.0, 0.0, 1.0]]).T),
-                            np.array([0.1163, 0.0, 0.02]))
+        self._1pi = np.array([0.1163, 0.0, 0.02])  # Position of the IMU in base frame
+        self._1Mi = pin.SE3(pin.Quaternion(np.array([[0.0, 0.0, 0.0, 1.0]]).T), self._1pi)
+
+        # Workspace buffers updated in place at each iteration to avoid allocations in the control loop
+        self.same_status = np.zeros(4, dtype=bool)
+        self.feet_weights = np.zeros(4)
+        self.vel_est = np.zeros(3)
+        self.xyz_est = np.zeros(3)
+        self.xyz_estimated = np.zeros(3)
+        self._Fv1F = np.zeros(3)
+        self._1MF = np.zeros((4, 4))
+        self._1v01 = np.zeros(3)
+        self.oRb = np.zeros((3, 3))
+        self.cross_product = np.zeros(3)
+        self.i_FK_lin_vel = np.zeros(3)
+        self.oi_FK_lin_vel = np.zeros(3)
+        self.oi_lin_acc = np.zeros(3)
+        self.i_filt_lin_vel = np.zeros(3)
+        self.ob_filt_lin_vel = np.zeros(3)
+        self.xyz_FK_feet = np.zeros(3)
+        self.alpha_xyz_pos = np.array([0.995, 0.995, 0.9])
+        self.vel_tmp = np.zeros(3)
+        self.skew_tmp = np.zeros((3, 3))
+        self.secu_tmp = np.zeros(12)
 
         # Logging matrices
         self.log_v_truth = np.zeros((3, N_simulation))
@@ -358,15 +388,13 @@ class Estimator:
         self.IMU_ang_vel[:] = device.baseAngularVelocity
 
         # Angular position of the trunk (local frame)
-        self.RPY = self.quaternionToRPY(device.baseOrientation)
+        quaternion_to_rpy(device.baseOrientation, out=self.RPY[:, 0])
 
         if (self.k_log <= 1):
             self.offset_yaw_IMU = self.RPY[2, 0]
         self.RPY[2] -= self.offset_yaw_IMU  # Remove initial offset of IMU
 
-        self.IMU_ang_pos[:] = self.EulerToQuaternion([self.RPY[0],
-                                                      self.RPY[1],
-                                                      self.RPY[2]])
+        rpy_to_quaternion(self.RPY[:, 0], out=self.IMU_ang_pos)
         # Above could be commented since IMU_ang_pos yaw is not used anywhere and instead
         # replace by: self.IMU_ang_pos[:] = device.baseOrientation
 
@@ -399,7 +427,8 @@ class Estimator:
         # Linear and angular velocities of the base remain at 0
 
         # Update model used for the forward kinematics
-        self.q_FK[3:7, 0] = np.array([0.0, 0.0, 0.0, 1.0])
+        self.q_FK[3:6, 0] = 0.0
+        self.q_FK[6, 0] = 1.0
         pin.forwardKinematics(self.model, self.data, self.q_FK, self.v_FK)
         # pin.updateFramePlacements(self.model, self.data)
 
@@ -409,26 +438,28 @@ class Estimator:
 
         # Get estimated velocity from updated model
         cpt = 0
-        vel_est = np.zeros((3, ))
-        xyz_est = np.zeros((3, ))
-        for i in (np.where(feet_status == 1))[0]:  # Consider only feet in contact
-            if self.k_since_contact[i] >= 16:  # Security margin after the contact switch
+        vel_est = self.vel_est
+        xyz_est = self.xyz_est
+        vel_est[:] = 0.0
+        xyz_est[:] = 0.0
+        for i in range(4):
+            # Consider only feet in contact, with a security margin after the contact switch
+            if feet_status[i] == 1 and self.k_since_contact[i] >= 16:
 
                 # Estimated velocity of the base using the considered foot
                 vel_estimated_baseframe = self.BaseVelocityFromKinAndIMU(self.indexes[i])
 
                 # Estimated position of the base using the considered foot
-                framePlacement = pin.updateFramePlacement(
-                    self.model_for_xyz, self.data_for_xyz, self.indexes[i])
-                xyz_estimated = -framePlacement.translation
+                xyz_estimated = np.negative(pin.updateFramePlacement(
+                    self.model_for_xyz, self.data_for_xyz, self.indexes[i]).translation, out=self.xyz_estimated)
 
                 # Logging
-                self.log_v_est[:, i, self.k_log] = vel_estimated_baseframe[0:3, 0]
+                self.log_v_est[:, i, self.k_log] = vel_estimated_baseframe
                 self.log_h_est[i, self.k_log] = xyz_estimated[2]
 
                 # Increment counter and add estimated quantities to the storage variables
                 cpt += 1
-                vel_est += vel_estimated_baseframe[:, 0]  # Linear velocity
+                vel_est += vel_estimated_baseframe  # Linear velocity
                 xyz_est += xyz_estimated  # Position
 
                 r_foot = 0.025 # 0.0155  # 31mm of diameter on meshlab
@@ -439,8 +470,8 @@ class Estimator:
 
         # If at least one foot is in contact, we do the average of feet results
         if cpt > 0:
-            self.FK_lin_vel = vel_est / cpt
-            self.FK_xyz = xyz_est / cpt
+            np.divide(vel_est, cpt, out=self.FK_lin_vel)
+            np.divide(xyz_est, cpt, out=self.FK_xyz)
 
         return 0
 
@@ -452,14 +483,12 @@ class Estimator:
             goals (3x4 array): Target locations of feet on the ground
         """
 
-        cpt = 0
-        xyz_feet = np.zeros(3)
-        for i in (np.where(feet_status == 1))[0]:  # Consider only feet in contact
-            cpt += 1
-            xyz_feet += goals[:, i]
         # If at least one foot is in contact, we do the average of feet results
+        np.equal(feet_status, 1, out=self.feet_weights)  # Consider only feet in contact
+        cpt = self.feet_weights.sum()
         if cpt > 0:
-            self.xyz_mean_feet = xyz_feet / cpt
+            np.matmul(goals, self.feet_weights, out=self.xyz_mean_feet)
+            self.xyz_mean_feet /= cpt
 
         return 0
 
@@ -473,9 +502,10 @@ class Estimator:
             goals (3x4 array): Target locations of feet on the ground
         """
 
-        feet_status = gait[0, :].copy()  # Current contact state of feet
+        feet_status = self.feet_status  # Current contact state of feet (also saved for logging)
+        feet_status[:] = gait[0, :]
         remaining_steps = 1  # Remaining MPC steps for the current gait phase
-        while (np.array_equal(feet_status, gait[remaining_steps, :])):
+        while np.equal(feet_status, gait[remaining_steps, :], out=self.same_status).all():
             remaining_steps += 1
 
         # Update IMU data
@@ -518,39 +548,36 @@ class Estimator:
 
         if not self.kf_enabled:  # Use cascade of complementary filters
 
-            # Rotation matrix to go from base frame to world frame
-            oRb = pin.Quaternion(np.array([self.IMU_ang_pos]).T).toRotationMatrix()
+            # Rotation matrix to go from base frame to world frame (same orientation as IMU_ang_pos)
+            oRb = rpy_to_rotation(self.RPY[0, 0], self.RPY[1, 0], self.RPY[2, 0], out=self.oRb)
 
             """self.debug_o_lin_vel += 0.002 * (oRb @ np.array([self.IMU_lin_acc]).T)  # TOREMOVE
             self.filt_lin_vel[:] = (oRb.T @ self.debug_o_lin_vel).ravel()"""
 
             # Get FK estimated velocity at IMU location (base frame)
-            cross_product = self.cross3(self._1Mi.translation.ravel(), self.IMU_ang_vel).ravel()
-            i_FK_lin_vel = self.FK_lin_vel[:] + cross_product
+            cross_product = cross(self._1pi, self.IMU_ang_vel, self.cross_product, self.skew_tmp)
+            np.add(self.FK_lin_vel, cross_product, out=self.i_FK_lin_vel)
 
             # Get FK estimated velocity at IMU location (world frame)
-            oi_FK_lin_vel = (oRb @ np.array([i_FK_lin_vel]).T).ravel()
+            np.matmul(oRb, self.i_FK_lin_vel, out=self.oi_FK_lin_vel)
 
             # Integration of IMU acc at IMU location (world frame)
-            oi_filt_lin_vel = self.filter_xyz_vel.compute(oi_FK_lin_vel,
-                                                          (oRb @ np.array([self.IMU_lin_acc]).T).ravel(),
-                                                          alpha=self.alpha)
+            np.matmul(oRb, self.IMU_lin_acc, out=self.oi_lin_acc)
+            oi_filt_lin_vel = self.filter_xyz_vel.compute(self.oi_FK_lin_vel, self.oi_lin_acc, alpha=self.alpha)
 
             # Filtered estimated velocity at IMU location (base frame)
-            i_filt_lin_vel = (oRb.T @ np.array([oi_filt_lin_vel]).T).ravel()
+            np.matmul(oRb.T, oi_filt_lin_vel, out=self.i_filt_lin_vel)
 
-            # Filtered estimated velocity at center base (base frame)
-            b_filt_lin_vel = i_filt_lin_vel - cross_product
+            # Filtered estimated velocity at center base (base frame), i.e. velocity of the center of the base
+            np.subtract(self.i_filt_lin_vel, cross_product, out=self.filt_lin_vel)
 
             # Filtered estimated velocity at center base (world frame)
-            ob_filt_lin_vel = (oRb @ np.array([b_filt_lin_vel]).T).ravel()
+            np.matmul(oRb, self.filt_lin_vel, out=self.ob_filt_lin_vel)
 
             # Position of the center of the base from FGeometry and filtered velocity (world frame)
-            self.filt_lin_pos[:] = self.filter_xyz_pos.compute(
-                self.FK_xyz[:] + self.xyz_mean_feet[:], ob_filt_lin_vel, alpha=np.array([0.995, 0.995, 0.9]))
-
-            # Velocity of the center of the base (base frame)
-            self.filt_lin_vel[:] = b_filt_lin_vel 
+            np.add(self.FK_xyz, self.xyz_mean_feet, out=self.xyz_FK_feet)
+            self.filt_lin_pos[:] = self.filter_xyz_pos.compute(self.xyz_FK_feet, self.ob_filt_lin_vel,
+                                                               alpha=self.alpha_xyz_pos)
 
         else:  # Use Kalman filter
 
@@ -575,14 +602,13 @@ class Estimator:
             self.kf.correct(self.Z)
 
             # Retrieve and store results
-            cross_product = self.cross3(self._1Mi.translation.ravel(), self.IMU_ang_vel).ravel()
+            cross_product = cross(self._1Mi.translation, self.IMU_ang_vel)
             self.filt_lin_pos[:] = self.kf.X[0:3, 0] - self._1Mi.translation.ravel()  # base position in world frame
             self.filt_lin_vel[:] = oRb.transpose() @ (self.kf.X[3:6, 0] - cross_product)  # base velocity in base frame
 
         # Logging
         self.log_alpha[self.k_log] = self.alpha
-        self.feet_status[:] = feet_status  # Save contact status sent to the estimator for logging
-        self.feet_goals[:, :] = goals.copy()  # Save feet goals sent to the estimator for logging
+        self.feet_goals[:, :] = goals  # Save feet goals sent to the estimator for logging
         self.log_IMU_lin_acc[:, self.k_log] = self.IMU_lin_acc[:]
         self.log_HP_lin_vel[:, self.k_log] = self.HP_lin_vel[:]
         self.log_LP_lin_vel[:, self.k_log] = self.LP_lin_vel[:]
@@ -599,9 +625,11 @@ class Estimator:
 
         # Output filtered velocity vector (18 x 1)
         if self.perfectEstimator:  # Linear velocities directly from PyBullet
-            self.v_filt[0:3, 0] = (1 - self.alpha_v) * self.v_filt[0:3, 0] + self.alpha_v * device.b_baseVel
+            np.multiply(device.b_baseVel, self.alpha_v, out=self.vel_tmp)
         else:
-            self.v_filt[0:3, 0] = (1 - self.alpha_v) * self.v_filt[0:3, 0] + self.alpha_v * self.filt_lin_vel
+            np.multiply(self.filt_lin_vel, self.alpha_v, out=self.vel_tmp)
+        self.v_filt[0:3, 0] *= (1 - self.alpha_v)
+        self.v_filt[0:3, 0] += self.vel_tmp
         self.v_filt[3:6, 0] = self.filt_ang_vel  # Angular velocities are already directly from PyBullet
         self.v_filt[6:, 0] = self.actuators_vel  # Actuators velocities are already directly from PyBullet
 
@@ -621,97 +649,43 @@ class Estimator:
         ###
 
         # Output filtered actuators velocity for security checks
-        self.v_secu[:] = (1 - self.alpha_secu) * self.actuators_vel + self.alpha_secu * self.v_secu[:]
+        np.multiply(self.actuators_vel, 1 - self.alpha_secu, out=self.secu_tmp)
+        self.v_secu *= self.alpha_secu
+        self.v_secu += self.secu_tmp
 
         # Increment iteration counter
         self.k_log += 1
 
         return 0
 
-    def cross3(self, left, right):
-        """Numpy is inefficient for this
-
-        Args:
-            left (3x0 array): left term of the cross product
-            right (3x0 array): right term of the cross product
-        """
-        return np.array([[left[1] * right[2] - left[2] * right[1]],
-                         [left[2] * right[0] - left[0] * right[2]],
-                         [left[0] * right[1] - left[1] * right[0]]])
-
     def BaseVelocityFromKinAndIMU(self, contactFrameId):
         """Estimate the velocity of the base with forward kinematics using a contact point
-        that is supposed immobile in world frame
+        that is supposed immobile in world frame. The returned array is overwritten by the next call
 
         Args:
             contactFrameId (int): ID of the contact point frame (foot frame)
         """
 
-        frameVelocity = pin.getFrameVelocity(
-            self.model, self.data, contactFrameId, pin.ReferenceFrame.LOCAL)
-        framePlacement = pin.updateFramePlacement(
-            self.model, self.data, contactFrameId)
+        # Linear velocity of the foot wrt the base in the foot frame
+        self._Fv1F[:] = pin.getFrameVelocity(self.model, self.data, contactFrameId, pin.ReferenceFrame.LOCAL).linear
+        # Placement of the foot wrt the base
+        self._1MF[:, :] = pin.updateFramePlacement(self.model, self.data, contactFrameId).homogeneous
 
         # Angular velocity of the base wrt the world in the base frame (Gyroscope)
-        _1w01 = self.IMU_ang_vel.reshape((3, 1))
-        # Linear velocity of the foot wrt the base in the foot frame
-        _Fv1F = frameVelocity.linear
+        _1w01 = self.IMU_ang_vel
         # Level arm between the base and the foot
-        _1F = np.array(framePlacement.translation)
+        _1F = self._1MF[:3, 3]
         # Orientation of the foot wrt the base
-        _1RF = framePlacement.rotation
+        _1RF = self._1MF[:3, :3]
         # Linear velocity of the base wrt world in the base frame
-        _1v01 = self.cross3(_1F.ravel(), _1w01.ravel()) - \
-            (_1RF @ _Fv1F.reshape((3, 1)))
+        cross(_1F, _1w01, self._1v01, self.skew_tmp)
+        np.matmul(_1RF, self._Fv1F, out=self.vel_tmp)
+        self._1v01 -= self.vel_tmp
 
         # IMU and base frames have the same orientation
-        # _iv0i = _1v01 + self.cross3(self._1Mi.translation.ravel(), _1w01.ravel())
-
-        return np.array(_1v01)
-
-    def EulerToQuaternion(self, roll_pitch_yaw):
-        roll, pitch, yaw = roll_pitch_yaw
-        sr = np.sin(roll/2.)
-        cr = np.cos(roll/2.)
-        sp = np.sin(pitch/2.)
-        cp = np.cos(pitch/2.)
-        sy = np.sin(yaw/2.)
-        cy = np.cos(yaw/2.)
-        qx = sr * cp * cy - cr * sp * sy
-        qy = cr * sp * cy + sr * cp * sy
-        qz = cr * cp * sy - sr * sp * cy
-        qw = cr * cp * cy + sr * sp * sy
-        return [qx, qy, qz, qw]
-
-    def quaternionToRPY(self, quat):
-        qx = quat[0]
-        qy = quat[1]
-        qz = quat[2]
-        qw = quat[3]
-
-        rotateXa0 = 2.0*(qy*qz + qw*qx)
-        rotateXa1 = qw*qw - qx*qx - qy*qy + qz*qz
-        rotateX = 0.0
-
-        if (rotateXa0 != 0.0) and (rotateXa1 != 0.0):
-            rotateX = np.arctan2(rotateXa0, rotateXa1)
-
-        rotateYa0 = -2.0*(qx*qz - qw*qy)
-        rotateY = 0.0
-        if (rotateYa0 >= 1.0):
-            rotateY = np.pi/2.0
-        elif (rotateYa0 <= -1.0):
-            rotateY = -np.pi/2.0
-        else:
-            rotateY = np.arcsin(rotateYa0)
-
-        rotateZa0 = 2.0*(qx*qy + qw*qz)
-        rotateZa1 = qw*qw + qx*qx - qy*qy - qz*qz
-        rotateZ = 0.0
-        if (rotateZa0 != 0.0) and (rotateZa1 != 0.0):
-            rotateZ = np.arctan2(rotateZa0, rotateZa1)
+        # _iv0i = _1v01 + cross(self._1Mi.translation, _1w01)
 
-        return np.array([[rotateX], [rotateY], [rotateZ]])
+        return self._1v01
 
     def plot_graphs(self):
 
@@ -182,10 +182,12 @@ class Joystick:
 
         ev = k - self.k_switch[i-1]
         t1 = self.k_switch[i] - self.k_switch[i-1]
-        A3 = 2 * (self.v_switch[:, (i-1):i] -
-                  self.v_switch[:, i:(i+1)]) / t1**3
-        A2 = (-3/2) * t1 * A3
-        self.v_ref = self.v_switch[:, (i-1):i] + A2*ev**2 + A3*ev**3
+
+        # v_ref = v_start + A2 * ev^2 + A3 * ev^3 with A3 = 2 * (v_start - v_end) / t1^3 and A2 = -3/2 * t1 * A3,
+        # computed in place
+        np.subtract(self.v_switch[:, (i-1):i], self.v_switch[:, i:(i+1)], out=self.v_ref)
+        self.v_ref *= 2 * (ev**3 - 1.5 * t1 * ev**2) / t1**3
+        self.v_ref += self.v_switch[:, (i-1):i]
 
         return 0
 
@@ -230,13 +232,14 @@ class Joystick:
                                                 0.0, 0.0, 0.0, 0.0, R_max, R_max, 0.0, 0.0,
                                                 -R_max, 0.0])
         elif velID == 2:
-            self.k_switch = np.array([0, 7000, 14000, 20000, 30000])
-            self.v_switch = np.array([[0.0, 0.7, 1.3, 1.3, 1.3],
-                                      [0.0, 0.0, 0.0, 0.0, 0.0],
-                                      [0.0, 0.0, 0.0, 0.0, 0.0],
-                                      [0.0, 0.0, 0.0, 0.0, 0.0],
-                                      [0.0, 0.0, 0.0, 0.0, 0.0],
-                                      [0.0, 0.0, 0.0, 0.0, 0.0]])
+            if (k_loop == 0):
+                self.k_switch = np.array([0, 7000, 14000, 20000, 30000])
+                self.v_switch = np.array([[0.0, 0.7, 1.3, 1.3, 1.3],
+                                          [0.0, 0.0, 0.0, 0.0, 0.0],
+                                          [0.0, 0.0, 0.0, 0.0, 0.0],
+                                          [0.0, 0.0, 0.0, 0.0, 0.0],
+                                          [0.0, 0.0, 0.0, 0.0, 0.0],
+                                          [0.0, 0.0, 0.0, 0.0, 0.0]])
         elif velID == 3:
             if (k_loop == 0):
                 self.k_switch = np.array([0, 1000, 2000, 7000, 26000, 30000])
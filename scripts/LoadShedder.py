@@ -0,0 +1,107 @@
+# coding: utf8
+
+import numpy as np
+from array import array
+from time import perf_counter_ns
+
+# Non-critical work of the control loop, in the order in which it is shed when the loop is late
+SHED_LOGGING, SHED_CAMERA, SHED_FORCES = range(3)
+SHED_NAMES = ["logging", "camera", "forces"]
+
+
+class LoadShedder:
+    """Per-tick budget tracker that sheds non-critical work when the control loop is late. The work of each tick
+    (from start() to stop()) is compared to dt_wbc: every overrunning tick sheds one more item, in the order of
+    SHED_NAMES (LoggerControl only samples one tick out of LOG_DECIMATION, then the PyBullet camera is no longer
+    updated, then contact forces are no longer displayed). Items are restored one at a time, once the work of
+    RESTORE_TICKS consecutive ticks has stayed below RESTORE_RATIO of the budget, so that a transient spike only
+    sheds logging for a short while instead of causing a cascade of missed deadlines.
+
+    Usage: call start() at the beginning of the tick, check run(item) before running a non-critical item and call
+    stop() once the work of the tick is done. The level of each tick is recorded to know what was shed.
+
+    Args:
+        params (object): store parameters
+        size (int): number of ticks whose level is recorded
+    """
+
+    LOG_DECIMATION = 10  # One tick out of LOG_DECIMATION is logged while logging is shed
+    RESTORE_RATIO = 0.7  # Fraction of the budget below which a tick has enough slack
+    RESTORE_TICKS = 100  # Number of consecutive ticks with slack to restore one item
+
+    def __init__(self, params, size=10000):
+
+        self.enabled = params.enable_load_shedding
+        self.budget = int(params.dt_wbc * 1e9)  # [ns]
+        self.threshold = int(self.RESTORE_RATIO * self.budget)  # [ns]
+
+        self.level = 0  # Items whose index is lower than the level are shed
+        self.k = 0  # Number of ticks since the start
+        self.slack_ticks = 0  # Number of consecutive ticks with slack
+        self.t_start = 0
+
+        # Level of each tick, and number of ticks during which each item has been skipped
+        self.levels = array('b', bytes(size))
+        self.shed_count = [0] * len(SHED_NAMES)
+        self.overruns = 0
+        self.escalations = 0
+
+    def start(self):
+        """Start measuring the work of a new tick"""
+
+        self.t_start = perf_counter_ns()
+
+    def run(self, item):
+        """Return True if a non-critical item has to run during the current tick
+
+        Args:
+            item (int): index of the item in SHED_NAMES
+        """
+
+        if item >= self.level:
+            return True
+        if item == SHED_LOGGING and (self.k % self.LOG_DECIMATION) == 0:
+            return True
+        self.shed_count[item] += 1
+        return False
+
+    def stop(self):
+        """End the current tick and update the level for the next one depending on its duration"""
+
+        duration = perf_counter_ns() - self.t_start
+        if self.k < len(self.levels):
+            self.levels[self.k] = self.level
+        self.k += 1
+
+        if not self.enabled:
+            return
+
+        if duration > self.budget:
+            self.overruns += 1
+            self.slack_ticks = 0
+            if self.level < len(SHED_NAMES):
+                self.level += 1
+                self.escalations += 1
+        elif duration < self.threshold:
+            self.slack_ticks += 1
+            if self.slack_ticks >= self.RESTORE_TICKS and self.level > 0:
+                self.level -= 1
+                self.slack_ticks = 0
+        else:
+            self.slack_ticks = 0
+
+    def get_levels(self):
+        """Return the number of shed items during each recorded tick"""
+
+        return np.frombuffer(self.levels, dtype=np.int8, count=min(self.k, len(self.levels)))
+
+    def summary(self):
+        """Print the number of overruns and how many ticks each item has been shed"""
+
+        if not self.enabled:
+            return
+
+        print("Load shedding over " + str(self.k) + " ticks: " + str(self.overruns) + " overruns, " +
+              str(self.escalations) + " escalations")
+        for name, count in zip(SHED_NAMES, self.shed_count):
+            print("{:>16} skipped during {} ticks".format(name, count))
@@ -2,7 +2,12 @@
 import numpy as np
 from datetime import datetime as datetime
 from time import time
-from utils_mpc import quaternionToRPY
+from utils_kinematics import quaternion_to_rpy, rpy_to_quaternion
+from crocoddyl_class.CallbackTimeBudget import DDP_STATS, DDP_ITERATION_STATS
+
+# Statistics of the OSQP solvers (columns of mpc_stats and wbc_stats), see OsqpStats.toVector
+OSQP_STATS = ["iter", "status", "setup_time", "solve_time", "update_time", "run_time", "pri_res", "dua_res",
+              "obj_val"]
 
 
 class LoggerControl():
@@ -77,6 +82,13 @@ class LoggerControl():
                 self.mpc_x_f = np.zeros([logSize, 32, statePlanner.getNSteps()])
             else:
                 self.mpc_x_f = np.zeros([logSize, 24, statePlanner.getNSteps()])
+        self.mpc_stats = np.zeros([logSize, len(OSQP_STATS)])  # statistics of the OSQP MPC for the result in use
+        # statistics of the last solve of the Crocoddyl MPC (columns in DDP_STATS) and of each of its iterations
+        # (columns in DDP_ITERATION_STATS)
+        telemetry = loop.mpc_wrapper.get_ddp_telemetry() if loop is not None else None
+        n_iterations = telemetry[1].shape[0] if telemetry is not None else 0
+        self.mpc_ddp_stats = np.zeros([logSize, len(DDP_STATS)])
+        self.mpc_ddp_iterations = np.zeros([logSize, n_iterations, len(DDP_ITERATION_STATS)])
 
         # Whole body control
         self.wbc_x_f = np.zeros([logSize, 24])  # input vector of the WBC (next state + reference contact force)
@@ -94,10 +106,14 @@ class LoggerControl():
         self.wbc_feet_acc_target = np.zeros([logSize, 3, 4])  # current feet accelerations targets for WBC
         self.wbc_feet_pos_invkin = np.zeros([logSize, 3, 4])  # current feet positions according to InvKin
         self.wbc_feet_vel_invkin = np.zeros([logSize, 3, 4])  # current feet velocities according to InvKin
+        self.wbc_stats = np.zeros([logSize, len(OSQP_STATS)])  # statistics of the OSQP solver of the WBC
 
         # Timestamps
         self.tstamps = np.zeros(logSize)
 
+        # True for ticks that have been skipped to catch up with the deadline of the control loop
+        self.skipped = np.zeros(logSize, dtype=bool)
+
     def sample(self, joystick, estimator, loop, gait, statePlanner, footstepPlanner, footTrajectoryGenerator, wbc):
         if (self.i >= self.logSize):
             if self.ringBuffer:
@@ -153,6 +169,13 @@ class LoggerControl():
 
         # Logging from model predictive control
         self.mpc_x_f[self.i] = loop.x_f_mpc
+        stats = loop.mpc_wrapper.get_stats()
+        if stats is not None:
+            self.mpc_stats[self.i] = stats
+        telemetry = loop.mpc_wrapper.get_ddp_telemetry()
+        if telemetry is not None:
+            self.mpc_ddp_stats[self.i] = telemetry[0]
+            self.mpc_ddp_iterations[self.i] = telemetry[1]
 
         # Logging from whole body control
         self.wbc_x_f[self.i] = loop.x_f_wbc
@@ -170,9 +193,26 @@ class LoggerControl():
         self.wbc_feet_acc_target[self.i] = wbc.log_feet_acc_target[:, :, self.i+1]
         self.wbc_feet_pos_invkin[self.i] = wbc.invKin.cpp_posf.transpose()
         self.wbc_feet_vel_invkin[self.i] = wbc.invKin.cpp_vf.transpose()
+        self.wbc_stats[self.i] = wbc.box_qp.get_stats().toVector().ravel()
 
         # Logging timestamp
         self.tstamps[self.i] = time()
+        self.skipped[self.i] = False
+
+        self.i += 1
+
+    def skip(self):
+        """Only log the timestamp of the current tick, to keep the same time base as the other loggers when
+        sampling is decimated because the control loop is late"""
+
+        if (self.i >= self.logSize):
+            if self.ringBuffer:
+                self.i = 0
+            else:
+                return
+
+        self.tstamps[self.i] = time()
+        self.skipped[self.i] = True
 
         self.i += 1
 
@@ -190,7 +230,9 @@ class LoggerControl():
 
             self.mocap_b_v[i] = (oRb.transpose() @ loggerSensors.mocapVelocity[i].reshape((3, 1))).ravel()
             self.mocap_b_w[i] = (oRb.transpose() @ loggerSensors.mocapAngularVelocity[i].reshape((3, 1))).ravel()
-            self.mocap_RPY[i] = quaternionToRPY(loggerSensors.mocapOrientationQuat[i])[:, 0]
+
+        # Conversion of all orientations at once
+        self.mocap_RPY[:, :] = quaternion_to_rpy(loggerSensors.mocapOrientationQuat[:N].transpose()).transpose()
 
     def plotAll(self, loggerSensors):
 
@@ -337,8 +379,7 @@ class LoggerControl():
         # self.slider_predicted_footholds()
 
         # Analysis of the footholds locations during the whole experiment
-        """import utils_mpc
-        import pinocchio as pin
+        """import pinocchio as pin
         f_c = ["r", "b", "forestgreen", "rebeccapurple"]
         quat = np.zeros((4, 1))
         steps = np.zeros((12, 1))
@@ -347,8 +388,8 @@ class LoggerControl():
         plt.plot(self.loop_o_q_int[:, 0], self.loop_o_q_int[:, 1], linewidth=2, color="k")
         for i in range(self.planner_fsteps.shape[0]):
             fsteps = self.planner_fsteps[i]
-            RPY = utils_mpc.quaternionToRPY(self.loop_o_q_int[i, 3:7])
-            quat[:, 0] = utils_mpc.EulerToQuaternion([0.0, 0.0, RPY[2]])
+            RPY = quaternion_to_rpy(self.loop_o_q_int[i, 3:7])
+            quat[:, 0] = rpy_to_quaternion([0.0, 0.0, RPY[2]])
             oRh = pin.Quaternion(quat).toRotationMatrix()
             for j in range(4):
                 #if np.any(fsteps[k, (j*3):((j+1)*3)]) and not np.array_equal(steps[(j*3):((j+1)*3), 0],
@@ -599,6 +640,9 @@ class LoggerControl():
                  planner_h_ref=self.planner_h_ref,
 
                  mpc_x_f=self.mpc_x_f,
+                 mpc_stats=self.mpc_stats,
+                 mpc_ddp_stats=self.mpc_ddp_stats,
+                 mpc_ddp_iterations=self.mpc_ddp_iterations,
 
                  wbc_x_f=self.wbc_x_f,
                  wbc_P=self.wbc_P,
@@ -613,8 +657,10 @@ class LoggerControl():
                  wbc_feet_vel=self.wbc_feet_vel,
                  wbc_feet_vel_target=self.wbc_feet_vel_target,
                  wbc_feet_acc_target=self.wbc_feet_acc_target,
+                 wbc_stats=self.wbc_stats,
 
                  tstamps=self.tstamps,
+                 skipped=self.skipped,
 
                  q_mes=loggerSensors.q_mes,
                  v_mes=loggerSensors.v_mes,
@@ -684,6 +730,11 @@ class LoggerControl():
         self.planner_h_ref = data["planner_h_ref"]
 
         self.mpc_x_f = data["mpc_x_f"]
+        n_log = self.mpc_x_f.shape[0]
+        self.mpc_stats = data["mpc_stats"] if "mpc_stats" in data else np.zeros([n_log, len(OSQP_STATS)])
+        self.mpc_ddp_stats = data["mpc_ddp_stats"] if "mpc_ddp_stats" in data else np.zeros([n_log, len(DDP_STATS)])
+        self.mpc_ddp_iterations = (data["mpc_ddp_iterations"] if "mpc_ddp_iterations" in data
+                                   else np.zeros([n_log, 0, len(DDP_ITERATION_STATS)]))
 
         self.wbc_x_f = data["wbc_x_f"]
         self.wbc_P = data["wbc_P"]
@@ -698,8 +749,10 @@ class LoggerControl():
         self.wbc_feet_vel = data["wbc_feet_vel"]
         self.wbc_feet_vel_target = data["wbc_feet_vel_target"]
         self.wbc_feet_acc_target = data["wbc_feet_acc_target"]
+        self.wbc_stats = data["wbc_stats"] if "wbc_stats" in data else np.zeros([n_log, len(OSQP_STATS)])
 
         self.tstamps = data["tstamps"]
+        self.skipped = data["skipped"] if "skipped" in data else np.zeros(self.tstamps.shape[0], dtype=bool)
 
         # Load LoggerSensors arrays
         loggerSensors.q_mes = data["q_mes"]
@@ -839,7 +892,6 @@ class LoggerControl():
 
         from matplotlib import pyplot as plt
         from matplotlib.widgets import Slider, Button
-        import utils_mpc
         import pinocchio as pin
 
         self.planner_fsteps
@@ -857,8 +909,8 @@ class LoggerControl():
 
         fsteps = self.planner_fsteps[0]
         o_step = np.zeros((3*int(fsteps.shape[0]), 1))
-        RPY = utils_mpc.quaternionToRPY(self.loop_o_q_int[0, 3:7])
-        quat[:, 0] = utils_mpc.EulerToQuaternion([0.0, 0.0, RPY[2]])
+        RPY = quaternion_to_rpy(self.loop_o_q_int[0, 3:7])
+        quat[:, 0] = rpy_to_quaternion([0.0, 0.0, RPY[2]])
         oRh = pin.Quaternion(quat).toRotationMatrix()
         for j in range(4):
             o_step[0:3, 0:1] = oRh @ fsteps[0:1, (j*3):((j+1)*3)].transpose() + self.loop_o_q_int[0:1, 0:3].transpose()
@@ -886,8 +938,8 @@ class LoggerControl():
             rounded = int(np.round(time_slider.val / self.dt, decimals=0))
             fsteps = self.planner_fsteps[rounded]
             o_step = np.zeros((3*int(fsteps.shape[0]), 1))
-            RPY = utils_mpc.quaternionToRPY(self.loop_o_q_int[rounded, 3:7])
-            quat[:, 0] = utils_mpc.EulerToQuaternion([0.0, 0.0, RPY[2]])
+            RPY = quaternion_to_rpy(self.loop_o_q_int[rounded, 3:7])
+            quat[:, 0] = rpy_to_quaternion([0.0, 0.0, RPY[2]])
             oRh = pin.Quaternion(quat).toRotationMatrix()
             for j in range(4):
                 for k in range(int(fsteps.shape[0])):
@@ -2,8 +2,10 @@
 
 import numpy as np
 import libquadruped_reactive_walking as MPC
-from multiprocessing import Process, Value, Array
-from utils_mpc import quaternionToRPY
+from multiprocessing import Process, Value, Event, shared_memory
+from time import perf_counter
+from utils_kinematics import quaternion_to_rpy
+from RealTime import set_cpu_affinity
 import crocoddyl_class.MPC_crocoddyl as MPC_crocoddyl
 import crocoddyl_class.MPC_crocoddyl_planner as MPC_crocoddyl_planner
 
@@ -19,6 +21,110 @@ class Dummy:
         pass
 
 
+class SharedBuffer:
+    """Double buffer of named float64 arrays living in shared memory, to exchange data between the main loop and
+    the asynchronous MPC without going through pickling or Python-level copies.
+
+    There is a single writer that fills the slot which is not published, then publishes it. Each slot is protected by
+    a sequence counter (odd while the slot is being written) so that a reader can detect a torn read and retry.
+
+    Args:
+        fields (list): list of (name, shape) tuples describing the arrays stored in each slot
+    """
+
+    def __init__(self, fields):
+
+        self.fields = fields
+        self.size = int(sum([np.prod(shape) for _, shape in fields]))
+
+        # Header: [index of the published slot, sequence counter of slot 0, sequence counter of slot 1]
+        self.shm = shared_memory.SharedMemory(create=True, size=8 * (3 + 2 * self.size))
+        self.attach()
+        self.header[:] = 0
+        self.data[:, :] = 0.0
+
+    def attach(self):
+        """Create the NumPy views over the shared memory block"""
+
+        self.header = np.ndarray((3,), dtype=np.int64, buffer=self.shm.buf)
+        self.data = np.ndarray((2, self.size), dtype=np.float64, buffer=self.shm.buf, offset=8*3)
+
+        # Views of each named array in both slots
+        self.views = [{}, {}]
+        for slot in range(2):
+            offset = 0
+            for name, shape in self.fields:
+                n = int(np.prod(shape))
+                self.views[slot][name] = self.data[slot, offset:(offset+n)].reshape(shape)
+                offset += n
+
+    def __getstate__(self):
+        # Only the name of the block is sent to a spawned process, views are rebuilt on its side
+        return {"fields": self.fields, "size": self.size, "name": self.shm.name}
+
+    def __setstate__(self, state):
+        self.fields = state["fields"]
+        self.size = state["size"]
+        self.shm = shared_memory.SharedMemory(name=state["name"])
+        self.attach()
+
+    def allocate(self):
+        """Return a dictionary of arrays with the shapes of the fields, to be filled by read()"""
+
+        return {name: np.zeros(shape) for name, shape in self.fields}
+
+    def begin_write(self):
+        """Mark the slot that is not published as being written and return its views so that the caller can fill
+        them in place. Must be followed by a call to end_write()
+        """
+
+        slot = 1 - self.header[0]
+        self.header[1 + slot] += 1  # Odd: write in progress
+        return self.views[slot]
+
+    def end_write(self):
+        """Mark the slot that has been filled as consistent and publish it"""
+
+        slot = 1 - self.header[0]
+        self.header[1 + slot] += 1  # Even: slot is consistent
+        self.header[0] = slot
+
+    def write(self, **arrays):
+        """Copy the given arrays in the slot that is not published then publish it
+
+        Args:
+            arrays (dict): arrays to copy, keyed by field name
+        """
+
+        views = self.begin_write()
+        for name, value in arrays.items():
+            np.copyto(views[name], value)
+        self.end_write()
+
+    def read(self, out):
+        """Copy the content of the published slot into preallocated arrays, retrying if the slot has been
+        overwritten while copying
+
+        Args:
+            out (dict): preallocated arrays, keyed by field name (see allocate())
+        """
+
+        while True:
+            slot = self.header[0]
+            seq = self.header[1 + slot]
+            if seq % 2 == 1:
+                continue  # The writer has already come back to this slot, check the published index again
+            for name, value in out.items():
+                np.copyto(value, self.views[slot][name])
+            if self.header[1 + slot] == seq:
+                return out
+
+    def unlink(self):
+        """Release the shared memory block (mappings already opened by the processes remain valid)"""
+
+        self.shm.unlink()
+
+
 class MPC_Wrapper:
     """Wrapper to run both types of MPC (OQSP or Crocoddyl) with the possibility to run OSQP in
     a parallel process
@@ -35,32 +141,46 @@ class MPC_Wrapper:
 
     def __init__(self, params, q_init):
 
-        self.f_applied = np.zeros((12,))
         self.not_first_iter = False
 
         self.params = params
-        self.testoui = True
 
         # Number of WBC steps for 1 step of the MPC
         self.k_mpc = int(params.dt_mpc/params.dt_wbc)
 
         self.dt = params.dt_mpc
-        self.n_steps = np.int(params.T_mpc/params.dt_mpc)
+        self.grid = params.getMpcGrid().ravel()  # Duration of each node of the prediction horizon
+        self.n_steps = self.grid.size
+        self.node_starts = np.concatenate(([0.0], np.cumsum(self.grid)))  # Time at which each node starts
         self.T_gait = params.T_gait
         self.N_gait = params.N_gait
         self.gait_memory = np.zeros(4)
 
         self.mpc_type = params.type_MPC
+        if self.mpc_type != 0 and np.any(np.abs(self.grid - self.dt) > 1e-9):
+            raise ValueError("Only the OSQP MPC (type_MPC: 0) supports a non-uniform mpc_grid.")
         self.multiprocessing = params.enable_multiprocessing
-        if self.multiprocessing:  # Setup variables in the shared memory
-            self.newData = Value('b', False)
-            self.newResult = Value('b', False)            
+        self.async_mpc = None
+        self.cpu_mpc = params.realtime_cpu_mpc if params.enable_realtime else -1  # Core of the asynchronous MPC
+        if self.multiprocessing and self.mpc_type == 0:
+            # OSQP MPC runs in a background C++ thread, no need for a parallel process
+            self.async_mpc = MPC.AsyncMPC(params)
+            if self.cpu_mpc >= 0 and not self.async_mpc.set_cpu_affinity(self.cpu_mpc):
+                print("Warning: cannot pin the asynchronous MPC to CPU " + str(self.cpu_mpc))
+        elif self.multiprocessing:  # Setup variables in the shared memory
+            self.newData = Event()  # Set by the main loop to wake up the asynchronous MPC
+            self.newResult = Value('b', False)
+            self.t_dispatch = Value('d', 0.0)  # Time at which the last data has been sent to the parallel process
+            self.handoff_latency = Value('d', 0.0)  # Delay between sending the data and the wake up of the MPC
+            self.handoff_latency_max = Value('d', 0.0)  # Maximum delay observed since the start
+            fields_in = [("k", (1,)), ("xref", (12, self.n_steps+1)), ("fsteps", (self.N_gait, 12))]
             if self.mpc_type == 3:  # Need more space to store optimized footsteps and l_fsteps to stop the optimization around it
-                self.dataIn = Array('d', [0.0] * (1 + (np.int(self.n_steps)+1) * 12 + 12*self.N_gait + 12) )
-                self.dataOut = Array('d', [0] * 32 * (np.int(self.n_steps)))
+                fields_in.append(("l_targetFootstep", (3, 4)))
+                self.dataIn = SharedBuffer(fields_in)
+                self.dataOut = SharedBuffer([("k", (1,)), ("x_f", (32, self.n_steps))])
             else:
-                self.dataIn = Array('d', [0.0] * (1 + (np.int(self.n_steps)+1) * 12 + 12*self.N_gait))
-                self.dataOut = Array('d', [0] * 24 * (np.int(self.n_steps)))
+                self.dataIn = SharedBuffer(fields_in)
+                self.dataOut = SharedBuffer([("k", (1,)), ("x_f", (24, self.n_steps))])
             self.fsteps_future = np.zeros((self.N_gait, 12))
             self.running = Value('b', True)
         else:
@@ -77,13 +197,36 @@ class MPC_Wrapper:
         # Setup initial result for the first iteration of the main control loop
         x_init = np.zeros(12)
         x_init[0:3] = q_init[0:3, 0]
-        x_init[3:6] = quaternionToRPY(q_init[3:7, 0]).ravel()
+        x_init[3:6] = quaternion_to_rpy(q_init[3:7, 0])
         if self.mpc_type == 3:  # Need more space to store optimized footsteps
             self.last_available_result = np.zeros((32, (np.int(self.n_steps))))
         else:
             self.last_available_result = np.zeros((24, (np.int(self.n_steps))))
         self.last_available_result[:24, 0] = np.hstack((x_init, np.array([0.0, 0.0, 8.0] * 4)))
 
+        # Loop iteration for which the last available result has been computed
+        self.k_result = 0
+        if self.multiprocessing and self.async_mpc is None:
+            self.result_in = {"k": np.zeros(1), "x_f": self.last_available_result}
+
+        # Last available result re-indexed by the time elapsed since it has been computed
+        self.shifted_result = self.last_available_result.copy()
+
+        # Forces used for the nodes that go beyond the prediction horizon once the result is re-indexed
+        self.tail_forces = np.zeros(12)
+
+        # Difference between consecutive predicted states, to interpolate them in place
+        self.diff_result = np.zeros((12, self.n_steps))
+
+        # Propagation of the initial state by the expected latency of the asynchronous MPC
+        self.predict_state = params.predict_mpc_state and self.multiprocessing
+        if self.predict_state:
+            self.predictor = MPC.MPC(params)  # Only used for its linearised dynamics
+            self.latency_samples = np.zeros(10)  # Latest latencies [number of loop iterations]
+            self.n_latency_samples = 0
+            self.latency = 0.0  # Moving average of the latency [number of loop iterations]
+            self.offsets = np.zeros(16, dtype=np.int64)  # Propagation used for the latest dispatched problems
+
     def solve(self, k, xref, fsteps, gait, l_targetFootstep):
         """Call either the asynchronous MPC or the synchronous MPC depending on the value of multiprocessing during
         the creation of the wrapper
@@ -92,54 +235,149 @@ class MPC_Wrapper:
             k (int): Number of inv dynamics iterations since the start of the simulation
             xref (12xN): Desired state vector for the whole prediction horizon
             fsteps (12xN array): the [x, y, z]^T desired position of each foot for each time step of the horizon
-            gait (4xN array): Contact state of feet (gait matrix)
+            gait (4xN array): Contact state of feet for each node of the prediction horizon (gait matrix)
             l_targetFootstep (3x4 array) : 4*[x, y, z]^T target position in local frame, to stop the optimisation of the feet location around it
         """
 
+        if self.predict_state:  # Solve from the state expected when the result will be available
+            xref = self.predict_initial_state(k, xref, fsteps)
+
         if self.multiprocessing:  # Run in parallel process
             self.run_MPC_asynchronous(k, xref, fsteps, l_targetFootstep)
         else:  # Run in the same process than main loop
             self.run_MPC_synchronous(k, xref, fsteps, l_targetFootstep)
 
-        if k > 2:
-            self.last_available_result[12:(12+self.n_steps), :] = np.roll(self.last_available_result[12:(12+self.n_steps), :], -1, axis=1)
-            self.testoui = False
-
+        # Weight of the robot evenly distributed on the feet in contact at the end of the horizon
         pt = 0
         while (np.any(gait[pt, :])):
             pt += 1
-        if k > 2 and not np.array_equal(gait[0, :], gait[pt-1, :]):
-            mass = 2.5  # TODO: grab from URDF?
-            nb_ctc = np.sum(gait[pt-1, :])
-            F = 9.81 * mass / nb_ctc
-            self.last_available_result[12:24, self.n_steps-1] = np.zeros(12)
-            for i in range(4):
-                if (gait[pt-1, i] == 1):
-                    self.last_available_result[12+3*i+2, self.n_steps-1] = F
+        nb_ctc = np.sum(gait[pt-1, :])
+        self.tail_forces[:] = 0.0
+        if nb_ctc > 0:
+            np.multiply(gait[pt-1, :], 9.81 * self.params.mass / nb_ctc, out=self.tail_forces[2::3])
 
         return 0
 
-    def get_latest_result(self):
+    def get_latest_result(self, k=None):
         """Return the desired contact forces that have been computed by the last iteration of the MPC
         If a new result is available, return the new result. Otherwise return the old result again.
+        The result is re-indexed by the time elapsed between the loop iteration it has been computed for and k.
+
+        Args:
+            k (int): Number of inv dynamics iterations since the start of the simulation (no re-indexing if None)
         """
 
         if (self.not_first_iter):
-            if self.multiprocessing:
+            if self.async_mpc is not None:
+                if self.async_mpc.result_ready():
+                    self.async_mpc.get_latest_result(self.last_available_result)
+                    self.k_result = self.async_mpc.get_latest_iteration() * self.k_mpc
+                    self.update_latency(k)
+            elif self.multiprocessing:
                 if self.newResult.value:
                     self.newResult.value = False
                     # Retrieve desired contact forces with through the memory shared with the asynchronous
-                    self.last_available_result = self.convert_dataOut()
-                    return self.last_available_result
-                else:
-                    return self.last_available_result
-            else:
-                # Directly retrieve desired contact force of the synchronous MPC object
-                return self.f_applied
+                    self.convert_dataOut()
+                    self.update_latency(k)
         else:
             # Default forces for the first iteration
             self.not_first_iter = True
-            return self.last_available_result
+
+        return self.shift_result(self.k_result if k is None else k)
+
+    def get_stats(self):
+        """Return the statistics of the OSQP solver for the last available result, as a vector laid out like
+        LoggerControl.OSQP_STATS, or None if they are not available (Crocoddyl MPCs or parallel process).
+        Statistics are only read when this function is called, so that there is no cost if they are not logged
+        """
+
+        if self.async_mpc is not None:
+            return self.async_mpc.get_latest_stats().toVector().ravel()
+        if self.mpc_type == 0 and not self.multiprocessing:
+            return self.mpc.get_stats().toVector().ravel()
+        return None
+
+    def get_ddp_telemetry(self):
+        """Return the statistics of the last solve of the Crocoddyl MPC and of each of its iterations, as arrays laid
+        out like DDP_STATS and DDP_ITERATION_STATS of CallbackTimeBudget, or None if they are not available (OSQP MPC
+        or parallel process). The arrays are overwritten by the next solve
+        """
+
+        if self.mpc_type != 0 and not self.multiprocessing:
+            return self.mpc.callback.stats, self.mpc.callback.iterations
+        return None
+
+    def predict_initial_state(self, k, xref, fsteps):
+        """Propagate the initial state of the reference by the expected latency of the asynchronous MPC, using
+        the linearised dynamics of the OSQP MPC and the forces of the last available result
+
+        Args:
+            k (int): Number of inv dynamics iterations since the start of the simulation
+            xref (12xN): Desired state vector for the whole prediction horizon
+            fsteps (12xN array): the [x, y, z]^T desired position of each foot for each time step of the horizon
+        """
+
+        offset = int(round(self.latency))
+        self.offsets[(k // self.k_mpc) % self.offsets.shape[0]] = offset
+        if offset == 0:
+            return xref
+
+        forces = self.shift_result(k)[12:24, :]
+        xref = xref.copy()
+        xref[:, 0:1] = self.predictor.propagate_state(xref[:, 0:1], forces, fsteps, offset * self.params.dt_wbc)
+
+        return xref
+
+    def update_latency(self, k):
+        """Update the moving average of the latency of the asynchronous MPC once a new result has been retrieved,
+        and tag the result with the loop iteration its initial state has been predicted for
+
+        Args:
+            k (int): Number of inv dynamics iterations since the start of the simulation (None if unknown)
+        """
+
+        if not self.predict_state:
+            return
+
+        if k is not None:
+            self.latency_samples[self.n_latency_samples % self.latency_samples.shape[0]] = k - self.k_result
+            self.n_latency_samples += 1
+            self.latency = np.mean(self.latency_samples[:min(self.n_latency_samples, self.latency_samples.shape[0])])
+
+        # The problem has been solved from the state predicted at the dispatch time plus the offset
+        self.k_result += self.offsets[(self.k_result // self.k_mpc) % self.offsets.shape[0]]
+
+    def shift_result(self, k):
+        """Re-index the last available result by the time elapsed since the loop iteration it has been computed for.
+        Predicted states are linearly interpolated between MPC nodes while forces (and footsteps) are held
+        constant over each node. With a non-uniform grid, nodes are shifted as a whole by the number of nodes
+        elapsed, which is exact as long as the elapsed time stays within the nodes of dt_mpc. Nodes beyond the
+        prediction horizon keep the last predicted state and use the weight of the robot distributed on the feet in
+        contact at the end of the horizon.
+
+        Args:
+            k (int): Number of inv dynamics iterations since the start of the simulation
+        """
+
+        # Number of MPC nodes elapsed since the result has been computed, and fraction of the current one
+        t = max(0.0, (k - self.k_result) * self.params.dt_wbc)
+        i0 = min(int(np.searchsorted(self.node_starts, t, side="right")) - 1, self.n_steps)
+        alpha = (t - self.node_starts[i0]) / self.grid[i0] if i0 < self.n_steps else 0.0
+        m = max(0, self.n_steps - i0)  # Number of nodes still in the prediction horizon
+
+        res = self.last_available_result
+        out = self.shifted_result
+        if m > 0:
+            out[:, :m] = res[:, i0:]
+            if alpha > 0.0:
+                diff = np.subtract(res[:12, (i0+1):], res[:12, i0:-1], out=self.diff_result[:, :(m-1)])
+                diff *= alpha
+                out[:12, :(m-1)] += diff
+        out[:12, m:] = res[:12, -1:]
+        out[12:24, m:] = self.tail_forces[:, np.newaxis]
+        out[24:, m:] = res[24:, -1:]
+
+        return out
 
     def run_MPC_synchronous(self, k, xref, fsteps, l_targetFootstep):
         """Run the MPC (synchronous version) to get the desired contact forces for the feet currently in stance phase
@@ -155,8 +393,8 @@ class MPC_Wrapper:
         # Result is stored in mpc.f_applied, mpc.q_next, mpc.v_next
 
         if self.mpc_type == 0:
-            # OSQP MPC
-            self.mpc.run(np.int(k), xref.copy(), fsteps.copy())
+            # OSQP MPC, inputs are copied by the bindings, the warm start is shifted by the number of MPC iterations
+            self.mpc.run(int(k // self.k_mpc), xref, fsteps)
         elif self.mpc_type == 3: # Add goal position to stop the optimisation
             # Crocoddyl MPC
             self.mpc.solve(k, xref.copy(), fsteps.copy(), l_targetFootstep)
@@ -165,7 +403,11 @@ class MPC_Wrapper:
             self.mpc.solve(k, xref.copy(), fsteps.copy())
 
         # Output of the MPC
-        self.f_applied = self.mpc.get_latest_result()
+        if self.mpc_type == 0:
+            self.mpc.get_latest_result(self.last_available_result)
+        else:
+            self.last_available_result[:, :] = self.mpc.get_latest_result()
+        self.k_result = k
 
     def run_MPC_asynchronous(self, k, xref, fsteps, l_targetFootstep):
         """Run the MPC (asynchronous version) to get the desired contact forces for the feet currently in stance phase
@@ -178,6 +420,11 @@ class MPC_Wrapper:
             l_targetFootstep (3x4 array) : [x, y, z]^T target position in local frame, to stop the optimisation of the feet location around it
         """
 
+        # OSQP MPC running in a background thread
+        if self.async_mpc is not None:
+            self.async_mpc.solve(int(k/self.k_mpc), xref, fsteps)
+            return 0
+
         # If this is the first iteration, creation of the parallel process
         if (k == 0):
             p = Process(target=self.create_MPC_asynchronous, args=(
@@ -186,48 +433,59 @@ class MPC_Wrapper:
 
         # Stacking data to send them to the parallel process
         self.compress_dataIn(k, xref, fsteps, l_targetFootstep)
-        self.newData.value = True
+
+        # Wake up the parallel process
+        self.t_dispatch.value = perf_counter()
+        self.newData.set()
 
         return 0
 
     def create_MPC_asynchronous(self, newData, newResult, dataIn, dataOut, running):
-        """Parallel process with an infinite loop that run the asynchronous MPC
+        """Parallel process with an infinite loop that run the asynchronous Crocoddyl MPCs (the OSQP MPC uses AsyncMPC)
 
         Args:
-            newData (Value): shared variable that is true if new data is available, false otherwise
+            newData (Event): shared event that is set by the main loop when new data is available
             newResult (Value): shared variable that is true if a new result is available, false otherwise
-            dataIn (Array): shared array that contains the data the asynchronous MPC will use as inputs
-            dataOut (Array): shared array that contains the result of the asynchronous MPC
+            dataIn (SharedBuffer): shared buffer that contains the data the asynchronous MPC will use as inputs
+            dataOut (SharedBuffer): shared buffer that contains the result of the asynchronous MPC
             running (Value): shared variable to stop the infinite loop when set to False
         """
 
+        # Run on its own core, away from the control loop
+        set_cpu_affinity(self.cpu_mpc)
+
+        # Local arrays in which the inputs are copied from the shared memory
+        inputs = dataIn.allocate()
+
         # print("Entering infinite loop")
         while running.value:
-            # Checking if new data is available to trigger the asynchronous MPC
-            if newData.value:
+            # Sleep until new data is available to trigger the asynchronous MPC
+            newData.wait()
 
-                # Set the shared variable to false to avoid re-trigering the asynchronous MPC
-                newData.value = False
-                # print("New data detected")
+            # Check that we have not been woken up to stop the parallel process
+            if running.value:
 
-                # Retrieve data thanks to the decompression function and reshape it
-                if self.mpc_type != 3:
-                    kf, xref_1dim, fsteps_1dim = self.decompress_dataIn(dataIn)
-                else:
-                    kf, xref_1dim, fsteps_1dim, l_target_1dim = self.decompress_dataIn(dataIn)
-                    l_target = np.reshape(l_target_1dim, (3,4))
+                # Measure the delay between the dispatch of the data and the wake up of the process
+                self.handoff_latency.value = perf_counter() - self.t_dispatch.value
+                if self.handoff_latency.value > self.handoff_latency_max.value:
+                    self.handoff_latency_max.value = self.handoff_latency.value
 
-                # Reshaping 1-dimensional data
-                k = int(kf[0])
-                xref = np.reshape(xref_1dim, (12, self.n_steps+1))
-                fsteps = np.reshape(fsteps_1dim, (self.N_gait, 12))
+                # Clear the event to avoid re-trigering the asynchronous MPC
+                newData.clear()
+                # print("New data detected")
+
+                # Retrieve data thanks to the decompression function
+                self.decompress_dataIn(dataIn, inputs)
+                k = int(inputs["k"][0])
+                xref = inputs["xref"]
+                fsteps = inputs["fsteps"]
+                if self.mpc_type == 3:
+                    l_target = inputs["l_targetFootstep"]
 
-                # Create the MPC object of the parallel process during the first iteration
+                # Create the MPC object of the parallel process during the first iteration, the OSQP MPC runs in
+                # the background thread of AsyncMPC instead
                 if k == 0:
-                    # loop_mpc = MPC.MPC(self.dt, self.n_steps, self.T_gait)
-                    if self.mpc_type == 0:
-                        loop_mpc = MPC.MPC(self.params)
-                    elif self.mpc_type == 1:  # Crocoddyl MPC Linear
+                    if self.mpc_type == 1:  # Crocoddyl MPC Linear
                         loop_mpc = MPC_crocoddyl.MPC_crocoddyl(self.params, mu=0.9, inner=False, linearModel=True)
                     elif self.mpc_type == 2:  # Crocoddyl MPC Non-Linear
                         loop_mpc = MPC_crocoddyl.MPC_crocoddyl(self.params, mu=0.9, inner=False, linearModel=False)
@@ -235,19 +493,13 @@ class MPC_Wrapper:
                         loop_mpc = MPC_crocoddyl_planner.MPC_crocoddyl_planner(self.params, mu=0.9, inner=False)
 
                 # Run the asynchronous MPC with the data that as been retrieved
-                if self.mpc_type == 0:
-                    fsteps[np.isnan(fsteps)] = 0.0
-                    loop_mpc.run(np.int(k), xref, fsteps)
-                elif self.mpc_type == 3:
+                if self.mpc_type == 3:
                     loop_mpc.solve(k, xref.copy(), fsteps.copy(), l_target.copy())
                 else:
                     loop_mpc.solve(k, xref.copy(), fsteps.copy())
 
                 # Store the result (predicted state + desired forces) in the shared memory
-                # print(len(self.dataOut))
-                # print((loop_mpc.get_latest_result()).shape)
-
-                self.dataOut[:] = loop_mpc.get_latest_result().ravel(order='F')
+                dataOut.write(k=inputs["k"] * self.k_mpc, x_f=loop_mpc.get_latest_result())
 
                 # Set shared variable to true to signal that a new result is available
                 newResult.value = True
@@ -255,54 +507,46 @@ class MPC_Wrapper:
         return 0
 
     def compress_dataIn(self, k, xref, fsteps, l_targetFootstep):
-        """Compress data in a single C-type array that belongs to the shared memory to send data from the main control
-        loop to the asynchronous MPC
+        """Copy data in the shared memory to send them from the main control loop to the asynchronous MPC
 
         Args:
             k (int): Number of inv dynamics iterations since the start of the simulation
-            fstep_planner (object): FootstepPlanner object of the control loop
+            xref (12xN): Desired state vector for the whole prediction horizon
+            fsteps (12xN array): the [x, y, z]^T desired position of each foot for each time step of the horizon
             l_targetFootstep (3x4 array) : [x, y, z]^T target position in local frame, to stop the optimisation of the feet location around it
         """
 
-        # Replace NaN values by 0.0 to be stored in C-type arrays
-        fsteps[np.isnan(fsteps)] = 0.0
-
-        # Compress data in the shared input array
+        # Fill the free slot of the shared input buffer in place
+        views = self.dataIn.begin_write()
+        views["k"][0] = k/self.k_mpc
+        np.copyto(views["xref"], xref)
+        np.copyto(views["fsteps"], fsteps)
+        np.nan_to_num(views["fsteps"], copy=False, nan=0.0)  # Replace NaN values by 0.0 for the solvers
         if self.mpc_type == 3:
-            self.dataIn[:] = np.concatenate([[(k/self.k_mpc)], xref.ravel(),
-                                            fsteps.ravel(), l_targetFootstep.ravel()], axis=0)
-        else:
-            self.dataIn[:] = np.concatenate([[(k/self.k_mpc)], xref.ravel(),
-                                            fsteps.ravel()], axis=0)
+            np.copyto(views["l_targetFootstep"], l_targetFootstep)
+        self.dataIn.end_write()
 
         return 0.0
 
-    def decompress_dataIn(self, dataIn):
-        """Decompress data from a single C-type array that belongs to the shared memory to retrieve data from the main control
-        loop in the asynchronous MPC
+    def decompress_dataIn(self, dataIn, inputs):
+        """Retrieve data from the shared memory in the asynchronous MPC
 
         Args:
-            dataIn (Array): shared array that contains the data the asynchronous MPC will use as inputs
+            dataIn (SharedBuffer): shared buffer that contains the data the asynchronous MPC will use as inputs
+            inputs (dict): preallocated arrays in which the data are copied
         """
 
-        # Sizes of the different variables that are stored in the C-type array
-        if self.mpc_type == 3:
-            sizes = [0, 1, (np.int(self.n_steps)+1) * 12, 12*self.N_gait, 12]
-        else:
-            sizes = [0, 1, (np.int(self.n_steps)+1) * 12, 12*self.N_gait]
-        csizes = np.cumsum(sizes)
-
-        # Return decompressed variables in a list
-        return [dataIn[csizes[i]:csizes[i+1]] for i in range(len(sizes)-1)]
+        return dataIn.read(inputs)
 
     def convert_dataOut(self):
-        """Return the result of the asynchronous MPC (desired contact forces) that is stored in the shared memory
+        """Copy the result of the asynchronous MPC (desired contact forces) that is stored in the shared memory
+        into the last available result
         """
 
-        if self.mpc_type == 3:  # Need more space to store optimized footsteps
-            return np.array(self.dataOut[:]).reshape((32, -1), order='F')
-        else:
-            return np.array(self.dataOut[:]).reshape((24, -1), order='F')
+        self.dataOut.read(self.result_in)
+        self.k_result = int(self.result_in["k"][0])
+
+        return self.last_available_result
 
     def roll_asynchronous(self, fsteps):
         """Move one step further in the gait cycle. Since the output of the asynchronous MPC is retrieved by
@@ -338,10 +582,31 @@ class MPC_Wrapper:
 
         return 0
 
+    def get_handoff_latency(self):
+        """Return the last and the maximum delay [s] between the dispatch of data by the main loop and
+        the wake up of the asynchronous MPC (background thread or parallel process), both 0.0 if the MPC is
+        synchronous
+        """
+
+        if self.async_mpc is not None:
+            return self.async_mpc.get_handoff_latency(), self.async_mpc.get_handoff_latency_max()
+        if self.multiprocessing:
+            return self.handoff_latency.value, self.handoff_latency_max.value
+        return 0.0, 0.0
+
     def stop_parallel_loop(self):
         """Stop the infinite loop in the parallel process to properly close the simulation
         """
 
+        if self.async_mpc is not None:
+            self.async_mpc.stop()
+            return 0
+
         self.running.value = False
+        self.newData.set()  # Wake up the parallel process so that it can exit its loop
+
+        # Release the shared memory blocks
+        self.dataIn.unlink()
+        self.dataOut.unlink()
 
         return 0
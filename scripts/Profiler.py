@@ -0,0 +1,168 @@
+# coding: utf8
+
+import numpy as np
+from array import array
+from time import perf_counter_ns
+from datetime import datetime
+
+
+class Profiler:
+    """Low-overhead profiler of the stages of the control loop. Durations are measured with perf_counter_ns and
+    stored in a fixed-size ring buffer, so that memory does not grow with the length of the run. Each stage also
+    has a histogram with logarithmic bins (8 bins per power of 2, i.e. about 9% of resolution) to get percentiles
+    without sorting, and iterations longer than the deadline are counted. Histograms and maximums are updated at
+    the end of each iteration in preallocated storage, so that no iteration pays for the others.
+
+    Usage: call start() at the beginning of the iteration, mark(i) at the end of each stage i (stages are
+    consecutive) and stop() at the end of the iteration.
+
+    Args:
+        stages (list): names of the consecutive stages of one iteration
+        deadline (float): duration of one iteration that should not be exceeded [s]
+        size (int): number of iterations kept in the ring buffer
+    """
+
+    SUB_BITS = 3  # 2^SUB_BITS bins per power of 2 in histograms
+    N_BINS = 64 << 3  # Enough to cover durations up to 2^63 ns
+
+    def __init__(self, stages, deadline, size=10000):
+
+        self.stages = list(stages)
+        self.n_stages = len(self.stages)
+        self.deadline = int(deadline * 1e9)  # [ns]
+        self.size = max(size, 1)
+
+        # Ring buffer of durations [ns], histograms and maximums of each stage, the last column (or row) is the
+        # whole iteration. Typed arrays of the standard library are used since indexing them is much cheaper than
+        # indexing NumPy arrays, while NumPy reads them through views created once
+        self.durations = array('q', bytes(8 * self.size * (self.n_stages + 1)))
+        self.histogram_counts = array('q', bytes(8 * (self.n_stages + 1) * self.N_BINS))
+        self.max_durations = array('q', bytes(8 * (self.n_stages + 1)))
+        self.histograms = np.frombuffer(self.histogram_counts, dtype=np.int64).reshape((self.n_stages + 1, -1))
+        self.max = np.frombuffer(self.max_durations, dtype=np.int64)
+        self.count = 0  # Number of profiled iterations
+        self.deadline_misses = 0  # Number of iterations longer than the deadline
+
+        # Durations of the current iteration
+        self.row = array('q', bytes(8 * (self.n_stages + 1)))
+        self.zeros = array('q', bytes(8 * (self.n_stages + 1)))
+        self.t_start = 0
+        self.t_last = 0
+
+    def index(self, name):
+        """Return the index of a stage from its name
+
+        Args:
+            name (string): name of the stage
+        """
+
+        return self.stages.index(name)
+
+    def start(self):
+        """Start profiling a new iteration"""
+
+        self.row[:] = self.zeros
+        self.t_start = self.t_last = perf_counter_ns()
+
+    def mark(self, i, t=None):
+        """End stage i of the current iteration, it started at the end of the previous stage
+
+        Args:
+            i (int): index of the stage
+            t (int): end time of the stage as returned by perf_counter_ns (now if None)
+        """
+
+        if t is None:
+            t = perf_counter_ns()
+        self.row[i] += t - self.t_last
+        self.t_last = t
+
+    def stop(self):
+        """End the current iteration, store its durations and add them to the histograms and maximums"""
+
+        row = self.row
+        row[-1] = perf_counter_ns() - self.t_start
+        j = (self.count % self.size) * (self.n_stages + 1)
+        self.durations[j:(j + self.n_stages + 1)] = row
+        if row[-1] > self.deadline:
+            self.deadline_misses += 1
+        self.count += 1
+
+        # Durations below 2^(SUB_BITS+1) ns have their own bin, then each power of 2 is split in 2^SUB_BITS bins
+        counts = self.histogram_counts
+        max_durations = self.max_durations
+        sub_bits = self.SUB_BITS
+        n_bins = self.N_BINS
+        for i in range(self.n_stages + 1):
+            d = row[i]
+            shift = d.bit_length() - 1 - sub_bits
+            counts[i * n_bins + (d if shift <= 0 else (shift << sub_bits) + (d >> shift))] += 1
+            if d > max_durations[i]:
+                max_durations[i] = d
+
+    def bin_edges(self):
+        """Return the lower edge of each bin of the histograms [ns]"""
+
+        edges = np.arange(self.N_BINS, dtype=np.float64)
+        for b in range(2 << self.SUB_BITS, self.N_BINS):
+            shift = (b >> self.SUB_BITS) - 1
+            edges[b] = float((b & ((1 << self.SUB_BITS) - 1)) + (1 << self.SUB_BITS)) * 2.0**shift
+        return edges
+
+    def percentile(self, name, q):
+        """Return a percentile of the durations of a stage since the start, from its histogram [s]
+
+        Args:
+            name (string): name of the stage, "loop" for the whole iteration
+            q (float): percentile between 0 and 100
+        """
+
+        i = self.n_stages if name == "loop" else self.index(name)
+        cumsum = np.cumsum(self.histograms[i])
+        if cumsum[-1] == 0:
+            return 0.0
+        b = int(np.searchsorted(cumsum, q / 100 * cumsum[-1]))
+        return self.bin_edges()[b] * 1e-9
+
+    def get_durations(self, name):
+        """Return the durations of a stage for the iterations still in the ring buffer, oldest first [s]
+
+        Args:
+            name (string): name of the stage, "loop" for the whole iteration
+        """
+
+        i = self.n_stages if name == "loop" else self.index(name)
+        durations = np.frombuffer(self.durations, dtype=np.int64).reshape((self.size, self.n_stages + 1))
+        if self.count <= self.size:
+            return durations[:self.count, i] * 1e-9
+        j = self.count % self.size
+        return np.concatenate((durations[j:, i], durations[:j, i])) * 1e-9
+
+    def summary(self):
+        """Print p50, p99 and max durations of each stage and the number of deadline misses"""
+
+        print("Profiling of " + str(self.count) + " iterations [us]")
+        print("{:>16} {:>10} {:>10} {:>10}".format("stage", "p50", "p99", "max"))
+        for i, name in enumerate(self.stages + ["loop"]):
+            print("{:>16} {:>10.1f} {:>10.1f} {:>10.1f}".format(name, self.percentile(name, 50) * 1e6,
+                                                               self.percentile(name, 99) * 1e6, self.max[i] * 1e-3))
+        print("Deadline misses: " + str(self.deadline_misses) + " (deadline " + str(self.deadline * 1e-3) + " us)")
+
+    def saveAll(self, fileName="profiler"):
+        """Export the content of the profiler in a npz file
+
+        Args:
+            fileName (string): prefix of the name of the file
+        """
+
+        date_str = datetime.now().strftime('_%Y_%m_%d_%H_%M')
+
+        np.savez(fileName + date_str + ".npz",
+                 stages=np.array(self.stages + ["loop"]),
+                 durations=np.stack([self.get_durations(name) for name in self.stages + ["loop"]], axis=1),
+                 histograms=self.histograms,
+                 bin_edges=self.bin_edges() * 1e-9,
+                 max=self.max * 1e-9,
+                 count=self.count,
+                 deadline=self.deadline * 1e-9,
+                 deadline_misses=self.deadline_misses)
@@ -4,7 +4,7 @@ import pybullet_data
 import time as time
 import sys
 import pinocchio as pin
-from utils_mpc import quaternionToRPY
+from utils_kinematics import quaternion_to_rpy, cross
 
 
 class pybullet_simulator:
@@ -546,6 +546,7 @@ class PyBulletSimulator():
         self.o_baseVel = np.zeros((3, 1))
         self.o_imuVel = np.zeros((3, 1))
         self.prev_o_imuVel = np.zeros((3, 1))
+        self.r_imu = np.array([0.1163, 0.0, 0.02])  # Position of the IMU in base frame
 
         # PD+ quantities
         self.P = 0.0
@@ -574,17 +575,6 @@ class PyBulletSimulator():
 
         return
 
-    def cross3(self, left, right):
-        """Numpy is inefficient for this
-
-        Args:
-            left (3x0 array): left term of the cross product
-            right (3x0 array): right term of the cross product
-        """
-        return np.array([[left[1] * right[2] - left[2] * right[1]],
-                         [left[2] * right[0] - left[0] * right[2]],
-                         [left[0] * right[1] - left[1] * right[0]]])
-
     def UpdateMeasurment(self):
         """Retrieve data about the robot from the simulation to mimic what the masterboard does
         """
@@ -609,7 +599,7 @@ class PyBulletSimulator():
 
         # Orientation of the base (quaternion)
         self.baseOrientation[:] = np.array(self.baseState[1])
-        RPY = quaternionToRPY(self.baseOrientation)
+        RPY = quaternion_to_rpy(self.baseOrientation)
         self.hardware.roll = RPY[0]
         self.hardware.pitch = RPY[1]
         self.hardware.yaw = RPY[2]
@@ -623,7 +613,7 @@ class PyBulletSimulator():
         self.o_baseVel = np.array([self.baseVel[0]]).transpose()
         self.b_baseVel = (self.oMb.rotation.transpose() @ self.o_baseVel).ravel()
 
-        self.o_imuVel = self.o_baseVel + self.oMb.rotation @ self.cross3(np.array([0.1163, 0.0, 0.02]), self.baseAngularVelocity[:])
+        self.o_imuVel = self.o_baseVel + self.oMb.rotation @ cross(self.r_imu, self.baseAngularVelocity).reshape((3, 1))
 
         self.baseLinearAcceleration[:] = (self.oMb.rotation.transpose() @ (self.o_imuVel - self.prev_o_imuVel)).ravel() / self.dt
         self.prev_o_imuVel[:, 0:1] = self.o_imuVel
@@ -703,7 +693,7 @@ class PyBulletSimulator():
         if WaitEndOfCycle:
             while (time.time() - self.time_loop) < self.dt:
                 pass
-            self.cpt += 1
+        self.cpt += 1
 
         self.time_loop = time.time()
 
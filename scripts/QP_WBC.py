@@ -4,7 +4,7 @@ import numpy as np
 import pinocchio as pin
 from solo12InvKin import Solo12InvKin
 from time import perf_counter as clock
-from time import time
+from time import perf_counter_ns
 import libquadruped_reactive_walking as lrw
 from example_robot_data.robots_loader import Solo12Loader
 
@@ -29,6 +29,16 @@ class wbc_controller():
         self.M = np.zeros((18, 18))
         self.Jc = np.zeros((12, 18))
 
+        # Workspace buffers updated in place at each iteration to avoid allocations in the control loop
+        self.q_tmp = np.zeros((19, 1))
+        self.q_tmp[6, 0] = 1.0
+        self.ddq_cmd = np.zeros((18, 1))
+        self.ddq_with_delta = np.zeros((18, 1))
+        self.tau_tmp = np.zeros(12)
+        self.RNEA = np.zeros((6, 1))
+        self.deltaddq = np.zeros(6)
+        self.f_with_delta = np.zeros((12, 1))
+
         self.error = False  # Set to True when an error happens in the controller
 
         self.k_since_contact = np.zeros((1, 4))
@@ -66,16 +76,16 @@ class wbc_controller():
         self.k_since_contact += contacts  # Increment feet in stance phase
         self.k_since_contact *= contacts  # Reset feet in swing phase
 
-        self.tic = time()
+        self.tic = perf_counter_ns()
 
         # Compute Inverse Kinematics
-        ddq_cmd = np.array([self.invKin.refreshAndCompute(q[7:, 0:1], dq[6:, 0:1], contacts, pgoals, vgoals, agoals)]).T
+        self.ddq_cmd[:, 0] = self.invKin.refreshAndCompute(q[7:, 0:1], dq[6:, 0:1], contacts, pgoals, vgoals, agoals)
 
         for i in range(4):
             self.log_feet_pos[:, i, self.k_log] = self.invKin.robot.data.oMf[self.indexes[i]].translation
-            self.log_feet_err[:, i, self.k_log] = pgoals[:, i] - self.invKin.robot.data.oMf[self.indexes[i]].translation # self.invKin.pfeet_err[i]
             self.log_feet_vel[:, i, self.k_log] = pin.getFrameVelocity(self.invKin.robot.model, self.invKin.robot.data,
                                                                        self.indexes[i], pin.LOCAL_WORLD_ALIGNED).linear
+        np.subtract(pgoals, self.log_feet_pos[:, :, self.k_log], out=self.log_feet_err[:, :, self.k_log])
         self.feet_pos = self.log_feet_pos[:, :, self.k_log]
         self.feet_err = self.log_feet_err[:, :, self.k_log]
         self.feet_vel = self.log_feet_vel[:, :, self.k_log]
@@ -84,44 +94,43 @@ class wbc_controller():
         self.log_feet_vel_target[:, :, self.k_log] = vgoals[:, :]
         self.log_feet_acc_target[:, :, self.k_log] = agoals[:, :]
 
-        self.tac = time()
+        self.tac = perf_counter_ns()
 
         # Compute the joint space inertia matrix M by using the Composite Rigid Body Algorithm
-        q_tmp = np.zeros((19, 1))
-        q_tmp[6, 0] = 1.0
-        self.M = pin.crba(self.robot.model, self.robot.data, q_tmp)
+        self.M[:, :] = pin.crba(self.robot.model, self.robot.data, self.q_tmp)
 
         # self.M[:6, :6] = self.M[:6, :6] * (np.eye(6) == 1)  # (self.M[:6, :6] > 1e-3)
 
         # Compute Jacobian of contact points
         pin.computeJointJacobians(self.robot.model, self.robot.data, q)
-        self.Jc = np.zeros((12, 18))
+        self.Jc[:, :] = 0.0
         for i_ee in range(4):
             if contacts[i_ee]:
                 idx = int(self.invKin.foot_ids[i_ee])
                 self.Jc[(3*i_ee):(3*(i_ee+1)), :] = pin.getFrameJacobian(self.robot.model, self.robot.data, idx, pin.LOCAL_WORLD_ALIGNED)[:3]
 
         # Compute joint torques according to the current state of the system and the desired joint accelerations
-        RNEA = pin.rnea(self.robot.model, self.robot.data, q, dq, ddq_cmd)[:6]
+        self.RNEA[:, 0] = pin.rnea(self.robot.model, self.robot.data, q, dq, self.ddq_cmd)[:6]
 
         # Solve the QP problem with C++ bindings
-        self.box_qp.run(self.M, self.Jc, f_cmd.reshape((-1, 1)), RNEA.reshape((-1, 1)), self.k_since_contact)
+        self.box_qp.run(self.M, self.Jc, f_cmd.reshape((-1, 1)), self.RNEA, self.k_since_contact)
 
         # Add deltas found by the QP problem to reference quantities
-        deltaddq = self.box_qp.get_ddq_res()
-        self.f_with_delta = self.box_qp.get_f_res().reshape((-1, 1))
-        ddq_with_delta = ddq_cmd.copy()
-        ddq_with_delta[:6, 0] += deltaddq
+        self.box_qp.get_ddq_res(self.deltaddq)
+        self.box_qp.get_f_res(self.f_with_delta)
+        self.ddq_with_delta[:, :] = self.ddq_cmd
+        self.ddq_with_delta[:6, 0] += self.deltaddq
 
         # Compute joint torques from contact forces and desired accelerations
-        RNEA_delta = pin.rnea(self.robot.model, self.robot.data, q, dq, ddq_with_delta)[6:]
-        self.tau_ff[:] = RNEA_delta - ((self.Jc[:, 6:].transpose()) @ self.f_with_delta).ravel()
+        np.matmul(self.Jc[:, 6:].transpose(), self.f_with_delta[:, 0], out=self.tau_tmp)
+        np.subtract(pin.rnea(self.robot.model, self.robot.data, q, dq, self.ddq_with_delta)[6:], self.tau_tmp,
+                    out=self.tau_ff)
 
         # Retrieve desired positions and velocities
         self.vdes[:, 0] = self.invKin.dq_cmd
         self.qdes[:] = self.invKin.q_cmd
 
-        self.toc = time()
+        self.toc = perf_counter_ns()
 
         """self.tic = 0.0
         self.tac = 0.0
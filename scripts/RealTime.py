@@ -0,0 +1,195 @@
+# coding: utf8
+
+import ctypes
+import ctypes.util
+import errno
+import gc
+import os
+import numpy as np
+from array import array
+from time import monotonic_ns, sleep
+
+MCL_CURRENT = 1  # Flags of mlockall
+MCL_FUTURE = 2
+CLOCK_MONOTONIC = 1  # Clock and flag of clock_nanosleep
+TIMER_ABSTIME = 1
+
+
+class timespec(ctypes.Structure):
+    _fields_ = [("tv_sec", ctypes.c_long), ("tv_nsec", ctypes.c_long)]
+
+
+def load_libc():
+    """Return the C library with errno support, or None if it cannot be loaded"""
+
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        libc.mlockall, libc.clock_nanosleep  # Check that both functions exist
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+def set_cpu_affinity(cpu, pid=0):
+    """Pin a process or a thread to a single CPU core. Failures only print a warning
+
+    Args:
+        cpu (int): index of the CPU core (negative to do nothing)
+        pid (int): id of the process or thread (0 for the calling thread)
+    """
+
+    if cpu < 0:
+        return False
+    try:
+        os.sched_setaffinity(pid, {cpu})
+        return True
+    except (AttributeError, OSError, ValueError) as e:
+        print("Warning: real-time mode, cannot pin to CPU " + str(cpu) + " (" + str(e) + ")")
+        return False
+
+
+class RealTime:
+    """Real-time execution of the control loop. When enabled, start() pins the calling thread to a dedicated CPU
+    core, switches it to the SCHED_FIFO scheduler, locks the memory of the process in RAM and freezes the garbage
+    collector (all objects created during initialization are moved to a permanent generation and collections are
+    disabled until stop(), so reference cycles created in the loop are only collected afterwards). Each of these
+    steps falls back to the default behaviour with a printed warning if it fails, typically because the process
+    lacks the privileges (CAP_SYS_NICE / rtprio and memlock limits).
+
+    wait_end_of_cycle() then replaces the busy-wait of the device: it sleeps until an absolute deadline of the
+    monotonic clock, so that the period does not drift with the duration of the iterations, and records by how
+    much the loop wakes up late. When disabled, wait_end_of_cycle() does nothing.
+
+    Args:
+        params (object): store parameters
+        size (int): maximum number of iterations whose jitter is recorded
+    """
+
+    def __init__(self, params, size=10000):
+
+        self.enabled = params.enable_realtime
+        self.cpu_loop = params.realtime_cpu_loop
+        self.priority = params.realtime_priority
+        self.lock_memory = params.realtime_lock_memory
+        self.period = int(round(params.dt_wbc * 1e9))  # [ns]
+
+        self.libc = load_libc() if self.enabled else None
+        self.ts = timespec()  # Preallocated argument of clock_nanosleep
+        self.deadline = 0  # Next wake up time [ns]
+
+        # Difference between the wake up time and the deadline of each iteration [ns]
+        self.jitter = array('q', bytes(8 * size))
+        self.count = 0
+        self.overruns = 0  # Number of iterations that ended after their deadline
+
+        self.applied = []  # Real-time features that are active, for the summary
+        self.saved_affinity = None
+        self.saved_scheduler = None
+
+    def start(self):
+        """Apply the real-time settings to the calling thread and start the schedule of the loop"""
+
+        if not self.enabled:
+            return
+
+        if self.cpu_loop >= 0 and hasattr(os, "sched_getaffinity"):
+            self.saved_affinity = os.sched_getaffinity(0)
+            if set_cpu_affinity(self.cpu_loop):
+                self.applied.append("loop on CPU " + str(self.cpu_loop))
+
+        if self.priority > 0:
+            try:
+                self.saved_scheduler = (os.sched_getscheduler(0), os.sched_getparam(0))
+                os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(self.priority))
+                self.applied.append("SCHED_FIFO " + str(self.priority))
+            except (AttributeError, OSError) as e:
+                self.saved_scheduler = None
+                print("Warning: real-time mode, cannot use SCHED_FIFO (" + str(e) + ")")
+
+        if self.lock_memory:
+            if self.libc is None:
+                print("Warning: real-time mode, cannot lock memory (mlockall not available)")
+            elif self.libc.mlockall(MCL_CURRENT | MCL_FUTURE) != 0:
+                print("Warning: real-time mode, cannot lock memory (" + os.strerror(ctypes.get_errno()) + ")")
+            else:
+                self.applied.append("memory locked")
+
+        gc.collect()
+        gc.freeze()
+        gc.disable()
+        self.applied.append("garbage collector frozen")
+
+        self.deadline = monotonic_ns() + self.period
+
+    def stop(self):
+        """Restore the garbage collector and the default scheduling of the calling thread"""
+
+        if not self.enabled:
+            return
+
+        gc.unfreeze()
+        gc.enable()
+        try:
+            if self.saved_scheduler is not None:
+                os.sched_setscheduler(0, *self.saved_scheduler)
+            if self.saved_affinity is not None:
+                os.sched_setaffinity(0, self.saved_affinity)
+        except OSError as e:
+            print("Warning: real-time mode, cannot restore the scheduling of the loop (" + str(e) + ")")
+
+    def sleep_until(self, t):
+        """Sleep until an absolute time of the monotonic clock
+
+        Args:
+            t (int): wake up time [ns]
+        """
+
+        if self.libc is None:
+            sleep(max(0, t - monotonic_ns()) * 1e-9)
+            return
+        self.ts.tv_sec, self.ts.tv_nsec = divmod(t, 1000000000)
+        while self.libc.clock_nanosleep(CLOCK_MONOTONIC, TIMER_ABSTIME, ctypes.byref(self.ts), None) == errno.EINTR:
+            pass
+
+    def wait_end_of_cycle(self):
+        """Sleep until the end of the current period of the loop. If the iteration ended after its deadline, the
+        schedule starts again from now instead of running the next iterations back to back to catch up"""
+
+        if not self.enabled:
+            return
+
+        now = monotonic_ns()
+        if now < self.deadline:
+            self.sleep_until(self.deadline)
+            now = monotonic_ns()
+            late = now - self.deadline
+            self.deadline += self.period
+        else:
+            late = now - self.deadline
+            self.overruns += 1
+            self.deadline = now + self.period
+
+        if self.count < len(self.jitter):
+            self.jitter[self.count] = late
+            self.count += 1
+
+    def get_jitter(self):
+        """Return the recorded wake up delays [s]"""
+
+        return np.frombuffer(self.jitter, dtype=np.int64, count=self.count) * 1e-9
+
+    def summary(self):
+        """Print the real-time features that are active and the distribution of the wake up delays"""
+
+        if not self.enabled:
+            return
+
+        print("Real-time: " + (", ".join(self.applied) if self.applied else "no feature could be applied"))
+        if self.count == 0:
+            return
+        jitter = self.get_jitter() * 1e6
+        print("Wake up delay over " + str(self.count) + " iterations [us]")
+        print("{:>10} {:>10} {:>10} {:>10} {:>10}".format("mean", "p50", "p99", "p99.9", "max"))
+        print("{:>10.1f} {:>10.1f} {:>10.1f} {:>10.1f} {:>10.1f}".format(
+            np.mean(jitter), *np.percentile(jitter, [50, 99, 99.9]), np.max(jitter)))
+        print("Overruns: " + str(self.overruns) + " (period " + str(self.period * 1e-3) + " us)")
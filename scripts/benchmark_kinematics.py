@@ -0,0 +1,146 @@
+# coding: utf8
+
+"""Micro-benchmark of the kinematics helpers of utils_kinematics against the per-foot Python loops
+they replace in the control loop. Run with: python benchmark_kinematics.py"""
+
+import math
+import timeit
+import numpy as np
+from utils_kinematics import cross, yaw_rotation, rpy_to_rotation, rpy_to_quaternion, quaternion_to_rpy
+
+N_RUNS = 20000
+
+###########################################
+# Previous implementations, for reference #
+###########################################
+
+
+def cross12_loop(left, right):
+    res = np.zeros((3, 4))
+    for i in range(4):
+        res[:, i] = np.array([left[1, 0] * right[2, i] - left[2, 0] * right[1, i],
+                              left[2, 0] * right[0, i] - left[0, 0] * right[2, i],
+                              left[0, 0] * right[1, i] - left[1, 0] * right[0, i]])
+    return res
+
+
+def cross3_loop(left, right):
+    return np.array([[left[1] * right[2] - left[2] * right[1]],
+                     [left[2] * right[0] - left[0] * right[2]],
+                     [left[0] * right[1] - left[1] * right[0]]])
+
+
+def EulerToRotation(roll, pitch, yaw):
+    c_roll = math.cos(roll)
+    s_roll = math.sin(roll)
+    c_pitch = math.cos(pitch)
+    s_pitch = math.sin(pitch)
+    c_yaw = math.cos(yaw)
+    s_yaw = math.sin(yaw)
+    Rz_yaw = np.array([[c_yaw, -s_yaw, 0], [s_yaw, c_yaw, 0], [0, 0, 1]])
+    Ry_pitch = np.array([[c_pitch, 0, s_pitch], [0, 1, 0], [-s_pitch, 0, c_pitch]])
+    Rx_roll = np.array([[1, 0, 0], [0, c_roll, -s_roll], [0, s_roll, c_roll]])
+    return np.dot(Rz_yaw, np.dot(Ry_pitch, Rx_roll))
+
+
+def yaw_rotation_alloc(yaw):
+    oRh = np.eye(3)
+    c = math.cos(yaw)
+    s = math.sin(yaw)
+    oRh[0:2, 0:2] = np.array([[c, -s], [s, c]])
+    return oRh
+
+
+def EulerToQuaternion(roll_pitch_yaw):
+    roll, pitch, yaw = roll_pitch_yaw
+    sr = np.sin(roll/2.)
+    cr = np.cos(roll/2.)
+    sp = np.sin(pitch/2.)
+    cp = np.cos(pitch/2.)
+    sy = np.sin(yaw/2.)
+    cy = np.cos(yaw/2.)
+    return [sr * cp * cy - cr * sp * sy, cr * sp * cy + sr * cp * sy,
+            cr * cp * sy - sr * sp * cy, cr * cp * cy + sr * sp * sy]
+
+
+def quaternionToRPY(quat):
+    qx, qy, qz, qw = quat
+    rotateXa0 = 2.0*(qy*qz + qw*qx)
+    rotateXa1 = qw*qw - qx*qx - qy*qy + qz*qz
+    rotateX = np.arctan2(rotateXa0, rotateXa1) if (rotateXa0 != 0.0) and (rotateXa1 != 0.0) else 0.0
+    rotateY = np.arcsin(min(max(-2.0*(qx*qz - qw*qy), -1.0), 1.0))
+    rotateZa0 = 2.0*(qx*qy + qw*qz)
+    rotateZa1 = qw*qw + qx*qx - qy*qy - qz*qz
+    rotateZ = np.arctan2(rotateZa0, rotateZa1) if (rotateZa0 != 0.0) and (rotateZa1 != 0.0) else 0.0
+    return np.array([[rotateX], [rotateY], [rotateZ]])
+
+
+def feet_cmd_loop(w, p, v, a, oRh):
+    a_cmd = oRh.T @ a - cross12_loop(w, cross12_loop(w, p)) - 2 * cross12_loop(w, v)
+    v_cmd = oRh.T @ v - cross12_loop(w, p)
+    return a_cmd, v_cmd
+
+
+##############
+# Benchmarks #
+##############
+
+def bench(stmt):
+    """Return the average duration of one call [us]"""
+    return min(timeit.repeat(stmt, number=N_RUNS, repeat=5)) / N_RUNS * 1e6
+
+
+if __name__ == "__main__":
+
+    w = np.random.random((3, 1))
+    p = np.random.random((3, 4))
+    v = np.random.random((3, 4))
+    a = np.random.random((3, 4))
+    r = np.random.random(3)
+    quat = rpy_to_quaternion(np.array([0.1, -0.2, 0.3]))
+    out = np.zeros((3, 4))
+    tmp = np.zeros((3, 4))
+    out3 = np.zeros(3)
+    out4 = np.zeros(4)
+    R = np.eye(3)
+    S = np.zeros((3, 3))
+
+    a_cmd = np.zeros((3, 4))
+    v_cmd = np.zeros((3, 4))
+
+    def feet_cmd_vectorised():
+        # Same operations as Controller.update_feet_cmd
+        np.matmul(R.T, a, out=a_cmd)
+        cross(w, p, out, S)
+        cross(w, out, tmp, S)
+        a_cmd[:] -= tmp
+        cross(w, v, tmp, S)
+        np.multiply(tmp, 2.0, out=tmp)
+        a_cmd[:] -= tmp
+        np.matmul(R.T, v, out=v_cmd)
+        cross(w, p, tmp, S)
+        v_cmd[:] -= tmp
+
+    cases = [
+        ("cross product 3x1 x 3x4", lambda: cross12_loop(w, p), lambda: cross(w, p, out, S)),
+        ("cross product 3 x 3", lambda: cross3_loop(r, r), lambda: cross(r, r, out3, S)),
+        ("yaw rotation", lambda: yaw_rotation_alloc(0.3), lambda: yaw_rotation(0.3, R)),
+        ("rpy to rotation", lambda: EulerToRotation(0.1, -0.2, 0.3), lambda: rpy_to_rotation(0.1, -0.2, 0.3, R)),
+        ("rpy to quaternion", lambda: EulerToQuaternion([0.1, -0.2, 0.3]),
+         lambda: rpy_to_quaternion(r, out4)),
+        ("quaternion to rpy", lambda: quaternionToRPY(quat), lambda: quaternion_to_rpy(quat, out3)),
+        ("feet commands", lambda: feet_cmd_loop(w, p, v, a, R), feet_cmd_vectorised),
+    ]
+
+    print("{:>26} {:>12} {:>12}".format("[us per call]", "loops", "helpers"))
+    total_loops = 0.0
+    total_helpers = 0.0
+    for name, before, after in cases:
+        t_before = bench(before)
+        t_after = bench(after)
+        total_loops += t_before
+        total_helpers += t_after
+        print("{:>26} {:>12.2f} {:>12.2f}".format(name, t_before, t_after))
+
+    # Each of these operations happens about once per control tick
+    print("{:>26} {:>12.2f} {:>12.2f}".format("total", total_loops, total_helpers))
@@ -0,0 +1,53 @@
+# coding: utf8
+
+"""Benchmark of MPC.run_batch, which solves a batch of problems with a pool of threads, against a Python loop
+calling MPC.run once per problem, as done to replay the inputs of the MPC logged during a run.
+Run with: python benchmark_mpc_batch.py"""
+
+import os
+import numpy as np
+from time import perf_counter
+import libquadruped_reactive_walking as lqrw
+from benchmark_mpc_condensed import MASS, INERTIA, trot_inputs
+
+N_PROBLEMS = 2000
+THREADS = sorted(set([1, 2, 4, os.cpu_count() or 1]))
+
+
+def batch_inputs(params, n_steps):
+    """Return the stacked reference trajectories and footsteps of N_PROBLEMS consecutive iterations of a trot"""
+
+    xrefs = np.zeros((N_PROBLEMS, 12, n_steps + 1))
+    fsteps = np.zeros((N_PROBLEMS, params.N_gait, 12))
+    for k in range(N_PROBLEMS):
+        xrefs[k], fsteps[k] = trot_inputs(params, n_steps, k)
+    return xrefs, fsteps
+
+
+if __name__ == "__main__":
+
+    params = lqrw.Params()
+    params.mass = MASS
+    params.I_mat = INERTIA
+    params.osqp_time_budget = -1.0
+    params.osqp_warm_start = False
+    n_steps = int(round(params.T_mpc / params.dt_mpc))
+    xrefs, fsteps = batch_inputs(params, n_steps)
+
+    # One call of MPC.run per problem, as in the scripts that replay logs
+    mpc = lqrw.MPC(params)
+    results = np.zeros((N_PROBLEMS, 24, n_steps))
+    t_start = perf_counter()
+    for k in range(N_PROBLEMS):
+        mpc.run(k, xrefs[k], fsteps[k])
+        results[k] = mpc.get_latest_result()
+    t_loop = perf_counter() - t_start
+    print("{:>10} | {:>10} {:>10} | {:>10}".format("", "total [s]", "speedup", "max diff"))
+    print("{:>10} | {:>10.2f} {:>10.2f} | {:>10}".format("loop", t_loop, 1.0, ""))
+
+    for n_threads in THREADS:
+        t_start = perf_counter()
+        batch = mpc.run_batch(xrefs, fsteps, n_threads)
+        t_batch = perf_counter() - t_start
+        print("{:>10} | {:>10.2f} {:>10.2f} | {:>10.2e}".format(
+            "{} threads".format(n_threads), t_batch, t_loop / t_batch, np.max(np.abs(batch - results))))
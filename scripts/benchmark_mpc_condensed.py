@@ -0,0 +1,77 @@
+# coding: utf8
+
+"""Benchmark of the sparse and condensed formulations of the OSQP MPC for several lengths of the prediction
+horizon, on a trotting gait. Run with: python benchmark_mpc_condensed.py"""
+
+import numpy as np
+import libquadruped_reactive_walking as lqrw
+
+N_RUNS = 200
+HORIZONS = [8, 16, 24, 32, 40, 48]
+
+# Mass and composite inertia of Solo12 in its default configuration
+MASS = 2.50000279
+INERTIA = [3.09249e-2, -8.00101e-7, 1.865287e-5, -8.00101e-7, 5.106100e-2, 1.245813e-4,
+           1.865287e-5, 1.245813e-4, 6.939757e-2]
+FOOTHOLDS = np.array([[0.195, 0.195, -0.195, -0.195], [0.147, -0.147, 0.147, -0.147], [0.0, 0.0, 0.0, 0.0]])
+
+
+def trot_inputs(params, n_steps, k):
+    """Return the reference trajectory and the footsteps of a trot moving forward at iteration k"""
+
+    h = 0.22
+    vx = 0.3
+    dt = params.dt_mpc
+    xref = np.zeros((12, n_steps + 1))
+    xref[0, :] = vx * dt * (k + np.arange(n_steps + 1))
+    xref[2, :] = h
+    xref[6, :] = vx
+    xref[:, 0] += 0.002 * np.sin(0.7 * k)  # The initial state moves around the reference
+
+    half_period = int(round(0.5 * params.T_gait / dt))
+    fsteps = np.zeros((params.N_gait, 12))
+    for i in range(n_steps):
+        phase = ((k + i) // half_period) % 2
+        for foot in range(4):
+            if (foot == 0 or foot == 3) == (phase == 0):
+                fsteps[i, (3 * foot):(3 * foot + 3)] = FOOTHOLDS[:, foot] + np.array([xref[0, i], 0.0, 0.0])
+    return xref, fsteps
+
+
+def benchmark(n_steps, condensed):
+    """Return the setup duration and the median durations of the update of the matrices and of the solver [s],
+    and the latest result of the MPC"""
+
+    params = lqrw.Params()
+    params.T_mpc = n_steps * params.dt_mpc
+    params.N_gait = n_steps + 4
+    params.mass = MASS
+    params.I_mat = INERTIA
+    params.osqp_condensed = condensed
+
+    mpc = lqrw.MPC(params)
+    xref, fsteps = trot_inputs(params, n_steps, 0)
+    mpc.run(0, xref, fsteps)
+    setup = np.sum(mpc.get_durations())
+
+    durations = np.zeros((N_RUNS, 2))
+    for k in range(1, N_RUNS + 1):
+        xref, fsteps = trot_inputs(params, n_steps, k)
+        mpc.run(k, xref, fsteps)
+        durations[k - 1] = mpc.get_durations()[:, 0]
+
+    update, solve = np.median(durations, axis=0)
+    return setup, update, solve, mpc.get_latest_result()
+
+
+if __name__ == "__main__":
+
+    print("{:>8} | {:>30} | {:>30} | {:>10}".format("", "sparse [us]", "condensed [us]", "max diff"))
+    print("{:>8} | {:>9} {:>9} {:>10} | {:>9} {:>9} {:>10} | {:>10}".format(
+        "n_steps", "setup", "update", "solve", "setup", "update", "solve", "forces [N]"))
+    for n_steps in HORIZONS:
+        condensed = benchmark(n_steps, True)
+        sparse = benchmark(n_steps, False)
+        diff = np.max(np.abs(sparse[3][12:, :] - condensed[3][12:, :]))
+        print("{:>8} | {:>9.1f} {:>9.1f} {:>10.1f} | {:>9.1f} {:>9.1f} {:>10.1f} | {:>10.2e}".format(
+            n_steps, *[t * 1e6 for t in sparse[:3]], *[t * 1e6 for t in condensed[:3]], diff))
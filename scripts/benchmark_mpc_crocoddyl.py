@@ -0,0 +1,93 @@
+# coding: utf8
+
+"""Benchmark of the update of the shooting problem and of the solve of MPC_crocoddyl, which update the action
+models with views of preallocated inputs and shift the warm start in place, against the previous implementation
+that reshaped the inputs of each node and rebuilt the lists of the warm start, for the linear and non-linear models.
+Run with: python benchmark_mpc_crocoddyl.py"""
+
+import numpy as np
+from time import perf_counter
+import libquadruped_reactive_walking as lqrw
+from crocoddyl_class.MPC_crocoddyl import MPC_crocoddyl
+from benchmark_mpc_condensed import trot_inputs
+
+N_RUNS = 500
+
+
+class LoopMPC_crocoddyl(MPC_crocoddyl):
+    """Previous implementation of the update of the problem and of the warm start, as a reference"""
+
+    def updateProblem(self, fsteps, xref):
+        self.fsteps[:, :] = fsteps[:, :]
+        self.problem.x0 = xref[:, 0]
+
+        self.index = 0
+        while (np.any(self.fsteps[self.index, :])):
+            self.index += 1
+        self.gait[:self.index, :] = 1.0 - (self.fsteps[:self.index, 0::3] == 0.0)
+        self.gait[self.index:, :] = 0.0
+
+        for j in range(self.index):
+            self.ListAction[j].updateModel(np.reshape(self.fsteps[j, :], (3, 4), order='F'),
+                                           xref[:, j+1], self.gait[j, :])
+        self.terminalModel.updateModel(np.reshape(
+            self.fsteps[self.index-1, :], (3, 4), order='F'), xref[:, -1], self.gait[self.index-1, :])
+        return 0
+
+    def solve(self, k, xref, fsteps):
+        self.updateProblem(fsteps, xref)
+
+        x_init = []
+        u_init = []
+        if self.warm_start and k != 0:
+            u_init = self.ddp.us[1:]
+            u_init.append(np.repeat(self.gait[self.index-1, :], 3)*np.array(4*[0.5, 0.5, 5.]))
+
+            x_init = self.ddp.xs[2:]
+            x_init.insert(0, xref[:, 0])
+            x_init.append(self.ddp.xs[-1])
+
+        self.ddp.solve(x_init,  u_init, self.max_iteration)
+        return 0
+
+
+def benchmark(mpc_class, linear):
+    """Return the median durations of updateProblem and of solve, which also updates the problem [s], and the
+    forces of the first node for each iteration
+
+    Args:
+        mpc_class (class): implementation of the MPC to benchmark
+        linear (bool): use the linear approximation of the cross product in the dynamics
+    """
+
+    params = lqrw.Params()
+    mpc = mpc_class(params, mu=0.9, inner=False, linearModel=linear)
+    n_steps = mpc.n_nodes
+
+    durations = np.zeros((N_RUNS, 2))
+    forces = np.zeros((N_RUNS, 12))
+    for k in range(N_RUNS):
+        xref, fsteps = trot_inputs(params, n_steps, k)
+        t_start = perf_counter()
+        mpc.updateProblem(fsteps, xref)
+        t_update = perf_counter()
+        mpc.solve(k, xref, fsteps)
+        t_solve = perf_counter()
+        durations[k] = [t_update - t_start, t_solve - t_update]
+        forces[k] = mpc.ddp.us[0]
+
+    update, solve = np.median(durations, axis=0)
+    return update, solve, forces
+
+
+if __name__ == "__main__":
+
+    print("{:>10} | {:>21} | {:>21} | {:>10}".format("", "previous [us]", "in place [us]", "max diff"))
+    print("{:>10} | {:>10} {:>10} | {:>10} {:>10} | {:>10}".format(
+        "model", "update", "solve", "update", "solve", "forces [N]"))
+    for linear in [True, False]:
+        previous = benchmark(LoopMPC_crocoddyl, linear)
+        in_place = benchmark(MPC_crocoddyl, linear)
+        print("{:>10} | {:>10.1f} {:>10.1f} | {:>10.1f} {:>10.1f} | {:>10.2e}".format(
+            "linear" if linear else "non-linear", *[t * 1e6 for t in previous[:2]], *[t * 1e6 for t in in_place[:2]],
+            np.max(np.abs(previous[2] - in_place[2]))))
@@ -0,0 +1,61 @@
+# coding: utf8
+
+"""Scaling of the solve of the Crocoddyl MPCs with the number of threads used by their shooting problem to compute
+the derivatives of the nodes, on a trotting gait, to choose crocoddyl_nthreads for a given computer. Crocoddyl must be
+built with multithreading for the number of threads to have an effect.
+Run with: python benchmark_mpc_crocoddyl_threads.py [max number of threads]"""
+
+import os
+import sys
+import numpy as np
+from time import perf_counter
+import libquadruped_reactive_walking as lqrw
+from crocoddyl_class.MPC_crocoddyl import MPC_crocoddyl
+from crocoddyl_class.MPC_crocoddyl_planner import MPC_crocoddyl_planner
+from benchmark_mpc_condensed import trot_inputs
+
+N_RUNS = 200
+MPCS = {"linear": lambda params, n: MPC_crocoddyl(params, mu=0.9, inner=False, linearModel=True, nthreads=n),
+        "non-linear": lambda params, n: MPC_crocoddyl(params, mu=0.9, inner=False, linearModel=False, nthreads=n),
+        "planner": lambda params, n: MPC_crocoddyl_planner(params, mu=0.9, inner=False, nthreads=n)}
+
+
+def benchmark(create_mpc, nthreads):
+    """Return the median and 90th percentile durations of the solve [s]
+
+    Args:
+        create_mpc (function): create the MPC from the parameters and the number of threads
+        nthreads (int): number of threads of the shooting problem
+    """
+
+    params = lqrw.Params()
+    mpc = create_mpc(params, nthreads)
+    n_steps = int(round(params.T_mpc / params.dt_mpc))
+
+    durations = np.zeros(N_RUNS)
+    for k in range(N_RUNS):
+        xref, fsteps = trot_inputs(params, n_steps, k)
+        t_start = perf_counter()
+        if isinstance(mpc, MPC_crocoddyl_planner):
+            mpc.solve(k, xref, fsteps, np.reshape(fsteps[0, :], (3, 4), order='F'))
+        else:
+            mpc.solve(k, xref, fsteps)
+        durations[k] = perf_counter() - t_start
+
+    return np.median(durations), np.percentile(durations, 90)
+
+
+if __name__ == "__main__":
+
+    max_threads = int(sys.argv[1]) if len(sys.argv) > 1 else (os.cpu_count() or 1)
+    threads = sorted(set([n for n in [1, 2, 4, 8, 16] if n <= max_threads] + [max_threads]))
+
+    print("{:>10} | {:>8} | {:>21} | {:>10}".format("", "", "solve [us]", ""))
+    print("{:>10} | {:>8} | {:>10} {:>10} | {:>10}".format("model", "threads", "p50", "p90", "speedup"))
+    for name, create_mpc in MPCS.items():
+        reference = None
+        for nthreads in threads:
+            p50, p90 = benchmark(create_mpc, nthreads)
+            reference = p50 if reference is None else reference
+            print("{:>10} | {:>8} | {:>10.1f} {:>10.1f} | {:>10.2f}".format(
+                name, nthreads, p50 * 1e6, p90 * 1e6, reference / p50))
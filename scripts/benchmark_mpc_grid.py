@@ -0,0 +1,91 @@
+# coding: utf8
+
+"""Benchmark of the OSQP MPC with a uniform grid and with graded grids (fine nodes near the present, coarse nodes
+towards the end of the horizon) covering the same lookahead, on a trotting gait. The forces of the first node,
+which are the ones sent to the whole body control, are compared to the ones of the uniform grid.
+Run with: python benchmark_mpc_grid.py"""
+
+import numpy as np
+import libquadruped_reactive_walking as lqrw
+from benchmark_mpc_condensed import MASS, INERTIA, FOOTHOLDS
+
+N_RUNS = 200
+T_MPC = 0.48  # Lookahead of all grids [s]
+GRIDS = {"uniform": [],
+         "8x1 4x2 2x4": [0.02] * 8 + [0.04] * 4 + [0.08] * 2,
+         "4x1 4x2 3x4": [0.02] * 4 + [0.04] * 4 + [0.08] * 3,
+         "4x1 2x2 2x4 1x8": [0.02] * 4 + [0.04] * 2 + [0.08] * 2 + [0.16]}
+
+
+def grid_inputs(params, k):
+    """Return the reference trajectory and the footsteps of a trot moving forward at iteration k, on the nodes
+    of the grid of the MPC"""
+
+    h = 0.22
+    vx = 0.3
+    dt = params.dt_mpc
+    grid = params.getMpcGrid().ravel()
+    n_nodes = grid.size
+    start = np.concatenate(([0], np.cumsum(np.round(grid / dt).astype(int))))  # Time step at which nodes start
+
+    xref = np.zeros((12, n_nodes + 1))
+    xref[0, :] = vx * dt * (k + start)
+    xref[2, :] = h
+    xref[6, :] = vx
+    xref[:, 0] += 0.002 * np.sin(0.7 * k)  # The initial state moves around the reference
+
+    half_period = int(round(0.5 * params.T_gait / dt))
+    fsteps = np.zeros((params.N_gait, 12))
+    for i in range(n_nodes):
+        phase = ((k + start[i]) // half_period) % 2
+        for foot in range(4):
+            if (foot == 0 or foot == 3) == (phase == 0):
+                fsteps[i, (3 * foot):(3 * foot + 3)] = FOOTHOLDS[:, foot] + np.array([xref[0, i], 0.0, 0.0])
+    return xref, fsteps
+
+
+def benchmark(grid, condensed):
+    """Return the number of nodes, the median durations of the update of the matrices and of the solver [s], and
+    the forces of the first node for each iteration
+
+    Args:
+        grid (list): duration of each node of the prediction horizon [s], empty for a uniform grid
+        condensed (bool): use the condensed formulation of the MPC
+    """
+
+    params = lqrw.Params()
+    params.T_mpc = T_MPC
+    params.N_gait = int(round(T_MPC / params.dt_mpc)) + 4
+    params.mpc_grid = grid
+    params.mass = MASS
+    params.I_mat = INERTIA
+    params.osqp_condensed = condensed
+
+    mpc = lqrw.MPC(params)
+    durations = np.zeros((N_RUNS, 2))
+    forces = np.zeros((N_RUNS + 1, 12))
+    for k in range(N_RUNS + 1):
+        xref, fsteps = grid_inputs(params, k)
+        mpc.run(k, xref, fsteps)
+        if k > 0:
+            durations[k - 1] = mpc.get_durations()[:, 0]
+        forces[k] = mpc.get_latest_result()[12:, 0]
+
+    update, solve = np.median(durations, axis=0)
+    return params.getMpcGrid().size, update, solve, forces
+
+
+if __name__ == "__main__":
+
+    print("{:>16} | {:>6} | {:>21} | {:>21} | {:>10}".format("", "", "sparse [us]", "condensed [us]", "max diff"))
+    print("{:>16} | {:>6} | {:>10} {:>10} | {:>10} {:>10} | {:>10}".format(
+        "grid", "nodes", "update", "solve", "update", "solve", "forces [N]"))
+    reference = None
+    for name, grid in GRIDS.items():
+        sparse = benchmark(grid, False)
+        condensed = benchmark(grid, True)
+        if reference is None:
+            reference = sparse[3]
+        diff = np.max(np.abs(sparse[3] - reference))
+        print("{:>16} | {:>6} | {:>10.1f} {:>10.1f} | {:>10.1f} {:>10.1f} | {:>10.2e}".format(
+            name, sparse[0], *[t * 1e6 for t in sparse[1:3]], *[t * 1e6 for t in condensed[1:3]], diff))
@@ -0,0 +1,70 @@
+# coding: utf8
+
+"""Replay the inputs of the MPC logged by LoggerControl with MPC_crocoddyl_planner, warm started either with an
+approximation built from the reference or with its previous solution shifted by one node, and compare the number
+of iterations of the DDP solver (at most max_iteration) and the cost of the solutions.
+Run with: python benchmark_mpc_planner_warm_start.py path/to/logs.npz [max_iteration]"""
+
+import sys
+import numpy as np
+from time import perf_counter
+import libquadruped_reactive_walking as lqrw
+from crocoddyl_class.MPC_crocoddyl_planner import MPC_crocoddyl_planner
+
+
+def target_footsteps(logs, k):
+    """Return the target footsteps in the local frame at iteration k, as computed by the Controller
+
+    Args:
+        logs (NpzFile): logs saved by LoggerControl.saveAll
+        k (int): iteration of the control loop
+    """
+
+    q = logs["loop_o_q_int"][k]
+    x, y, z, w = q[3:7]
+    yaw = np.arctan2(2.0 * (w * z + x * y), 1.0 - 2.0 * (y * y + z * z))
+    Rz = np.array([[np.cos(yaw), -np.sin(yaw), 0.0], [np.sin(yaw), np.cos(yaw), 0.0], [0.0, 0.0, 1.0]])
+    return Rz.transpose() @ logs["planner_goals"][k] - q[0:3, np.newaxis]
+
+
+def replay(logs, params, warm_start, max_iteration):
+    """Return the number of iterations, the cost and the duration of each solve of the MPC
+
+    Args:
+        logs (NpzFile): logs saved by LoggerControl.saveAll
+        params (Params): parameters of the controller that produced the logs
+        warm_start (bool): warm start the solver with its previous solution
+        max_iteration (int): maximum number of iterations of the DDP solver
+    """
+
+    mpc = MPC_crocoddyl_planner(params, mu=0.9, inner=False, warm_start=warm_start)
+    mpc.max_iteration = max_iteration
+
+    k_mpc = int(round(params.dt_mpc / params.dt_wbc))
+    fsteps = logs["planner_fsteps"]
+    iterations = np.arange(0, fsteps.shape[0], k_mpc)
+    iterations = iterations[[np.any(fsteps[k]) for k in iterations]]  # Iterations that have been logged
+
+    stats = np.zeros((len(iterations), 3))
+    for i, k in enumerate(iterations):
+        t_start = perf_counter()
+        mpc.solve(k, logs["planner_xref"][k], fsteps[k], target_footsteps(logs, k))
+        stats[i] = [mpc.ddp.iter, mpc.ddp.cost, perf_counter() - t_start]
+
+    return stats
+
+
+if __name__ == "__main__":
+
+    logs = np.load(sys.argv[1])
+    max_iteration = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    params = lqrw.Params()
+
+    print("{:>14} | {:>10} {:>10} {:>10} | {:>12} | {:>10}".format(
+        "warm start", "mean iter", "p90 iter", "at max [%]", "mean cost", "p50 [ms]"))
+    for warm_start in [False, True]:
+        stats = replay(logs, params, warm_start, max_iteration)
+        print("{:>14} | {:>10.2f} {:>10.1f} {:>10.1f} | {:>12.4e} | {:>10.2f}".format(
+            "previous sol." if warm_start else "approximation", np.mean(stats[:, 0]),
+            np.percentile(stats[:, 0], 90), 100.0 * np.mean(stats[:, 0] >= max_iteration), np.mean(stats[:, 1]),
+            1e3 * np.median(stats[:, 2])))
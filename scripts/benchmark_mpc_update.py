@@ -0,0 +1,54 @@
+# coding: utf8
+
+"""Micro-benchmark of MPC.run for the sparse formulation of the OSQP MPC, on a trotting gait walking straight or
+turning, to measure the update of the constraint matrices separately from the solver.
+Run with: python benchmark_mpc_update.py"""
+
+import numpy as np
+import libquadruped_reactive_walking as lqrw
+from benchmark_mpc_condensed import MASS, INERTIA, trot_inputs
+
+N_RUNS = 2000
+HORIZONS = [8, 16, 24, 32]
+YAW_RATES = [0.0, 0.5]  # [rad/s]
+
+
+def benchmark(n_steps, yaw_rate):
+    """Return the median and 99th percentile durations of the update of the matrices and of the whole run [s]
+
+    Args:
+        n_steps (int): number of time steps of the prediction horizon
+        yaw_rate (float): angular velocity of the reference trajectory around the vertical axis [rad/s]
+    """
+
+    params = lqrw.Params()
+    params.T_mpc = n_steps * params.dt_mpc
+    params.N_gait = n_steps + 4
+    params.mass = MASS
+    params.I_mat = INERTIA
+    params.osqp_condensed = False
+
+    mpc = lqrw.MPC(params)
+    durations = np.zeros((N_RUNS, 2))
+    for k in range(N_RUNS + 1):
+        xref, fsteps = trot_inputs(params, n_steps, k)
+        xref[5, :] = yaw_rate * params.dt_mpc * (k + np.arange(n_steps + 1))
+        xref[11, :] = yaw_rate
+        mpc.run(k, xref, fsteps)
+        if k > 0:
+            durations[k - 1] = mpc.get_durations()[:, 0]
+
+    update = durations[:, 0]
+    run = np.sum(durations, axis=1)
+    return np.median(update), np.percentile(update, 99), np.median(run), np.percentile(run, 99)
+
+
+if __name__ == "__main__":
+
+    print("{:>8} {:>10} | {:>21} | {:>21}".format("", "", "update [us]", "run [us]"))
+    print("{:>8} {:>10} | {:>10} {:>10} | {:>10} {:>10}".format(
+        "n_steps", "yaw rate", "p50", "p99", "p50", "p99"))
+    for n_steps in HORIZONS:
+        for yaw_rate in YAW_RATES:
+            print("{:>8} {:>10.1f} | {:>10.1f} {:>10.1f} | {:>10.1f} {:>10.1f}".format(
+                n_steps, yaw_rate, *[t * 1e6 for t in benchmark(n_steps, yaw_rate)]))
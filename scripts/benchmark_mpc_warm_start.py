@@ -0,0 +1,88 @@
+# coding: utf8
+
+"""Benchmark of the warm start of the OSQP MPC on the predefined velocity profiles of the Joystick. For each
+profile the planner and the MPC run in closed loop on the predicted trajectory of the MPC, once with the shifted
+primal and dual warm start and once without it (OSQP then starts from the previous solution as it is), and the
+number of iterations and the solve time of each call of the solver are logged.
+Run with: python benchmark_mpc_warm_start.py"""
+
+import numpy as np
+import libquadruped_reactive_walking as lqrw
+from Joystick import Joystick
+from utils_kinematics import rpy_to_quaternion, yaw_rotation
+from benchmark_mpc_condensed import MASS, INERTIA
+
+VEL_IDS = range(7)
+N_SIMULATION = 10000  # Number of wbc time steps for each profile
+
+
+def run_profile(velID, warm_start):
+    """Return the number of iterations and the solve time [s] of each call of the solver
+
+    Args:
+        velID (int): identifier of the velocity profile of the Joystick
+        warm_start (bool): use the shifted warm start of the MPC
+    """
+
+    params = lqrw.Params()
+    params.mass = MASS
+    params.I_mat = INERTIA
+    params.osqp_warm_start = warm_start
+    k_mpc = int(round(params.dt_mpc / params.dt_wbc))
+
+    planner = lqrw.Planner(params)
+    mpc = lqrw.MPC(params)
+    joystick = Joystick(True)
+
+    n_steps = planner.statePlanner.getNSteps()
+    xref = np.zeros((12, n_steps + 1))
+    fsteps = np.zeros((params.N_gait, 12))
+    cgait = planner.gait.getCurrentGait()
+    targetFootstep = np.zeros((3, 4))
+    feet_p = np.zeros((3, 4))
+    feet_v = np.zeros((3, 4))
+    feet_a = np.zeros((3, 4))
+
+    # State of the base, following the trajectory predicted by the MPC
+    x = np.zeros(12)
+    x[2] = params.h_ref
+    q = np.zeros((7, 1))
+    h_v = np.zeros((6, 1))
+
+    iterations = []
+    solve = []
+    for k in range(N_SIMULATION):
+        joystick.update_v_ref(k, velID)
+
+        q[0:3, 0] = x[0:3]
+        rpy_to_quaternion(x[3:6], out=q[3:7, 0])
+        hRb = yaw_rotation(x[5]).T
+        h_v[0:3, 0] = hRb @ x[6:9]
+        h_v[3:6, 0] = hRb @ x[9:12]
+        planner.runPlanner(k, q, h_v, joystick.v_ref, 0, True, xref, fsteps, cgait, targetFootstep,
+                           feet_p, feet_v, feet_a)
+
+        if (k % k_mpc) == 0:
+            xref[:, 0] = x
+            mpc.run(k // k_mpc, xref, fsteps)
+            if k > 0:
+                iterations.append(mpc.get_iterations())
+                solve.append(mpc.get_durations()[1, 0])
+            x = mpc.get_latest_result()[0:12, 0]
+
+    return np.array(iterations), np.array(solve)
+
+
+if __name__ == "__main__":
+
+    print("{:>6} | {:>26} | {:>26} | {:>26} | {:>26}".format(
+        "", "iterations (unshifted)", "iterations (shifted)", "solve (unshifted) [us]", "solve (shifted) [us]"))
+    print("{:>6} | ".format("velID") + " | ".join(["{:>8} {:>8} {:>8}".format("mean", "p50", "p99")] * 4))
+    for velID in VEL_IDS:
+        unshifted = run_profile(velID, False)
+        shifted = run_profile(velID, True)
+        stats = []
+        for data, scale in [(unshifted[0], 1.0), (shifted[0], 1.0), (unshifted[1], 1e6), (shifted[1], 1e6)]:
+            data = data * scale
+            stats.append("{:>8.1f} {:>8.1f} {:>8.1f}".format(np.mean(data), *np.percentile(data, [50, 99])))
+        print("{:>6} | ".format(velID) + " | ".join(stats))
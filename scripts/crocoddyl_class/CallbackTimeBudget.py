@@ -0,0 +1,103 @@
+# coding: utf8
+
+import crocoddyl
+import numpy as np
+from time import perf_counter
+
+# Statistics of a solve of the DDP solver (columns of CallbackTimeBudget.stats and of mpc_ddp_stats in LoggerControl)
+DDP_STATS = ["iter", "stop_reason", "cost", "feasible", "solve_time"]
+
+# Statistics of each iteration of the DDP solver (columns of CallbackTimeBudget.iterations)
+DDP_ITERATION_STATS = ["cost", "stop", "x_reg", "u_reg", "step_length", "time"]
+
+# Reasons for the end of a solve (stop_reason column of DDP_STATS)
+STOP_CONVERGED = 0  # Stopping criteria below the threshold of the solver
+STOP_MAX_ITERATION = 1  # max_iteration iterations done
+STOP_TIME_BUDGET = 2  # Not enough time left in the budget for another iteration
+STOP_FAILED = 3  # Maximum regularisation reached
+
+
+class TimeBudgetExceeded(Exception):
+    """Raised by CallbackTimeBudget to interrupt the DDP solver between two iterations"""
+
+
+class CallbackTimeBudget(crocoddyl.CallbackAbstract):
+    """Callback of the DDP solver that records statistics about each iteration and interrupts the solver when
+    another iteration, as long as the last one, would exceed the wall-clock budget of the solve. Statistics are
+    written in preallocated arrays, iterations beyond the size of the buffer are only counted.
+
+    Args:
+        budget (float): Wall-clock budget of each solve [s] (negative for no limit)
+        max_iteration (int): Number of iterations that can be recorded
+    """
+
+    def __init__(self, budget, max_iteration):
+        crocoddyl.CallbackAbstract.__init__(self)
+
+        self.budget = budget
+
+        # Statistics of the last solve and of each of its iterations
+        self.stats = np.zeros(len(DDP_STATS))
+        self.iterations = np.zeros((max_iteration, len(DDP_ITERATION_STATS)))
+
+        # State of the current solve
+        self.n_iter = 0  # Number of iterations done
+        self.max_iteration = max_iteration
+        self.t_start = 0.0  # Time at which the budget started [s]
+        self.t_last = 0.0  # Time at which the last iteration ended [s]
+        self.limited = False  # Whether the solve can be interrupted
+
+    def __call__(self, solver):
+        t = perf_counter()
+        if self.n_iter < self.iterations.shape[0]:
+            self.iterations[self.n_iter] = [solver.cost, solver.stop, solver.x_reg, solver.u_reg, solver.stepLength,
+                                            t - self.t_last]
+        self.n_iter += 1
+
+        # Stop if one more iteration would not fit in what remains of the budget
+        if self.limited and self.n_iter < self.max_iteration and (2 * t - self.t_last - self.t_start) > self.budget:
+            raise TimeBudgetExceeded()
+        self.t_last = t
+
+    def solve(self, solver, init_xs, init_us, max_iteration, t_start, limited=True):
+        """Run the solver within what remains of the budget and fill the statistics of the solve. If the solver
+        is interrupted before the gaps of the warm start are closed, the states of the solution are replaced by
+        the rollout of its commands so that the result is dynamically feasible.
+        Return True if the solver has converged.
+
+        Args:
+            solver (SolverDDP): solver whose callbacks include this object
+            init_xs (list): warm start of the states
+            init_us (list): warm start of the commands
+            max_iteration (int): maximum number of iterations of the solver
+            t_start (float): time at which the budget started, from perf_counter [s]
+            limited (bool): interrupt the solver at the end of the budget
+        """
+
+        self.n_iter = 0
+        self.max_iteration = max_iteration
+        self.t_start = t_start
+        self.t_last = perf_counter()
+        self.limited = limited and self.budget > 0.0
+        self.iterations[:, :] = 0.0
+
+        try:
+            converged = solver.solve(init_xs, init_us, max_iteration)
+            if converged:
+                reason = STOP_CONVERGED
+            else:
+                reason = STOP_MAX_ITERATION if self.n_iter >= max_iteration else STOP_FAILED
+            cost = solver.cost
+        except TimeBudgetExceeded:
+            converged = False
+            reason = STOP_TIME_BUDGET
+            cost = solver.cost
+            if not solver.isFeasible:
+                us = solver.us
+                xs = solver.problem.rollout(us)
+                cost = solver.problem.calc(xs, us)
+                solver.setCandidate(xs, us, True)
+
+        self.stats[:] = [self.n_iter, reason, cost, solver.isFeasible, perf_counter() - t_start]
+
+        return converged
@@ -1,8 +1,11 @@
 # coding: utf8
 
+import os
 import crocoddyl
 import numpy as np
 import quadruped_walkgen as quadruped_walkgen
+from time import perf_counter
+from crocoddyl_class.CallbackTimeBudget import CallbackTimeBudget
 
 
 class MPC_crocoddyl:
@@ -15,9 +18,11 @@ class MPC_crocoddyl:
         mu (float): Friction coefficient
         inner(bool): Inside or outside approximation of the friction cone
         linearModel(bool) : Approximation in the cross product by using desired state
+        nthreads (int): Number of threads computing the derivatives of the nodes (0 for all cores),
+                        params.crocoddyl_nthreads if None
     """
 
-    def __init__(self, params,  mu=1, inner=True, linearModel=True):
+    def __init__(self, params,  mu=1, inner=True, linearModel=True, nthreads=None):
 
         # Time step of the solver
         self.dt = params.dt_mpc
@@ -25,6 +30,9 @@ class MPC_crocoddyl:
         # Period of the MPC
         self.T_mpc = params.T_mpc
 
+        # Number of nodes of the prediction horizon
+        self.n_nodes = int(round(self.T_mpc/self.dt))
+
         # Mass of the robot
         self.mass = 2.50000279
 
@@ -93,7 +101,7 @@ class MPC_crocoddyl:
         # Initialisation of the List model using ActionQuadrupedModel()
         # The same model cannot be used [model]*(T_mpc/dt) because the dynamic
         # model changes for each nodes.
-        for i in range(int(self.T_mpc/self.dt)):
+        for i in range(self.n_nodes):
             if linearModel:
                 model = quadruped_walkgen.ActionModelQuadruped()
             else:
@@ -145,12 +153,40 @@ class MPC_crocoddyl:
         # Shooting problem
         self.problem = crocoddyl.ShootingProblem(np.zeros(12),  self.ListAction, self.terminalModel)
 
+        # Number of threads used by the shooting problem to evaluate the nodes in parallel
+        self.nthreads = params.crocoddyl_nthreads if nthreads is None else nthreads
+        if self.nthreads <= 0:
+            self.nthreads = os.cpu_count() or 1
+        if hasattr(self.problem, "nthreads"):
+            self.problem.nthreads = self.nthreads
+        elif self.nthreads > 1:
+            print("Warning: this version of Crocoddyl evaluates the nodes of the MPC with a single thread")
+
         # DDP Solver
         self.ddp = crocoddyl.SolverDDP(self.problem)
 
-        # Warm start
-        self.x_init = []
-        self.u_init = []
+        # Wall-clock budget of each solve, update of the problem included, one period of the MPC by default,
+        # and statistics of the solves
+        budget = self.dt if params.crocoddyl_time_budget == 0.0 else params.crocoddyl_time_budget
+        self.callback = CallbackTimeBudget(budget, self.max_iteration)
+        self.ddp.setCallbacks([self.callback])
+
+        # Inputs of the models, updated in place so that the arguments of updateModel are views created once:
+        # position of the feet of each node as a 3x4 matrix (one foot per column) and desired state of each node
+        self.feet = self.fsteps.reshape((-1, 4, 3)).transpose((0, 2, 1))
+        self.xref = np.zeros((12, self.n_nodes + 1), order='F')
+        self.model_args = list(zip(self.ListAction, self.feet, self.xref[:, 1:].T, self.gait))
+
+        # Warm start, the lists hold views of the rows of xs_init and us_init
+        self.xs_init = np.zeros((self.n_nodes + 1, 12))
+        self.us_init = np.zeros((self.n_nodes, 12))
+        self.x_init = list(self.xs_init)
+        self.u_init = list(self.us_init)
+        self.u_guess = np.array(4*[0.5, 0.5, 5.])  # Guess of the forces of a foot in contact for the last node
+
+        # Solution of the last solve, predicted states (without the initial one) in the first 12 rows and
+        # forces in the last 12 rows, filled once per solve and returned as views
+        self.result = np.zeros((24, self.n_nodes))
 
     def updateProblem(self, fsteps, xref):
         """Update the dynamic of the model list according to the predicted position of the feet,
@@ -161,29 +197,26 @@ class MPC_crocoddyl:
             xref (12x17): Desired state vector for the whole gait cycle
             (the initial state is the first column)
         """
-        # Update position of the feet
+        # Update position of the feet and desired state
         self.fsteps[:, :] = fsteps[:, :]
+        self.xref[:, :] = xref
 
         # Update initial state of the problem
-        self.problem.x0 = xref[:, 0]
+        self.problem.x0 = self.xref[:, 0]
 
         # Construction of the gait matrix representing the feet in contact with the ground
-        self.index = 0
-        while (np.any(self.fsteps[self.index, :])):
-            self.index += 1
+        in_gait = np.any(self.fsteps, axis=1)
+        self.index = int(np.argmin(in_gait)) if not np.all(in_gait) else in_gait.size
         self.gait[:self.index, :] = 1.0 - (self.fsteps[:self.index, 0::3] == 0.0)
         self.gait[self.index:, :] = 0.0
 
-        # Iterate over all phases of the gait
+        # Iterate over all phases of the gait, with arguments that are views of the updated inputs
         # The first column of xref correspond to the current state
-        for j in range(self.index):
-            # Update model
-            self.ListAction[j].updateModel(np.reshape(self.fsteps[j, :], (3, 4), order='F'),
-                                           xref[:, j+1], self.gait[j, :])
+        for model, feet, x, contacts in self.model_args[:self.index]:
+            model.updateModel(feet, x, contacts)
 
         # Update model of the terminal model
-        self.terminalModel.updateModel(np.reshape(
-            self.fsteps[self.index-1, :], (3, 4), order='F'), xref[:, -1], self.gait[self.index-1, :])
+        self.terminalModel.updateModel(self.feet[self.index-1], self.xref[:, -1], self.gait[self.index-1, :])
 
         return 0
 
@@ -196,43 +229,39 @@ class MPC_crocoddyl:
             fsteps : feet predicted positions
         """
 
+        t_start = perf_counter()
+
         # Update the dynamic depending on the predicted feet position
         self.updateProblem(fsteps, xref)
 
-        self.x_init.clear()
-        self.u_init.clear()
-
-        # Warm start : set candidate state and input vector
+        # Warm start : set candidate state and input vector, the previous solution shifted by one node
         if self.warm_start and k != 0:
 
-            self.u_init = self.ddp.us[1:]
-            self.u_init.append(np.repeat(self.gait[self.index-1, :], 3)*np.array(4*[0.5, 0.5, 5.]))
+            self.us_init[:-1] = self.result[12:, 1:].T
+            self.us_init[-1] = np.repeat(self.gait[self.index-1, :], 3)*self.u_guess
 
-            self.x_init = self.ddp.xs[2:]
-            self.x_init.insert(0, xref[:, 0])
-            self.x_init.append(self.ddp.xs[-1])
+            self.xs_init[0] = xref[:, 0]
+            self.xs_init[1:-1] = self.result[:12, 1:].T
+            self.xs_init[-1] = self.result[:12, -1]
 
-        """print("1")
-        from IPython import embed
-        embed()"""
-        self.ddp.solve(self.x_init,  self.u_init, self.max_iteration)
+            self.callback.solve(self.ddp, self.x_init, self.u_init, self.max_iteration, t_start)
+        else:
+            # The first solve is not limited
+            self.callback.solve(self.ddp, [], [], self.max_iteration, t_start, limited=(k != 0))
 
-        """print("3")
-        from IPython import embed
-        embed()"""
+        # Copy the solution in the preallocated result, each access to ddp.xs and ddp.us converts the whole list
+        np.stack(self.ddp.xs[1:], axis=1, out=self.result[:12])
+        np.stack(self.ddp.us, axis=1, out=self.result[12:])
 
         return 0
 
     def get_latest_result(self):
-        """Returns the desired contact forces that have been computed by the last iteration of the MPC
+        """Returns the desired contact forces that have been computed by the last iteration of the MPC,
+        the array is overwritten by the next solve
         Args:
         """
 
-        output = np.zeros((24, int(self.T_mpc/self.dt)))
-        for i in range(int(self.T_mpc/self.dt)):
-            output[:12, i] = np.asarray(self.ddp.xs[i+1])
-            output[12:, i] = np.asarray(self.ddp.us[i])
-        return output
+        return self.result
 
     def get_xrobot(self):
         """Returns the state vectors predicted by the mpc throughout the time horizon, the initial column
@@ -240,14 +269,14 @@ class MPC_crocoddyl:
         Args:
         """
 
-        return np.array(self.ddp.xs)[1:, :].transpose()
+        return self.result[:12]
 
     def get_fpredicted(self):
         """Returns the force vectors command predicted by the mpc throughout the time horizon,
         Args:
         """
 
-        return np.array(self.ddp.us)[:, :].transpose()[:, :]
+        return self.result[12:]
 
     def updateActionModel(self):
         """Update the quadruped model with the new weights or model parameters.
@@ -1,9 +1,12 @@
 # coding: utf8
 
+import os
 import crocoddyl
 import numpy as np
 import quadruped_walkgen as quadruped_walkgen
 import pinocchio as pin
+from time import perf_counter
+from crocoddyl_class.CallbackTimeBudget import CallbackTimeBudget
 
 class MPC_crocoddyl_planner():
     """Wrapper class for the MPC problem to call the ddp solver and
@@ -14,9 +17,11 @@ class MPC_crocoddyl_planner():
         T_mpc (float): Duration of the prediction horizon
         mu (float): Friction coefficient
         inner(bool): Inside or outside approximation of the friction cone
+        nthreads (int): Number of threads computing the derivatives of the nodes (0 for all cores),
+                        params.crocoddyl_nthreads if None
     """
 
-    def __init__(self, params,  mu=1, inner=True, warm_start=True, min_fz=0.0):
+    def __init__(self, params,  mu=1, inner=True, warm_start=True, min_fz=0.0, nthreads=None):
 
         # Time step of the solver
         self.dt = params.dt_mpc
@@ -77,8 +82,8 @@ class MPC_crocoddyl_planner():
         self.max_iteration = 10
 
         # Warm-start for the solver
-        # Always on, just an approximation, not the previous result
-        # TODO : create a proper warm-start with the previous optimisation
+        # Previous solution shifted by one node if enabled, otherwise an approximation built from the reference
+        # (also used for the first iteration and for the parts of the horizon the previous solution does not cover)
         self.warm_start = warm_start
 
         # Minimum normal force(N) and reference force vector bool
@@ -103,13 +108,29 @@ class MPC_crocoddyl_planner():
         # Shooting problem
         self.problem = None
 
+        # Number of threads used by the shooting problem to evaluate the nodes in parallel
+        self.nthreads = params.crocoddyl_nthreads if nthreads is None else nthreads
+        if self.nthreads <= 0:
+            self.nthreads = os.cpu_count() or 1
+        if not hasattr(crocoddyl.ShootingProblem, "nthreads") and self.nthreads > 1:
+            print("Warning: this version of Crocoddyl evaluates the nodes of the MPC with a single thread")
+
         # ddp solver
         self.ddp = None
 
+        # Wall-clock budget of each solve, update of the problem included, one period of the MPC by default,
+        # and statistics of the solves
+        budget = self.dt if params.crocoddyl_time_budget == 0.0 else params.crocoddyl_time_budget
+        self.callback = CallbackTimeBudget(budget, self.max_iteration)
+
         # Xs results without the actionStepModel
         self.Xs = np.zeros((20, int(self.T_mpc/self.dt)))
         # self.Us = np.zeros((12,int(T_mpc/dt)))
 
+        # Solution of the last solve for the augmented models, states in the first 12 rows, forces in the next
+        # 12 rows and positions of the feet in the last 8 rows, filled once per solve and returned as a view
+        self.result = np.zeros((32, int(self.T_mpc/self.dt)))
+
         # Initial foot location (local frame, X,Y plan)
         self.p0 = [0.1946, 0.14695, 0.1946, -0.14695, -0.1946,   0.14695, -0.1946,  -0.14695]
 
@@ -162,11 +183,16 @@ class MPC_crocoddyl_planner():
             l_stop : current and target position of the feet (given by footstepTragectory generator)
         """
 
+        t_start = perf_counter()
+
         # Update the dynamic depending on the predicted feet position
         self.updateProblem(k, xref, l_feet, l_stop)
 
-        # Solve problem
-        self.ddp.solve(self.x_init, self.u_init, self.max_iteration)
+        # Solve problem, the first solve is not limited
+        self.callback.solve(self.ddp, self.x_init, self.u_init, self.max_iteration, t_start, limited=(k != 0))
+
+        # Copy the solution of the augmented models in the preallocated arrays
+        self.update_result()
 
         # Reset to 0 the stopWeights for next optimisation
         for index_stopped in self.index_stop_optimisation :
@@ -180,6 +206,11 @@ class MPC_crocoddyl_planner():
 
         Args:
         """
+        # Previous solution and its layout of nodes, to warm start the solver with it
+        previous = None
+        if self.warm_start and self.ddp is not None:
+            previous = (self.ddp.xs, self.ddp.us, self.gait.copy()) + self.get_node_layout()
+
         # Save previous gait state before updating the gait
         self.gait_old[0, :] = self.gait[0, :].copy()        
 
@@ -291,35 +322,101 @@ class MPC_crocoddyl_planner():
 
         # Shooting problem
         self.problem = crocoddyl.ShootingProblem(np.zeros(20),  self.ListAction, self.terminalModel)
+        if hasattr(self.problem, "nthreads"):
+            self.problem.nthreads = self.nthreads
 
         self.problem.x0 = np.concatenate([xref[:, 0], p0])
 
         # DDP Solver
         self.ddp = crocoddyl.SolverDDP(self.problem)
+        self.ddp.setCallbacks([self.callback])
+
+        # Warm-start with the previous solution
+        if previous is not None:
+            self.shift_warm_start(*previous)
+
+        return 0
+
+    def get_node_layout(self):
+        """Return the index in ListAction of the augmented model of each node, and the index of the step model
+        placed before it (-1 if the feet in contact do not change at this node)
+        """
+
+        augmented = []
+        steps = []
+        step = -1
+        for i in range(len(self.ListAction)):
+            if self.ListAction[i].__class__.__name__ == "ActionModelQuadrupedStep":
+                step = i
+            else:
+                augmented.append(i)
+                steps.append(step)
+                step = -1
+
+        return augmented, steps
+
+    def shift_warm_start(self, xs, us, gait, augmented, steps):
+        """Replace the approximated warm-start by the previous solution, shifted by one node. Node j of the new
+        problem starts from node j+1 of the previous one, the last node is repeated at the end of the horizon.
+        Forces are only reused if the same feet are in contact, and commands of step models if the previous node
+        also started with a step.
+
+        Args:
+            xs (list): states of the previous solution
+            us (list): commands of the previous solution
+            gait (array): gait matrix of the previous solution
+            augmented (list): index of the augmented model of each node of the previous solution
+            steps (list): index of the step model before each node of the previous solution (-1 if none)
+        """
+
+        for j, (i_augmented, i_step) in enumerate(zip(*self.get_node_layout())):
+            j_prev = min(j + 1, len(augmented) - 1)
+            same_contacts = np.array_equal(gait[j_prev, :], self.gait[j, :])
+
+            if i_step >= 0:
+                if steps[j_prev] >= 0 and same_contacts:
+                    self.x_init[i_step] = xs[steps[j_prev]]
+                    self.u_init[i_step] = us[steps[j_prev]]
+                else:
+                    self.x_init[i_step] = xs[augmented[j_prev]]
+
+            self.x_init[i_augmented] = xs[augmented[j_prev]]
+            if same_contacts:
+                self.u_init[i_augmented] = us[augmented[j_prev]]
+
+        # The first state is the current one, the terminal one is repeated
+        self.x_init[0] = self.problem.x0
+        self.x_init[-1] = xs[-1]
+
+        return 0
+
+    def update_result(self):
+        """Copy the states and commands of the augmented models of the last solve in Xs and result, the step models
+        are skipped. Each access to ddp.xs and ddp.us converts the whole list, so they are retrieved once.
+        """
+
+        augmented = self.get_node_layout()[0]
+        n = len(augmented)
+        if n > self.result.shape[1]:
+            raise ValueError("Too many action model considering the current MPC prediction horizon")
+
+        xs = self.ddp.xs
+        us = self.ddp.us
+        np.stack([xs[i] for i in augmented], axis=1, out=self.Xs[:, :n])
+        self.result[:12, :n] = self.Xs[:12, :n]
+        np.stack([us[i] for i in augmented], axis=1, out=self.result[12:24, :n])
+        self.result[24:, :n] = self.Xs[12:, :n]
+        self.result[:, n:] = 0.0
 
         return 0
 
     def get_latest_result(self):
-        """Return the desired contact forces that have been computed by the last iteration of the MPC
+        """Return the desired contact forces that have been computed by the last iteration of the MPC,
+        the array is overwritten by the next solve
         Args:
         """
 
-        cpt = 0
-        N = int(self.T_mpc / self.dt)
-        result = np.zeros((32, N))
-        for i in range(len(self.ListAction)):
-            if self.ListAction[i].__class__.__name__ != "ActionModelQuadrupedStep":
-                if cpt >= N:
-                    raise ValueError("Too many action model considering the current MPC prediction horizon")
-                result[:12, cpt] = self.ddp.xs[i][:12]
-                result[12:24, cpt] = self.ddp.us[i]  # * np.repeat(self.gait[cpt, :] , 3)
-                result[24:, cpt] = self.ddp.xs[i][12:]
-                cpt += 1
-                if i > 0 and self.ListAction[i-1].__class__.__name__ == "ActionModelQuadrupedStep":
-                    # print(self.ddp.xs[i][12:])
-                    pass
-
-        return result
+        return self.result
 
     def update_model_augmented(self, model):
         '''Set intern parameters for augmented model type
@@ -11,6 +11,8 @@ import numpy as np
 import argparse
 from LoggerSensors import LoggerSensors
 from LoggerControl import LoggerControl
+from RealTime import RealTime
+from LoadShedder import SHED_LOGGING
 import libquadruped_reactive_walking as lqrw
 
 params = lqrw.Params()  # Object that holds all controller parameters
@@ -172,8 +174,15 @@ def control_loop(name_interface, name_interface_clone=None, des_vel_analysis=Non
     t = 0.0
     t_max = (params.N_SIMULATION-2) * params.dt_wbc
 
+    # Pin the loop to its core, lock memory and freeze the garbage collector if real-time mode is enabled
+    realtime = RealTime(params, size=params.N_SIMULATION)
+    realtime.start()
+
     while ((not device.hardware.IsTimeout()) and (t < t_max) and (not controller.myController.error)):
 
+        # Measure the work of the tick to shed non-critical work if it is late
+        controller.shedder.start()
+
         # Update sensor data (IMU, encoders, Motion capture)
         device.UpdateMeasurment()
 
@@ -198,14 +207,22 @@ def control_loop(name_interface, name_interface_clone=None, des_vel_analysis=Non
         # Call logger
         if params.LOGGING or params.PLOTTING:
             loggerSensors.sample(device, qc)
-            loggerControl.sample(controller.joystick, controller.estimator,
-                                 controller, controller.gait, controller.statePlanner,
-                                 controller.footstepPlanner, controller.footTrajectoryGenerator,
-                                 controller.myController)
+            if controller.shedder.run(SHED_LOGGING):
+                loggerControl.sample(controller.joystick, controller.estimator,
+                                     controller, controller.gait, controller.statePlanner,
+                                     controller.footstepPlanner, controller.footTrajectoryGenerator,
+                                     controller.myController)
+            else:
+                loggerControl.skip()
+
+        controller.shedder.stop()
 
         # Send command to the robot
         for i in range(1):
-            device.SendCommand(WaitEndOfCycle=True)
+            device.SendCommand(WaitEndOfCycle=not realtime.enabled)
+
+        # Sleep until the absolute deadline of the iteration in real-time mode
+        realtime.wait_end_of_cycle()
         """if ((device.cpt % 100) == 0):
             device.Print()"""
 
@@ -236,6 +253,8 @@ def control_loop(name_interface, name_interface_clone=None, des_vel_analysis=Non
 
         t += params.dt_wbc  # Increment loop time
 
+    realtime.stop()
+
     # ****************************************************************
 
     if (t >= t_max):
@@ -284,17 +303,21 @@ def control_loop(name_interface, name_interface_clone=None, des_vel_analysis=Non
         print("Either the masterboard has been shut down or there has been a connection issue with the cable/wifi.")
     device.hardware.Stop()  # Shut down the interface between the computer and the master board
 
+    # Summary of the computation time of each stage of the control loop
+    controller.profiler.summary()
+
+    # Distribution of the wake up delays of the control loop in real-time mode
+    realtime.summary()
+
+    # Non-critical work that has been shed because the control loop was late
+    controller.shedder.summary()
+
     # Plot estimated computation time for each step for the control architecture
     from matplotlib import pyplot as plt
     """plt.figure()
-    plt.plot(controller.t_list_filter[1:], 'r+')
-    plt.plot(controller.t_list_planner[1:], 'g+')
-    plt.plot(controller.t_list_mpc[1:], 'b+')
-    plt.plot(controller.t_list_wbc[1:], '+', color="violet")
-    plt.plot(controller.t_list_loop[1:], 'k+')
-    plt.plot(controller.t_list_InvKin[1:], 'o', color="darkgreen")
-    plt.plot(controller.t_list_QPWBC[1:], 'o', color="royalblue")
-    plt.legend(["Estimator", "Planner", "MPC", "WBC", "Whole loop", "InvKin", "QP WBC"])
+    for name in controller.profiler.stages + ["loop"]:
+        plt.plot(controller.profiler.get_durations(name)[1:], '+')
+    plt.legend(controller.profiler.stages + ["loop"])
     plt.title("Loop time [s]")
     plt.show(block=True)"""
     """plt.figure()
@@ -310,6 +333,7 @@ def control_loop(name_interface, name_interface_clone=None, des_vel_analysis=Non
     # Save the logs of the Logger object
     if params.LOGGING:
         loggerControl.saveAll(loggerSensors)
+        controller.profiler.saveAll()
         print("Log saved")
 
     if params.SIMULATION and params.enable_pyb_GUI:
@@ -331,14 +331,9 @@ def control_loop(name_interface, name_interface_clone=None, des_vel_analysis=Non
     # Plot estimated computation time for each step for the control architecture
     from matplotlib import pyplot as plt
     """plt.figure()
-    plt.plot(controller.t_list_filter[1:], 'r+')
-    plt.plot(controller.t_list_planner[1:], 'g+')
-    plt.plot(controller.t_list_mpc[1:], 'b+')
-    plt.plot(controller.t_list_wbc[1:], '+', color="violet")
-    plt.plot(controller.t_list_loop[1:], 'k+')
-    plt.plot(controller.t_list_InvKin[1:], 'o', color="darkgreen")
-    plt.plot(controller.t_list_QPWBC[1:], 'o', color="royalblue")
-    plt.legend(["Estimator", "Planner", "MPC", "WBC", "Whole loop", "InvKin", "QP WBC"])
+    for name in controller.profiler.stages + ["loop"]:
+        plt.plot(controller.profiler.get_durations(name)[1:], '+')
+    plt.legend(controller.profiler.stages + ["loop"])
     plt.title("Loop time [s]")
     plt.show(block=True)"""
     """plt.figure()
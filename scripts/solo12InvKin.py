@@ -18,8 +18,9 @@ class Solo12InvKin:
 
         # Memory assignation for variables
         self.cpp_posf = np.zeros((4, 3))
-        self.cpp_vf = np.zeros((4, 3))
-        self.cpp_wf = np.zeros((4, 3))
+        self.cpp_nuf = np.zeros((4, 6))  # Linear and angular velocities of the feet
+        self.cpp_vf = self.cpp_nuf[:, :3]
+        self.cpp_wf = self.cpp_nuf[:, 3:]
         self.cpp_af = np.zeros((4, 3))
         self.cpp_Jf = np.zeros((12, 12))
 
@@ -27,6 +28,11 @@ class Solo12InvKin:
         self.dq_cmd = np.zeros((18,))
         self.q_cmd = np.zeros((19,))
 
+        # Workspace buffers updated in place at each iteration to avoid allocations in the control loop
+        self.contacts = np.zeros((1, 4))
+        self.q_step = np.zeros(12)
+        self.a_zero = np.zeros(self.robot.model.nv)
+
         # Get frame IDs
         FL_FOOT_ID = self.robot.model.getFrameId('FL_FOOT')
         FR_FOOT_ID = self.robot.model.getFrameId('FR_FOOT')
@@ -35,36 +41,30 @@ class Solo12InvKin:
         self.BASE_ID = FL_FOOT_ID # self.robot.model.getFrameId('base_link') TODO REMOVE
         self.foot_ids = np.array([FL_FOOT_ID, FR_FOOT_ID, HL_FOOT_ID, HR_FOOT_ID])
 
-    def cross3(self, left, right):
-        """Numpy is inefficient for this"""
-        return np.array([left[1] * right[2] - left[2] * right[1],
-                         left[2] * right[0] - left[0] * right[2],
-                         left[0] * right[1] - left[1] * right[0]])
-
     def refreshAndCompute(self, q, dq, contacts, pgoals, vgoals, agoals):
 
         # Update model and data of the robot
         pin.computeJointJacobians(self.robot.model, self.robot.data, q)
-        pin.forwardKinematics(self.robot.model, self.robot.data, q, dq, np.zeros(self.robot.model.nv))
+        pin.forwardKinematics(self.robot.model, self.robot.data, q, dq, self.a_zero)
         pin.updateFramePlacements(self.robot.model, self.robot.data)
 
         # Get data required by IK with Pinocchio
         for i_ee in range(4):
             idx = int(self.foot_ids[i_ee])
             self.cpp_posf[i_ee, :] = self.robot.data.oMf[idx].translation
-            nu = pin.getFrameVelocity(self.robot.model, self.robot.data, idx, pin.LOCAL_WORLD_ALIGNED)
-            self.cpp_vf[i_ee, :] = nu.linear
-            self.cpp_wf[i_ee, :] = nu.angular
+            self.cpp_nuf[i_ee, :] = pin.getFrameVelocity(self.robot.model, self.robot.data, idx,
+                                                         pin.LOCAL_WORLD_ALIGNED).vector
             self.cpp_af[i_ee, :] = pin.getFrameAcceleration(self.robot.model, self.robot.data, idx, pin.LOCAL_WORLD_ALIGNED).linear
             self.cpp_Jf[(3*i_ee):(3*(i_ee+1)), :] = pin.getFrameJacobian(self.robot.model, self.robot.data, idx, pin.LOCAL_WORLD_ALIGNED)[:3]
 
-        # IK output for accelerations of actuators
-        self.ddq_cmd[6:] = self.InvKinCpp.refreshAndCompute(np.array([contacts]), pgoals, vgoals, agoals,
-                                                            self.cpp_posf, self.cpp_vf, self.cpp_wf,
-                                                            self.cpp_af, self.cpp_Jf)
+        # IK output for accelerations of actuators, outputs are written in place
+        self.contacts[0, :] = contacts
+        self.InvKinCpp.refreshAndCompute(self.contacts, pgoals, vgoals, agoals, self.cpp_posf, self.cpp_vf,
+                                         self.cpp_wf, self.cpp_af, self.cpp_Jf, self.ddq_cmd[6:])
 
-        self.dq_cmd[6:] = self.InvKinCpp.get_dq_cmd()  # IK output for velocities of actuators
-        self.q_cmd[7:] = q[:, 0] + self.InvKinCpp.get_q_step()  # IK output for positions of actuators
+        self.InvKinCpp.get_dq_cmd(self.dq_cmd[6:])  # IK output for velocities of actuators
+        self.InvKinCpp.get_q_step(self.q_step)
+        np.add(q[:, 0], self.q_step, out=self.q_cmd[7:])  # IK output for positions of actuators
 
         return self.ddq_cmd
 
@@ -0,0 +1,173 @@
+import math
+import numpy as np
+
+#########################################################################
+# Vectorised kinematics helpers                                         #
+#                                                                       #
+# Functions work on a single vector (3, ) / (3 x 1) or on a batch of    #
+# column vectors (3 x N), typically the 4 feet of the robot. They take  #
+# an optional out argument so that the control loop can use its own     #
+# preallocated buffers instead of creating new arrays at each iteration #
+#########################################################################
+
+
+def skew(v, out=None):
+    """Return the skew matrix of a vector, such that skew(v) @ x = v x x
+
+    Args:
+        v (3x0 or 3x1 array): vector
+        out (3x3 array): optional array in which the result is stored
+    """
+
+    if out is None:
+        out = np.zeros((3, 3))
+    if v.ndim == 2:
+        v = v[:, 0]
+    out[0, 0] = 0.0
+    out[0, 1] = -v[2]
+    out[0, 2] = v[1]
+    out[1, 0] = v[2]
+    out[1, 1] = 0.0
+    out[1, 2] = -v[0]
+    out[2, 0] = -v[1]
+    out[2, 1] = v[0]
+    out[2, 2] = 0.0
+    return out
+
+
+def cross(left, right, out=None, work=None):
+    """Cross product of a vector with a vector or with each column of a matrix
+
+    Args:
+        left (3x0 or 3x1 array): left term of the cross product
+        right (3x0, 3x1 or 3xN array): right term of the cross product
+        out (array): optional array in which the result is stored (same shape as right, must not be right)
+        work (3x3 array): optional buffer for the skew matrix of left
+    """
+
+    return np.matmul(skew(left, work), right, out=out)
+
+
+def yaw_rotation(yaw, out=None):
+    """Return the rotation matrix around the vertical axis. Only the upper left 2x2 block of out is
+    written, so that a 3x3 out keeps its last row and column (identity)
+
+    Args:
+        yaw (float): rotation angle around the vertical axis
+        out (2x2 or 3x3 array): optional array in which the result is stored
+    """
+
+    if out is None:
+        out = np.eye(3)
+    c = math.cos(yaw)
+    s = math.sin(yaw)
+    out[0, 0] = c
+    out[0, 1] = -s
+    out[1, 0] = s
+    out[1, 1] = c
+    return out
+
+
+def rpy_to_rotation(roll, pitch, yaw, out=None):
+    """Return the rotation matrix R = Rz(yaw) Ry(pitch) Rx(roll)
+
+    Args:
+        roll (float): rotation around the x axis
+        pitch (float): rotation around the y axis
+        yaw (float): rotation around the z axis
+        out (3x3 array): optional array in which the result is stored
+    """
+
+    if out is None:
+        out = np.zeros((3, 3))
+    cr = math.cos(roll)
+    sr = math.sin(roll)
+    cp = math.cos(pitch)
+    sp = math.sin(pitch)
+    cy = math.cos(yaw)
+    sy = math.sin(yaw)
+    out[0, 0] = cy * cp
+    out[0, 1] = cy * sp * sr - sy * cr
+    out[0, 2] = cy * sp * cr + sy * sr
+    out[1, 0] = sy * cp
+    out[1, 1] = sy * sp * sr + cy * cr
+    out[1, 2] = sy * sp * cr - cy * sr
+    out[2, 0] = -sp
+    out[2, 1] = cp * sr
+    out[2, 2] = cp * cr
+    return out
+
+
+def rpy_to_quaternion(rpy, out=None):
+    """Roll Pitch Yaw to Quaternion [x, y, z, w]
+
+    Args:
+        rpy (3xN array): roll, pitch and yaw angles (3x0 or 3x1 for a single orientation)
+        out (4xN array): optional array in which the result is stored
+    """
+
+    rpy = np.asarray(rpy, dtype=np.float64)
+    if rpy.ndim == 1:  # Scalar operations are faster than ufuncs for a single orientation
+        if out is None:
+            out = np.zeros(4)
+        roll, pitch, yaw = rpy.tolist()
+        sr = math.sin(0.5 * roll)
+        cr = math.cos(0.5 * roll)
+        sp = math.sin(0.5 * pitch)
+        cp = math.cos(0.5 * pitch)
+        sy = math.sin(0.5 * yaw)
+        cy = math.cos(0.5 * yaw)
+        out[0] = sr * cp * cy - cr * sp * sy
+        out[1] = cr * sp * cy + sr * cp * sy
+        out[2] = cr * cp * sy - sr * sp * cy
+        out[3] = cr * cp * cy + sr * sp * sy
+        return out
+
+    c = np.cos(0.5 * rpy)
+    s = np.sin(0.5 * rpy)
+    if out is None:
+        out = np.zeros((4, ) + rpy.shape[1:])
+    out[0] = s[0] * c[1] * c[2] - c[0] * s[1] * s[2]
+    out[1] = c[0] * s[1] * c[2] + s[0] * c[1] * s[2]
+    out[2] = c[0] * c[1] * s[2] - s[0] * s[1] * c[2]
+    out[3] = c[0] * c[1] * c[2] + s[0] * s[1] * s[2]
+    return out
+
+
+def quaternion_to_rpy(quat, out=None):
+    """Quaternion [x, y, z, w] to Roll Pitch Yaw
+
+    Args:
+        quat (4xN array): quaternions (4x0 or 4x1 for a single orientation)
+        out (3xN array): optional array in which the result is stored
+    """
+
+    quat = np.asarray(quat, dtype=np.float64)
+    if quat.ndim == 1:  # Scalar operations are faster than ufuncs for a single orientation
+        if out is None:
+            out = np.zeros(3)
+        qx, qy, qz, qw = quat.tolist()
+        a0 = 2.0 * (qy * qz + qw * qx)
+        a1 = qw * qw - qx * qx - qy * qy + qz * qz
+        out[0] = math.atan2(a0, a1) if (a0 != 0.0) and (a1 != 0.0) else 0.0
+        out[1] = math.asin(min(max(-2.0 * (qx * qz - qw * qy), -1.0), 1.0))
+        a0 = 2.0 * (qx * qy + qw * qz)
+        a1 = qw * qw + qx * qx - qy * qy - qz * qz
+        out[2] = math.atan2(a0, a1) if (a0 != 0.0) and (a1 != 0.0) else 0.0
+        return out
+
+    qx, qy, qz, qw = quat
+    if out is None:
+        out = np.zeros((3, ) + qx.shape)
+
+    a0 = 2.0 * (qy * qz + qw * qx)
+    a1 = qw * qw - qx * qx - qy * qy + qz * qz
+    out[0] = np.where((a0 != 0.0) & (a1 != 0.0), np.arctan2(a0, a1), 0.0)
+
+    a0 = -2.0 * (qx * qz - qw * qy)
+    out[1] = np.arcsin(np.clip(a0, -1.0, 1.0))
+
+    a0 = 2.0 * (qx * qy + qw * qz)
+    a1 = qw * qw + qx * qx - qy * qy - qz * qz
+    out[2] = np.where((a0 != 0.0) & (a1 != 0.0), np.arctan2(a0, a1), 0.0)
+    return out
@@ -0,0 +1,107 @@
+#include "qrw/AsyncMPC.hpp"
+
+#include <pthread.h>
+#include <sched.h>
+
+AsyncMPC::AsyncMPC(Params& params)
+    : mpc_(params)
+    , running_(true)
+    , handoff_latency_(0.0)
+    , handoff_latency_max_(0.0)
+    , first_(true)
+{
+    // Preallocate all slots so that no allocation happens while running
+    int n_steps = (int)params.getMpcGrid().size();
+    for (int i = 0; i < 3; i++)
+    {
+        inputs_.back().num_iter = 0;
+        inputs_.back().xref = MatrixN::Zero(12, n_steps + 1);
+        inputs_.back().fsteps = MatrixN::Zero(params.N_gait, 12);
+        results_.back().num_iter = 0;
+        results_.back().x_f = MatrixN::Zero(24, n_steps);
+
+        // Publish and consume the slot right away to rotate through the three slots
+        inputs_.publish();
+        inputs_.update();
+        results_.publish();
+        results_.update();
+    }
+
+    thread_ = std::thread(&AsyncMPC::loop, this);
+}
+
+AsyncMPC::~AsyncMPC()
+{
+    stop();
+}
+
+void AsyncMPC::solve(int num_iter, MatrixN const& xref, MatrixN const& fsteps)
+{
+    Inputs& in = inputs_.back();
+    in.num_iter = num_iter;
+    in.xref = xref;
+    in.fsteps = fsteps.unaryExpr([](double v) { return std::isnan(v) ? 0.0 : v; });
+    in.t_dispatch = std::chrono::steady_clock::now();
+    inputs_.publish();
+
+    // Take the lock so that the notification cannot be lost between the check and the wait of loop()
+    {
+        std::lock_guard<std::mutex> lock(mutex_);
+    }
+    cv_.notify_one();
+}
+
+MatrixN AsyncMPC::get_latest_result()
+{
+    results_.update();
+    return results_.front().x_f;
+}
+
+void AsyncMPC::stop()
+{
+    if (!thread_.joinable()) return;
+    {
+        std::lock_guard<std::mutex> lock(mutex_);
+        running_ = false;
+    }
+    cv_.notify_one();
+    thread_.join();
+}
+
+bool AsyncMPC::set_cpu_affinity(int cpu)
+{
+    if (!thread_.joinable() || cpu < 0 || cpu >= CPU_SETSIZE) return false;
+    cpu_set_t cpuset;
+    CPU_ZERO(&cpuset);
+    CPU_SET(cpu, &cpuset);
+    return pthread_setaffinity_np(thread_.native_handle(), sizeof(cpu_set_t), &cpuset) == 0;
+}
+
+void AsyncMPC::loop()
+{
+    while (true)
+    {
+        // Sleep until new inputs are available or the thread has to stop
+        {
+            std::unique_lock<std::mutex> lock(mutex_);
+            cv_.wait(lock, [this] { return !running_ || inputs_.fresh(); });
+        }
+        if (!running_) return;
+        inputs_.update();
+
+        // Delay between the dispatch of the inputs and the wake up of the thread
+        Inputs const& in = inputs_.front();
+        double latency = std::chrono::duration<double>(std::chrono::steady_clock::now() - in.t_dispatch).count();
+        handoff_latency_ = latency;
+        if (latency > handoff_latency_max_) handoff_latency_max_ = latency;
+
+        // The OSQP workspace is created during the first call, whatever the iteration number
+        mpc_.run(first_ ? 0 : in.num_iter, in.xref, in.fsteps);
+        first_ = false;
+
+        results_.back().num_iter = in.num_iter;
+        results_.back().x_f = mpc_.get_latest_result();
+        results_.back().stats = mpc_.get_stats();
+        results_.publish();
+    }
+}
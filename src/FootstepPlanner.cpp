@@ -241,3 +241,17 @@ MatrixN FootstepPlanner::vectorToMatrix(std::vector<Matrix34> const& array)
     }
     return M;
 }
+
+MatrixN FootstepPlanner::getMpcFootsteps()
+{
+    std::vector<int> const& rows = gait_->getMpcRows();
+    MatrixN M = MatrixN::Zero(footsteps_.size(), 12);
+    for (uint i = 0; i < rows.size(); i++)
+    {
+        for (int j = 0; j < 4; j++)
+        {
+            M.row(i).segment<3>(3 * j) = footsteps_[rows[i]].col(j);
+        }
+    }
+    return M;
+}
@@ -23,6 +23,14 @@ void Gait::initialize(Params& params)
     T_mpc_ = params.T_mpc;
     n_steps_ = (int)std::lround(params.T_mpc / params.dt_mpc);
 
+    // Nodes of the MPC start at the beginning of the time steps of the gait matrix
+    VectorN grid = params.getMpcGrid();
+    mpcRows_.assign(1, 0);
+    for (int i = 0; i < grid.size() - 1; i++)
+    {
+        mpcRows_.push_back(mpcRows_.back() + (int)std::lround(grid(i) / dt_));
+    }
+
     pastGait_ = MatrixN::Zero(params.N_gait, 4);
     currentGait_ = MatrixN::Zero(params.N_gait, 4);
     desiredGait_ = MatrixN::Zero(params.N_gait, 4);
@@ -139,6 +147,16 @@ void Gait::create_gait_f()
     }
 }
 
+MatrixN Gait::getMpcGait()
+{
+    MatrixN gait = MatrixN::Zero(currentGait_.rows(), 4);
+    for (uint i = 0; i < mpcRows_.size(); i++)
+    {
+        gait.row(i) = currentGait_.row(mpcRows_[i]);
+    }
+    return gait;
+}
+
 double Gait::getPhaseDuration(int i, int j, double value)
 {
     double t_phase = 1;
@@ -5,13 +5,31 @@ MPC::MPC(Params& params) {
   params_ = &params;
 
   dt = params_->dt_mpc;
-  n_steps = (int)std::round(params_->T_mpc / params_->dt_mpc);
   T_gait = params_->T_gait;
 
+  // Nodes of the prediction horizon, each one lasting a whole number of time steps dt
+  dts = params_->getMpcGrid();
+  n_steps = (int)dts.size();
+  node_start = Eigen::Matrix<int, Eigen::Dynamic, 1>::Zero(n_steps + 1, 1);
+  for (int k = 0; k < n_steps; k++) {
+    node_start(k + 1, 0) = node_start(k, 0) + (int)std::lround(dts(k, 0) / dt);
+  }
+
+  // Buffers of the solver are sized for the number of variables and constraints of the formulation
+  condensed = params_->osqp_condensed;
+  int n_var = condensed ? 12 * n_steps : 12 * n_steps * 2;
+  int n_con = condensed ? 20 * n_steps : 12 * n_steps * 2 + 20 * n_steps;
+  size_nz_ML = 126 * n_steps - 18;  // -I and A (12 + 18 per step), B (48), lines of S (12) and cones (36)
+  size_nz_P = 24 * n_steps;         // Diagonal weights of states and forces
+  v_NK_up.assign(n_con, 0.0);
+  v_NK_low.assign(n_con, 0.0);
+  v_warmxf.assign(n_var, 0.0);
+  Q.assign(n_var, 0.0);
+
   xref = Eigen::Matrix<double, 12, Eigen::Dynamic>::Zero(12, 1 + n_steps);
   x = Eigen::Matrix<double, Eigen::Dynamic, 1>::Zero(12 * n_steps * 2, 1);
   S_gait = Eigen::Matrix<int, Eigen::Dynamic, 1>::Zero(12 * n_steps, 1);
-  warmxf = Eigen::Matrix<double, Eigen::Dynamic, 1>::Zero(12 * n_steps * 2, 1);
+  warmxf = Eigen::Matrix<double, Eigen::Dynamic, 1>::Zero(n_var, 1);
   x_f_applied = Eigen::MatrixXd::Zero(24, n_steps);
 
   gait = Eigen::Matrix<int, Eigen::Dynamic, 4>::Zero(params_->N_gait, 4);
@@ -31,10 +49,38 @@ MPC::MPC(Params& params) {
     }
   }*/
   gI << Eigen::Map<Eigen::VectorXd, Eigen::Unaligned>(params_->I_mat.data(), params_->I_mat.size());
-  std::cout << gI << std::endl; 
-  g(8, 0) = -9.81f * dt;
-
-  osqp_set_default_settings(settings);
+  dt_AB = std::numeric_limits<double>::quiet_NaN();  // A, B and g are set for the duration of the first node used
+
+  // Matrices of the condensed formulation
+  if (condensed) {
+    B_cond = Eigen::MatrixXd::Zero(6, 12 * n_steps);
+    H_cond = Eigen::MatrixXd::Zero(12 * n_steps, 12 * n_steps);
+    d_cond = Eigen::Matrix<double, Eigen::Dynamic, 1>::Zero(12 * n_steps, 1);
+    q_cond = Eigen::Matrix<double, Eigen::Dynamic, 1>::Zero(12 * n_steps, 1);
+  }
+  duration_matrices = 0.0;
+  duration_solver = 0.0;
+
+  // Variables of the warm start
+  warm_start = params_->osqp_warm_start;
+  num_iter_prev = 0;
+  S_gait_prev = Eigen::Matrix<int, Eigen::Dynamic, 1>::Zero(12 * n_steps, 1);
+  y_prev = Eigen::Matrix<double, Eigen::Dynamic, 1>::Zero(12 * n_steps * 2 + 20 * n_steps, 1);
+  warmy = Eigen::Matrix<double, Eigen::Dynamic, 1>::Zero(12 * n_steps * 2 + 20 * n_steps, 1);
+
+  // Wall-clock budget of each solve, one period of the MPC by default
+  time_budget = (params_->osqp_time_budget == 0.0) ? params_->dt_mpc : params_->osqp_time_budget;
+  timeout_fallback = params_->osqp_timeout_fallback;
+  timed_out = false;
+  num_timeouts = 0;
+  time_per_iter = 0.0;
+
+  // Nothing has been written in ML yet (NaN never compares equal)
+  gI_inv = gI.inverse();
+  yaw_I_inv = std::numeric_limits<double>::quiet_NaN();
+  keys_ML = Eigen::Matrix<double, 4, Eigen::Dynamic>::Constant(4, 4 * n_steps, std::numeric_limits<double>::quiet_NaN());
+
+  osqp_set_default_settings(settings.get());
 }
 
 MPC::MPC() { }
@@ -58,6 +104,9 @@ int MPC::create_matrices() {
 Add a new non-zero coefficient to the ML matrix by filling the triplet r_ML / c_ML / v_ML
 */
 inline void MPC::add_to_ML(int i, int j, double v, int *r_ML, int *c_ML, double *v_ML) {
+  if (cpt_ML >= size_nz_ML) {
+    throw std::length_error("Too many non-zero coefficients for the triplet arrays of ML.");
+  }
   r_ML[cpt_ML] = i;  // row index
   c_ML[cpt_ML] = j;  // column index
   v_ML[cpt_ML] = v;  // value of coefficient
@@ -68,12 +117,47 @@ inline void MPC::add_to_ML(int i, int j, double v, int *r_ML, int *c_ML, double
 Add a new non-zero coefficient to the P matrix by filling the triplet r_P / c_P / v_P
 */
 inline void MPC::add_to_P(int i, int j, double v, int *r_P, int *c_P, double *v_P) {
+  if (cpt_P >= size_nz_P) {
+    throw std::length_error("Too many non-zero coefficients for the triplet arrays of P.");
+  }
   r_P[cpt_P] = i;  // row index
   c_P[cpt_P] = j;  // column index
   v_P[cpt_P] = v;  // value of coefficient
   cpt_P++;         // increment the counter
 }
 
+/*
+Set the A and g matrices and the linear part of the B matrix for the duration of node k. Nothing is done if
+the duration of node k is the one they are already set for, which is always the case with a uniform grid
+*/
+int MPC::set_node_duration(int k) {
+  double h = dts(k, 0);
+  if (h == dt_AB) return 0;
+
+  A.block(0, 6, 6, 6) = h * Eigen::Matrix<double, 6, 6>::Identity();
+  g(8, 0) = -9.81f * h;
+  for (int i = 0; i < 4; i++) {
+    B(6, 0 + 3 * i) = h / mass;
+    B(7, 1 + 3 * i) = h / mass;
+    B(8, 2 + 3 * i) = h / mass;
+  }
+  dt_AB = h;
+
+  return 0;
+}
+
+/*
+Return the node of the previous solution that contains the start of node i once shifted by a number of time
+steps dt, or the last node if it is beyond the previous horizon
+*/
+int MPC::shifted_node(int i, int shift) {
+  int j = i;
+  while (j < n_steps - 1 && node_start(j + 1, 0) <= node_start(i, 0) + shift) {
+    j++;
+  }
+  return j;
+}
+
 /*
 Create the M and L matrices involved in the MPC constraint equations M.X = N and L.X <= K
 */
@@ -85,28 +169,26 @@ int MPC::create_ML() {
   std::fill_n(r_ML, size_nz_ML, 0);
   std::fill_n(c_ML, size_nz_ML, 0);
   std::fill_n(v_ML, size_nz_ML, 0.0);  // initialized to -1.0
+  cpt_ML = 0;                          // ML is created again if the solver is set up again
 
   // Put identity matrices in M
   for (int k = 0; k < (12 * n_steps); k++) {
     add_to_ML(k, k, -1.0, r_ML, c_ML, v_ML);
   }
 
-  // Fill matrix A (for other functions)
-  A.block(0, 6, 6, 6) = dt * Eigen::Matrix<double, 6, 6>::Identity();
-
-  // Put A matrices in M
+  // Put A matrices in M, the A matrix of line k + 1 depends on the duration of node k + 1
   for (int k = 0; k < (n_steps - 1); k++) {
     for (int i = 0; i < 12; i++) {
       add_to_ML((k + 1) * 12 + i, (k * 12) + i, 1.0, r_ML, c_ML, v_ML);
     }
     for (int j = 0; j < 6; j++) {
-      add_to_ML((k + 1) * 12 + j, (k * 12) + j + 6, dt, r_ML, c_ML, v_ML);
+      add_to_ML((k + 1) * 12 + j, (k * 12) + j + 6, dts(k + 1, 0), r_ML, c_ML, v_ML);
     }
   }
 
   // Put B matrices in M
-  double div_tmp = dt / mass;
   for (int k = 0; k < n_steps; k++) {
+    double div_tmp = dts(k, 0) / mass;
     for (int i = 0; i < 4; i++) {
       add_to_ML(12 * k + 6, 12 * (n_steps + k) + 0 + 3 * i, div_tmp, r_ML, c_ML, v_ML);
       add_to_ML(12 * k + 7, 12 * (n_steps + k) + 1 + 3 * i, div_tmp, r_ML, c_ML, v_ML);
@@ -119,9 +201,6 @@ int MPC::create_ML() {
     }
   }
   for (int i = 0; i < 4; i++) {
-    B(6, 0 + 3 * i) = div_tmp;
-    B(7, 1 + 3 * i) = div_tmp;
-    B(8, 2 + 3 * i) = div_tmp;
     B(9, i) = 8.0;
     B(10, i) = 8.0;
     B(11, i) = 8.0;
@@ -175,7 +254,7 @@ int MPC::create_ML() {
   acc = st_to_cc_values(nst, r_ML, c_ML, v_ML, ncc, n, icc, ccc);
 
   // Assign values to the csc object
-  ML = (csc *)c_malloc(sizeof(csc));
+  ML.reset((csc *)c_malloc(sizeof(csc)));
   ML->m = 12 * n_steps * 2 + 20 * n_steps;
   ML->n = 12 * n_steps * 2;
   ML->nz = -1;
@@ -217,6 +296,8 @@ int MPC::create_ML() {
 
   // Update state of B
   for (int k = 0; k < n_steps; k++) {
+    set_node_duration(k);
+
     // Get inverse of the inertia matrix for time step k
     double c = cos(xref(5, k));
     double s = sin(xref(5, k));
@@ -228,7 +309,7 @@ int MPC::create_ML() {
     // Get skew-symetric matrix for each foothold
     Eigen::Matrix<double, 3, 4> l_arms = footholds - (xref.block(0, k, 3, 1)).replicate<1, 4>();
     for (int i = 0; i < 4; i++) {
-      B.block(9, 3 * i, 3, 3) = dt * (I_inv * getSkew(l_arms.col(i)));
+      B.block(9, 3 * i, 3, 3) = dts(k, 0) * (I_inv * getSkew(l_arms.col(i)));
     }
 
     int i_iter = 24 * 4 * k;
@@ -271,10 +352,12 @@ int MPC::create_NK() {
 
   // Fill N matrix with g matrices
   for (int k = 0; k < n_steps; k++) {
+    set_node_duration(k);
     NK_up(12 * k + 8, 0) = -g(8, 0);  // only 8-th coeff is non zero
   }
 
   // Including - A*X0 in the first row of N
+  set_node_duration(0);
   NK_up.block(0, 0, 12, 1) += A * (-x0);
 
   // Create matrix D (third term of N) and put identity matrices in it
@@ -286,7 +369,7 @@ int MPC::create_NK() {
       D((k + 1) * 12 + i, (k * 12) + i) = -1.0;
     }
     for (int i = 0; i < 6; i++) {
-      D((k + 1) * 12 + i, (k * 12) + i + 6) = -dt;
+      D((k + 1) * 12 + i, (k * 12) + i + 6) = -dts(k + 1, 0);
     }
   }
 
@@ -328,6 +411,7 @@ int MPC::create_weight_matrices() {
   std::fill_n(r_P, size_nz_P, 0);
   std::fill_n(c_P, size_nz_P, 0);
   std::fill_n(v_P, size_nz_P, 0.0);
+  cpt_P = 0;  // P is created again if the solver is set up again
 
   // Define weights for the x-x_ref components of the optimization vector
   // Hand-tuning of parameters if you want to give more weight to specific components
@@ -373,7 +457,7 @@ int MPC::create_weight_matrices() {
   acc = st_to_cc_values(nst, r_P, c_P, v_P, ncc, n, icc, ccc);
 
   // Assign values to the csc object
-  P = (csc *)c_malloc(sizeof(csc));
+  P.reset((csc *)c_malloc(sizeof(csc)));
   P->m = 12 * n_steps * 2;
   P->n = 12 * n_steps * 2;
   P->nz = -1;
@@ -388,7 +472,7 @@ int MPC::create_weight_matrices() {
   delete[] v_P;
 
   // Q is already created filled with zeros
-  std::fill_n(Q, size_nz_Q, 0.0);
+  std::fill(Q.begin(), Q.end(), 0.0);
 
   // char t_char[1] = {'P'};
   // my_print_csc_matrix(P, t_char);
@@ -422,48 +506,61 @@ Update the M and L constaint matrices depending on the current state of the gait
 
 */
 int MPC::update_ML(Eigen::MatrixXd fsteps) {
-  int j = 0;
-  int k_cum = 0;
-  // Iterate over all phases of the gait
-  while (!gait.row(j).isZero()) {
-    for (int k = k_cum; k < (k_cum + 1); k++) {
-      // Get inverse of the inertia matrix for time step k
-      double c = cos(xref(5, k));
-      double s = sin(xref(5, k));
+  // Only the coefficients of the time steps and feet whose lever arm or yaw angle changed since the previous
+  // update are written. Feet in swing phase are skipped since their forces are null whatever their coefficients
+  int k = 0;
+  while (k < n_steps && !gait.row(k).isZero()) {
+    set_node_duration(k);
+
+    // Inverse of the inertia matrix for time step k, only computed again when the yaw angle changes
+    // (R^T.gI.R)^-1 = R^T.gI^-1.R since R is a rotation
+    double yaw = xref(5, k);
+    if (yaw != yaw_I_inv) {
+      double c = cos(yaw);
+      double s = sin(yaw);
       Eigen::Matrix<double, 3, 3> R;
       R << c, -s, 0.0, s, c, 0.0, 0.0, 0.0, 1.0;
-      Eigen::Matrix<double, 3, 3> R_gI = R.transpose() * gI * R;
-      Eigen::Matrix<double, 3, 3> I_inv = R_gI.inverse();
-
-      // Get skew-symetric matrix for each foothold
-      // Eigen::Map<Eigen::Matrix<double, 3, 4>> fsteps_tmp((fsteps.block(j, 1, 1, 12)).data(), 3, 4);
-      footholds_tmp = fsteps.row(j); // block(j, 1, 1, 12);
-      // footholds = footholds_tmp.reshaped(3, 4);
-      Eigen::Map<Eigen::MatrixXd> footholds_bis(footholds_tmp.data(), 3, 4);
-
-      lever_arms = footholds_bis - (xref.block(0, k, 3, 1) + offset_CoM).replicate<1, 4>();
-      for (int i = 0; i < 4; i++) {
-        B.block(9, 3 * i, 3, 3) = dt * (I_inv * getSkew(lever_arms.col(i)));
+      I_inv = R.transpose() * gI_inv * R;
+      yaw_I_inv = yaw;
+    }
+
+    footholds_tmp = fsteps.row(k);
+    Eigen::Map<Eigen::MatrixXd> footholds_bis(footholds_tmp.data(), 3, 4);
+    lever_arms = footholds_bis - (xref.block(0, k, 3, 1) + offset_CoM).replicate<1, 4>();
+
+    int i_iter = 24 * 4 * k;
+    for (int i = 0; i < 4; i++) {
+      Eigen::Matrix<double, 4, 1> key;
+      key << lever_arms.col(i), yaw;
+      if (gait(k, i) == 0 || key == keys_ML.col(4 * k + i)) {
+        continue;
       }
+      B.block(9, 3 * i, 3, 3) = dts(k, 0) * (I_inv * getSkew(lever_arms.col(i)));
 
-      // Replace the coefficient directly in ML.data
-      int i_iter = 24 * 4 * k;
-      for (int i = 0; i < 12 * 4; i++) {
-        ML->x[i_update_B[i] + i_iter] = B(i_x_B[i], i_y_B[i]);
+      // Replace the coefficients of the foot directly in ML.data
+      for (int j = 12 * i; j < 12 * (i + 1); j++) {
+        ML->x[i_update_B[j] + i_iter] = B(i_x_B[j], i_y_B[j]);
       }
+      keys_ML.col(4 * k + i) = key;
     }
 
-    k_cum++;
-    j++;
+    k++;
   }
 
-  // Construct the activation/desactivation matrix based on the current gait
-  construct_S();
-
-  // Update lines to enable/disable forces
+  // Update lines to enable/disable forces, only for the feet whose contact state changed
   int i_start = 30 * n_steps - 18;
-  for (int k = 0; k < 12 * n_steps; k++) {
-    ML->x[i_off(k, 0) + i_start] = S_gait(k, 0);
+  k = 0;
+  while (k < n_steps && !gait.row(k).isZero()) {
+    for (int b = 0; b < 4; b++) {
+      int S = 1 - gait(k, b);
+      if (S_gait(12 * k + 3 * b, 0) != S) {
+        for (int c = 0; c < 3; c++) {
+          S_gait(12 * k + 3 * b + c, 0) = S;
+          ML->x[i_off(12 * k + 3 * b + c, 0) + i_start] = S;
+        }
+      }
+    }
+    k++;
   }
 
   return 0;
@@ -473,61 +570,342 @@ int MPC::update_ML(Eigen::MatrixXd fsteps) {
 Update the N and K matrices involved in the MPC constraint equations M.X = N and L.X <= K
 */
 int MPC::update_NK() {
-  // Matrix g is already created and not changed
+  // Only the lines of the dynamics depend on the initial and reference states, the lines to enable/disable
+  // forces and the bounds of the friction cones are constant. N = -A.X0 - g + D.Xref so line k contains
+  // xref_{k+1} - A.xref_k - g (with the initial state x0 instead of xref_0)
+  set_node_duration(0);
+  NK_up.block(0, 0, 12, 1) = xref.block(0, 1, 12, 1) - A * x0 - g;
+  for (int k = 1; k < n_steps; k++) {
+    set_node_duration(k);
+    NK_up.block(12 * k, 0, 12, 1) = xref.block(0, k + 1, 12, 1) - A * xref.block(0, k, 12, 1) - g;
+  }
+  NK_low.block(0, 0, 12 * n_steps, 1) = NK_up.block(0, 0, 12 * n_steps, 1);
 
-  // Reset NK
-  NK_up = Eigen::Matrix<double, Eigen::Dynamic, 1>::Zero(12 * n_steps * 2 + 20 * n_steps, 1);
+  // Update upper and lower bound c_double arrays
+  Eigen::Matrix<double, Eigen::Dynamic, 1>::Map(&v_NK_up[0], 12 * n_steps) = NK_up.head(12 * n_steps);
+  Eigen::Matrix<double, Eigen::Dynamic, 1>::Map(&v_NK_low[0], 12 * n_steps) = NK_low.head(12 * n_steps);
 
-  // Fill N matrix with g matrices
+  return 0;
+}
+
+/*
+Create the matrices of the condensed formulation. States are eliminated through the dynamics
+X = Phi.F + D so the optimization vector only contains the 12*n_steps contact forces, with cost
+1/2 F^T.P.F + F^T.Q (P = Phi^T.W.Phi + R, Q = Phi^T.W.D) and friction cones L.F <= K
+*/
+int MPC::create_condensed(const Eigen::MatrixXd &fsteps) {
+  int n = 12 * n_steps;
+
+  // Forces act on the linear velocity of the base whatever the time step
+  for (int k = 0; k < 4 * n_steps; k++) {
+    B_cond.block(0, 3 * k, 3, 3) = (dts(k / 4, 0) / mass) * Eigen::Matrix<double, 3, 3>::Identity();
+  }
+
+  // Time elapsed between the end of node j and the end of the following nodes k, summed over k >= j
+  // (s1_cond) and squared then summed (s2_cond), to weight the effect of forces on the position of the base
+  t_cond = Eigen::Matrix<double, Eigen::Dynamic, 1>::Zero(n_steps, 1);
+  s1_cond = Eigen::Matrix<double, Eigen::Dynamic, 1>::Zero(n_steps, 1);
+  s2_cond = Eigen::Matrix<double, Eigen::Dynamic, 1>::Zero(n_steps, 1);
+  t_cond(0, 0) = dts(0, 0);
+  for (int k = 1; k < n_steps; k++) {
+    t_cond(k, 0) = t_cond(k - 1, 0) + dts(k, 0);
+  }
+  for (int j = n_steps - 2; j >= 0; j--) {
+    double h = dts(j + 1, 0);
+    int m = n_steps - 1 - j;  // Number of nodes after node j
+    s2_cond(j, 0) = s2_cond(j + 1, 0) + 2.0 * h * s1_cond(j + 1, 0) + m * h * h;
+    s1_cond(j, 0) = s1_cond(j + 1, 0) + m * h;
+  }
+
+  // Friction cones of all contact forces, this matrix is constant
+  // For each foot: fx - mu.fz <= 0, -fx - mu.fz <= 0, fy - mu.fz <= 0, -fy - mu.fz <= 0, -fz <= 0
+  ML.reset((csc *)c_malloc(sizeof(csc)));
+  ML->m = 20 * n_steps;
+  ML->n = n;
+  ML->nz = -1;
+  ML->nzmax = 9 * 4 * n_steps;
+  ML->x = (c_float *)c_malloc(ML->nzmax * sizeof(c_float));
+  ML->i = (c_int *)c_malloc(ML->nzmax * sizeof(c_int));
+  ML->p = (c_int *)c_malloc((n + 1) * sizeof(c_int));
+  int cpt = 0;
+  for (int j = 0; j < n; j++) {
+    ML->p[j] = cpt;
+    int di = 20 * (j / 12) + 5 * ((j % 12) / 3);  // First row of the friction cone of this foot
+    int n_rows = (j % 3 == 2) ? 5 : 2;
+    for (int i = 0; i < n_rows; i++) {
+      ML->i[cpt] = (j % 3 == 1) ? di + 2 + i : di + i;
+      ML->x[cpt] = (j % 3 == 2) ? ((i == 4) ? -1.0 : -mu) : ((i == 0) ? 1.0 : -1.0);
+      cpt++;
+    }
+  }
+  ML->p[n] = cpt;
+
+  // Upper triangular part of the Hessian, all its coefficients are non-zero
+  P.reset((csc *)c_malloc(sizeof(csc)));
+  P->m = n;
+  P->n = n;
+  P->nz = -1;
+  P->nzmax = n * (n + 1) / 2;
+  P->x = (c_float *)c_malloc(P->nzmax * sizeof(c_float));
+  P->i = (c_int *)c_malloc(P->nzmax * sizeof(c_int));
+  P->p = (c_int *)c_malloc((n + 1) * sizeof(c_int));
+  for (int j = 0; j <= n; j++) {
+    P->p[j] = j * (j + 1) / 2;
+  }
+  for (int j = 0; j < n; j++) {
+    for (int i = 0; i <= j; i++) {
+      P->i[P->p[j] + i] = i;
+    }
+  }
+
+  // Upper bounds of friction cones are null, lower bounds depend on the gait
+  std::fill(v_NK_up.begin(), v_NK_up.end(), 0.0);
+  std::fill(v_NK_low.begin(), v_NK_low.end(), -std::numeric_limits<double>::infinity());
+
+  update_condensed(fsteps);
+
+  return 0;
+}
+
+/*
+Update the matrices of the condensed formulation depending on the current state of the gait
+*/
+int MPC::update_condensed(const Eigen::MatrixXd &fsteps) {
+  update_B_condensed(fsteps);
+  construct_S();
+  update_cost_condensed();
+  update_bounds_condensed();
+
+  return 0;
+}
+
+/*
+Update the lever arms and the inertia of the B matrix of each time step of the gait
+*/
+int MPC::update_B_condensed(const Eigen::MatrixXd &fsteps) {
+  int k = 0;
+  while (k < n_steps && !gait.row(k).isZero()) {
+    // Get inverse of the inertia matrix for time step k
+    double c = cos(xref(5, k));
+    double s = sin(xref(5, k));
+    Eigen::Matrix<double, 3, 3> R;
+    R << c, -s, 0.0, s, c, 0.0, 0.0, 0.0, 1.0;
+    Eigen::Matrix<double, 3, 3> R_gI = R.transpose() * gI * R;
+    Eigen::Matrix<double, 3, 3> I_inv = R_gI.inverse();
+
+    // Get skew-symetric matrix for each foothold
+    footholds_tmp = fsteps.row(k);
+    Eigen::Map<Eigen::MatrixXd> footholds_bis(footholds_tmp.data(), 3, 4);
+    lever_arms = footholds_bis - (xref.block(0, k, 3, 1) + offset_CoM).replicate<1, 4>();
+    for (int i = 0; i < 4; i++) {
+      B_cond.block(3, 12 * k + 3 * i, 3, 3) = dts(k, 0) * (I_inv * getSkew(lever_arms.col(i)));
+    }
+    k++;
+  }
+
+  return 0;
+}
+
+/*
+Update the Hessian P and the linear term Q of the cost with respect to forces.
+The effect of forces of step j on the state at step k >= j is [(t_k-t_j).Bj ; Bj] with Bj the lower
+half of the B matrix and t_k the time at the end of node k, so each 12x12 block of P only involves
+two B matrices and scalar weights
+*/
+int MPC::update_cost_condensed() {
+  int n = 12 * n_steps;
+  Eigen::Map<const Eigen::Matrix<double, 6, 1>> w_pos(params_->osqp_w_states.data());
+  Eigen::Map<const Eigen::Matrix<double, 6, 1>> w_vel(params_->osqp_w_states.data() + 6);
+
+  // Predicted states without any contact force, minus the reference
+  Eigen::Matrix<double, 12, 1> x_free = x0;
   for (int k = 0; k < n_steps; k++) {
-    NK_up(12 * k + 8, 0) = -g(8, 0);  // only 8-th coeff is non zero
+    set_node_duration(k);
+    x_free = A * x_free + g;
+    d_cond.block(12 * k, 0, 12, 1) = x_free - xref.block(0, k + 1, 12, 1);
   }
 
-  // Including - A*X0 in the first row of N
-  NK_up.block(0, 0, 12, 1) += A * (-x0);
+  // Hessian, block (i, j) for i <= j sums the contributions of steps k >= j
+  Eigen::Matrix<double, 6, 1> w_tmp;
+  for (int j = 0; j < n_steps; j++) {
+    for (int i = 0; i <= j; i++) {
+      w_tmp = (s2_cond(j, 0) + (t_cond(j, 0) - t_cond(i, 0)) * s1_cond(j, 0)) * w_pos + (n_steps - j) * w_vel;
+      H_cond.block(12 * i, 12 * j, 12, 12).noalias() =
+          B_cond.block(0, 12 * i, 6, 12).transpose() * w_tmp.asDiagonal() * B_cond.block(0, 12 * j, 6, 12);
+    }
+    for (int i = 0; i < 4; i++) {
+      for (int c = 0; c < 3; c++) {
+        H_cond(12 * j + 3 * i + c, 12 * j + 3 * i + c) += params_->osqp_w_forces[c];
+      }
+    }
+  }
+  for (int j = 0; j < n; j++) {
+    Eigen::Matrix<double, Eigen::Dynamic, 1>::Map(&P->x[P->p[j]], j + 1) = H_cond.block(0, j, j + 1, 1);
+  }
 
-  // Matrix D is already created and not changed
-  // Add third term to matrix N
-  Eigen::Map<Eigen::MatrixXd> xref_col((xref.block(0, 1, 12, n_steps)).data(), 12 * n_steps, 1);
-  NK_up.block(0, 0, 12 * n_steps, 1) += D * xref_col;
+  // Linear term, with backward sums over the steps that follow each step
+  Eigen::Matrix<double, 6, 1> sum_pos = Eigen::Matrix<double, 6, 1>::Zero();  // Sum of weighted position errors
+  Eigen::Matrix<double, 6, 1> sum_lever = Eigen::Matrix<double, 6, 1>::Zero();  // Same sum weighted by t_k-t_j
+  Eigen::Matrix<double, 6, 1> sum_vel = Eigen::Matrix<double, 6, 1>::Zero();  // Sum of weighted velocity errors
+  Eigen::Matrix<double, 6, 1> e_tmp;
+  for (int j = n_steps - 1; j >= 0; j--) {
+    if (j < n_steps - 1) {
+      sum_lever += dts(j + 1, 0) * sum_pos;
+    }
+    sum_pos += w_pos.cwiseProduct(d_cond.block(12 * j, 0, 6, 1));
+    sum_vel += w_vel.cwiseProduct(d_cond.block(12 * j + 6, 0, 6, 1));
+    e_tmp = sum_lever + sum_vel;
+    q_cond.block(12 * j, 0, 12, 1).noalias() = B_cond.block(0, 12 * j, 6, 12).transpose() * e_tmp;
+  }
+  Eigen::Matrix<double, Eigen::Dynamic, 1>::Map(&Q[0], n) = q_cond;
 
-  // Update upper bound c_double array (unrequired since Map is just pointers?)
-  Eigen::Matrix<double, Eigen::Dynamic, 1>::Map(&v_NK_up[0], NK_up.size()) = NK_up;
+  return 0;
+}
 
-  // Update lower bound c_double array
-  NK_low.block(0, 0, 12 * n_steps * 2, 1) = NK_up.block(0, 0, 12 * n_steps * 2, 1);
-  Eigen::Matrix<double, Eigen::Dynamic, 1>::Map(&v_NK_low[0], NK_low.size()) = NK_low;
+/*
+Update the lower bounds of the friction cones: vertical forces are limited for feet in stance phase
+and null for feet in swing phase, which also cancels their horizontal components
+*/
+int MPC::update_bounds_condensed() {
+  for (int k = 0; k < 4 * n_steps; k++) {
+    v_NK_low[5 * k + 4] = (S_gait(3 * k, 0) == 1) ? 0.0 : -params_->osqp_Nz_lim;
+  }
 
   return 0;
 }
 
 /*
-Create an initial guess and call the solver to solve the QP problem
+Create an initial guess from the previous solution shifted by the number of time steps elapsed since then, that
+is the number of MPC iterations (not loop iterations) since the previous solve.
+Steps beyond the previous horizon repeat its last step. The forces and the dual variables of the constraints
+of a foot are only kept if its contact state is the same as in the previous solution, so that the guess stays
+consistent when a phase of the gait ends: a foot that touches down starts with an even share of the weight of
+the robot, a foot that takes off starts with a null force.
 */
-int MPC::call_solver(int k) {
-  // Initial guess for forces (mass evenly supported by all legs in contact)
-  warmxf.block(0, 0, 12 * (n_steps - 1), 1) = x.block(12, 0, 12 * (n_steps - 1), 1);
-  warmxf.block(12 * n_steps, 0, 12 * (n_steps - 1), 1) = x.block(12 * (n_steps + 1), 0, 12 * (n_steps - 1), 1);
-  warmxf.block(12 * (2 * n_steps - 1), 0, 12, 1) = x.block(12 * n_steps, 0, 12, 1);
+int MPC::construct_warm_start(int shift) {
+  int i_f = condensed ? 0 : 12 * n_steps;      // Index of the first force in the optimization vector
+  int i_S = 12 * n_steps;                      // Index of the first line enabling/disabling forces (sparse)
+  int i_L = condensed ? 0 : 12 * n_steps * 2;  // Index of the first line of friction cones
+  shift = std::max(shift, 0);
+
+  for (int i = 0; i < n_steps; i++) {
+    int j = shifted_node(i, shift);  // Step of the previous solution matching step i
+
+    // States relative to the new reference and dual variables of the dynamics
+    if (!condensed) {
+      warmxf.block(12 * i, 0, 12, 1) = x_f_applied.block(0, j, 12, 1) - xref.block(0, i + 1, 12, 1);
+      warmy.block(12 * i, 0, 12, 1) = y_prev.block(12 * j, 0, 12, 1);
+    }
+
+    int n_contacts = 0;
+    for (int foot = 0; foot < 4; foot++) {
+      n_contacts += 1 - S_gait(12 * i + 3 * foot, 0);
+    }
+
+    for (int foot = 0; foot < 4; foot++) {
+      bool contact = (S_gait(12 * i + 3 * foot, 0) == 0);
+      bool same = (S_gait(12 * i + 3 * foot, 0) == S_gait_prev(12 * j + 3 * foot, 0));
+      if (!contact) {
+        warmxf.block(i_f + 12 * i + 3 * foot, 0, 3, 1).setZero();
+      } else if (same) {
+        warmxf.block(i_f + 12 * i + 3 * foot, 0, 3, 1) = x_f_applied.block(12 + 3 * foot, j, 3, 1);
+      } else {
+        warmxf.block(i_f + 12 * i + 3 * foot, 0, 3, 1) << 0.0, 0.0, 9.81 * mass / n_contacts;
+      }
+
+      if (same) {
+        if (!condensed) {
+          warmy.block(i_S + 12 * i + 3 * foot, 0, 3, 1) = y_prev.block(i_S + 12 * j + 3 * foot, 0, 3, 1);
+        }
+        warmy.block(i_L + 20 * i + 5 * foot, 0, 5, 1) = y_prev.block(i_L + 20 * j + 5 * foot, 0, 5, 1);
+      } else {
+        if (!condensed) {
+          warmy.block(i_S + 12 * i + 3 * foot, 0, 3, 1).setZero();
+        }
+        warmy.block(i_L + 20 * i + 5 * foot, 0, 5, 1).setZero();
+      }
+    }
+  }
   Eigen::Matrix<double, Eigen::Dynamic, 1>::Map(&v_warmxf[0], warmxf.size()) = warmxf;
 
+  return 0;
+}
+
+/*
+Shift the previous solution by a number of time steps (MPC iterations), to reuse it when the solver runs out of
+time. Steps beyond the previous horizon repeat its last step. The dual variables and the contact state of feet used
+by the warm start are shifted as well so that the next warm start stays consistent.
+*/
+int MPC::shift_previous_solution(int shift) {
+  shift = std::max(shift, 0);
+  if (shift == 0) return 0;
+
+  int i_S = 12 * n_steps;                      // Index of the first line enabling/disabling forces (sparse)
+  int i_L = condensed ? 0 : 12 * n_steps * 2;  // Index of the first line of friction cones
+  for (int i = 0; i < n_steps; i++) {
+    int j = shifted_node(i, shift);
+    x_f_applied.col(i) = x_f_applied.col(j);
+    S_gait_prev.block(12 * i, 0, 12, 1) = S_gait_prev.block(12 * j, 0, 12, 1);
+    if (!condensed) {
+      y_prev.block(12 * i, 0, 12, 1) = y_prev.block(12 * j, 0, 12, 1);
+      y_prev.block(i_S + 12 * i, 0, 12, 1) = y_prev.block(i_S + 12 * j, 0, 12, 1);
+    }
+    y_prev.block(i_L + 20 * i, 0, 20, 1) = y_prev.block(i_L + 20 * j, 0, 20, 1);
+  }
+  for (int k = 0; k < 12; k++) {
+    x_next[k] = x_f_applied(k, 0) - xref(k, 1);
+  }
+
+  return 0;
+}
+
+/*
+Limit the duration of the solver to what remains of the time budget of the current iteration. OSQP enforces the
+limit itself when it is compiled with PROFILING, otherwise the number of iterations is capped using the duration
+of one iteration during the previous solve.
+*/
+int MPC::limit_solver_time() {
+  double remaining = time_budget - std::chrono::duration<double>(std::chrono::steady_clock::now() - t_start).count();
+  remaining = std::max(remaining, 1e-6);
+#ifdef PROFILING
+  // The time limit of OSQP also counts the updates of the problem since the previous solve
+  osqp_update_time_limit(workspce.get(), remaining + workspce->info->update_time);
+#else
+  if (time_per_iter > 0.0) {
+    double max_iter = std::max(1.0, std::min(remaining / time_per_iter, (double)settings->max_iter));
+    osqp_update_max_iter(workspce.get(), (c_int)max_iter);
+  }
+#endif
+
+  return 0;
+}
+
+/*
+Create an initial guess and call the solver to solve the QP problem
+*/
+int MPC::call_solver(int k) {
   // Setup the solver (first iteration) then just update it
   if (k == 0)  // Setup the solver with the matrices
   {
-    data = (OSQPData *)c_malloc(sizeof(OSQPData));
-    data->n = 12 * n_steps * 2;                 // number of variables
-    data->m = 12 * n_steps * 2 + 20 * n_steps;  // number of constraints
-    data->P = P;             // the upper triangular part of the quadratic cost matrix P in csc format (size n x n)
-    data->A = ML;            // linear constraints matrix A in csc format (size m x n)
+    data.reset((OSQPData *)c_malloc(sizeof(OSQPData)));
+    if (condensed) {
+      data->n = 12 * n_steps;  // number of variables (forces only)
+      data->m = 20 * n_steps;  // number of constraints (friction cones only)
+    } else {
+      data->n = 12 * n_steps * 2;                 // number of variables
+      data->m = 12 * n_steps * 2 + 20 * n_steps;  // number of constraints
+    }
+    data->P = P.get();       // the upper triangular part of the quadratic cost matrix P in csc format (size n x n)
+    data->A = ML.get();      // linear constraints matrix A in csc format (size m x n)
     data->q = &Q[0];         // dense array for linear part of cost function (size n)
     data->l = &v_NK_low[0];  // dense array for lower bound (size m)
     data->u = &v_NK_up[0];   // dense array for upper bound (size m)
 
     /*save_csc_matrix(ML, "ML");
     save_csc_matrix(P, "P");
-    save_dns_matrix(Q, 12 * n_steps * 2, "Q");
-    save_dns_matrix(v_NK_low, 12 * n_steps * 2 + 20 * n_steps, "l");
-    save_dns_matrix(v_NK_up, 12 * n_steps * 2 + 20 * n_steps, "u");*/
+    save_dns_matrix(Q.data(), 12 * n_steps * 2, "Q");
+    save_dns_matrix(v_NK_low.data(), 12 * n_steps * 2 + 20 * n_steps, "l");
+    save_dns_matrix(v_NK_up.data(), 12 * n_steps * 2 + 20 * n_steps, "u");*/
 
     //settings->rho = 0.1f;
     settings->sigma = (c_float)1e-6;
@@ -544,24 +922,59 @@ int MPC::call_solver(int k) {
     settings->adaptive_rho_interval = (c_int)200;
     settings->adaptive_rho_tolerance = (c_float)5.0;
     // settings->adaptive_rho_fraction = (c_float)0.7;
-    osqp_setup(&workspce, data, settings);
+    OSQPWorkspace *work = OSQP_NULL;
+    osqp_setup(&work, data.get(), settings.get());
+    workspce.reset(work);  // Also releases the workspace of a previous setup
 
     /*self.prob.setup(P=self.P, q=self.Q, A=self.ML, l=self.NK_inf, u=self.NK.ravel(), verbose=False)
     self.prob.update_settings(eps_abs=1e-5)
     self.prob.update_settings(eps_rel=1e-5)*/
+  } else if (condensed)  // Only the cost and the bounds change in the condensed formulation
+  {
+    osqp_update_P(workspce.get(), &P->x[0], OSQP_NULL, P->nzmax);
+    osqp_update_lin_cost(workspce.get(), &Q[0]);
+    osqp_update_bounds(workspce.get(), &v_NK_low[0], &v_NK_up[0]);
   } else  // Code to update the QP problem without creating it again
   {
-    osqp_update_A(workspce, &ML->x[0], OSQP_NULL, 0);
-    osqp_update_bounds(workspce, &v_NK_low[0], &v_NK_up[0]);
-    // osqp_warm_start_x(workspce, &v_warmxf[0]);
+    osqp_update_A(workspce.get(), &ML->x[0], OSQP_NULL, 0);
+    osqp_update_bounds(workspce.get(), &v_NK_low[0], &v_NK_up[0]);
+  }
+
+  // Start from the previous solution shifted in time, otherwise OSQP starts from the previous solution as it is
+  if (k != 0 && warm_start) {
+    construct_warm_start(k - num_iter_prev);
+    osqp_warm_start(workspce.get(), &v_warmxf[0], warmy.data());
   }
 
   //char t_char[1] = {'M'};
   //my_print_csc_matrix(ML, t_char);
   //std::cout << v_NK_low[1] << " <= A x <= " << v_NK_up[1] << std::endl;
 
-  // Run the solver to solve the QP problem
-  osqp_solve(workspce);
+  // Run the solver to solve the QP problem, within the time budget except for the setup
+  bool limited = (k != 0 && time_budget > 0.0);
+  if (limited) {
+    limit_solver_time();
+  }
+  std::chrono::steady_clock::time_point t_solve = std::chrono::steady_clock::now();
+  osqp_solve(workspce.get());
+  stats.fill(workspce->info);
+  time_per_iter = std::chrono::duration<double>(std::chrono::steady_clock::now() - t_solve).count() /
+                  std::max(stats.iter, 1);
+
+  // The solver has been stopped before convergence, the latest iterate is available as a truncated solution
+  timed_out = limited && (stats.status == OSQP_TIME_LIMIT_REACHED || stats.status == OSQP_MAX_ITER_REACHED);
+  if (timed_out) {
+    num_timeouts++;
+  }
+
+  // Keep the solution to warm start the next iteration, or shift the previous one if it is reused
+  if (timed_out && timeout_fallback == 1) {
+    shift_previous_solution(k - num_iter_prev);
+  } else {
+    y_prev.head(data->m) = Eigen::Matrix<double, Eigen::Dynamic, 1>::Map(workspce->solution->y, data->m);
+    S_gait_prev = S_gait;
+  }
+  num_iter_prev = k;
   /*self.sol = self.prob.solve()
   self.x = self.sol.x*/
   // solution in workspce->solution->x
@@ -573,6 +986,23 @@ int MPC::call_solver(int k) {
 Extract relevant information from the output of the QP solver
 */
 int MPC::retrieve_result() {
+  if (condensed) {
+    // Recover the states through the dynamics from the optimized forces
+    Eigen::Matrix<double, 12, 1> x_k = x0;
+    for (int i = 0; i < n_steps; i++) {
+      Eigen::Map<const Eigen::Matrix<double, 12, 1>> f_k(&(workspce->solution->x)[12 * i]);
+      set_node_duration(i);
+      x_k = A * x_k + g;
+      x_k.block(6, 0, 6, 1) += B_cond.block(0, 12 * i, 6, 12) * f_k;
+      x_f_applied.block(0, i, 12, 1) = x_k;
+      x_f_applied.block(12, i, 12, 1) = f_k;
+    }
+    for (int k = 0; k < 12; k++) {
+      x_next[k] = x_f_applied(k, 0) - xref(k, 1);
+    }
+    return 0;
+  }
+
   // Retrieve the "contact forces" part of the solution of the QP problem
   for (int i = 0; i < (n_steps); i++) {
     for (int k = 0; k < 12; k++) {
@@ -628,6 +1058,8 @@ void MPC::run_python(const matXd &xref_py, const matXd &fsteps_py) {
 /*
 Run one iteration of the whole MPC by calling all the necessary functions (data retrieval,
 update of constraint matrices, update of the solver, running the solver, retrieving result)
+num_iter counts MPC iterations, not loop iterations, since the previous solution is shifted by one node per
+elapsed MPC iteration
 */
 int MPC::run(int num_iter, const Eigen::MatrixXd &xref_in, const Eigen::MatrixXd &fsteps_in) {
   // Recontruct the gait based on the computed footsteps
@@ -639,21 +1071,139 @@ int MPC::run(int num_iter, const Eigen::MatrixXd &xref_in, const Eigen::MatrixXd
 
   // Create the constraint and weight matrices used by the QP solver
   // Minimize x^T.P.x + x^T.Q with constraints M.X == N and L.X <= K
+  t_start = std::chrono::steady_clock::now();
   if (num_iter == 0) {
-    create_matrices();
+    if (condensed) {
+      create_condensed(fsteps_in);
+    } else {
+      create_matrices();
+    }
   } else {
-    update_matrices(fsteps_in);
+    if (condensed) {
+      update_condensed(fsteps_in);
+    } else {
+      update_matrices(fsteps_in);
+    }
   }
+  std::chrono::steady_clock::time_point t_matrices = std::chrono::steady_clock::now();
 
   // Create an initial guess and call the solver to solve the QP problem
   call_solver(num_iter);
+  std::chrono::steady_clock::time_point t_solver = std::chrono::steady_clock::now();
 
-  // Extract relevant information from the output of the QP solver
-  retrieve_result();
+  duration_matrices = std::chrono::duration<double>(t_matrices - t_start).count();
+  duration_solver = std::chrono::duration<double>(t_solver - t_matrices).count();
+
+  // Extract relevant information from the output of the QP solver, unless the previous solution is reused
+  if (!(timed_out && timeout_fallback == 1)) {
+    retrieve_result();
+  }
 
   return 0;
 }
 
+/*
+Solve a batch of K independent problems, for instance the inputs of the MPC logged during a run, and return the
+results stacked vertically (24K x n_steps). The reference trajectories are stacked vertically in xrefs
+(12K x (n_steps+1)) and the footsteps in fsteps (K.N_gait x 12), both on the nodes of the MPC.
+Problems are split into contiguous chunks solved by a pool of threads (hardware concurrency if n_threads <= 0),
+each thread with its own MPC and OSQP workspace that starts from the previous solution of its chunk. The time
+budget and the shifted warm start are disabled since consecutive problems are not necessarily one MPC step apart.
+*/
+Eigen::MatrixXd MPC::run_batch(const Eigen::MatrixXd &xrefs, const Eigen::MatrixXd &fsteps, int n_threads) {
+  int N_gait = params_->N_gait;
+  int K = (int)xrefs.rows() / 12;
+  if (xrefs.rows() != 12 * K || xrefs.cols() != n_steps + 1 || fsteps.rows() != N_gait * K || fsteps.cols() != 12) {
+    throw std::invalid_argument("Batch inputs must be 12K x (n_steps+1) reference trajectories and K.N_gait x 12 footsteps.");
+  }
+
+  if (n_threads <= 0) {
+    n_threads = std::max(1, (int)std::thread::hardware_concurrency());
+  }
+  n_threads = std::max(1, std::min(n_threads, K));
+
+  // Each thread has its own MPC, created here so that errors are raised in the calling thread
+  Params params_batch = *params_;
+  params_batch.osqp_time_budget = -1.0;
+  params_batch.osqp_warm_start = false;
+  std::vector<std::unique_ptr<MPC>> solvers;
+  for (int t = 0; t < n_threads; t++) {
+    solvers.emplace_back(new MPC(params_batch));
+  }
+
+  // Threads fill disjoint blocks of the result
+  Eigen::MatrixXd results = Eigen::MatrixXd::Zero(24 * K, n_steps);
+  auto solve_chunk = [&](int t) {
+    Eigen::MatrixXd fsteps_k;
+    for (int k = K * t / n_threads, i = 0; k < K * (t + 1) / n_threads; k++, i++) {
+      fsteps_k = fsteps.block(N_gait * k, 0, N_gait, 12);
+      fsteps_k = fsteps_k.unaryExpr([](double v) { return std::isnan(v) ? 0.0 : v; });
+      solvers[t]->run(i, xrefs.block(12 * k, 0, 12, n_steps + 1), fsteps_k);
+      results.block(24 * k, 0, 24, n_steps) = solvers[t]->get_latest_result();
+    }
+  };
+  std::vector<std::thread> threads;
+  for (int t = 1; t < n_threads; t++) {
+    threads.emplace_back(solve_chunk, t);
+  }
+  solve_chunk(0);
+  for (std::thread &thread : threads) {
+    thread.join();
+  }
+
+  return results;
+}
+
+/*
+Propagate a state of the base during a given duration with the linearised centroidal dynamics of the MPC
+(same A, B and g matrices), using one column of f_in as contact forces for each node of the MPC
+and the footholds of the first row of fsteps_in as contact points.
+Used to predict the state of the base at the time the result of the asynchronous MPC will be applied.
+*/
+Eigen::MatrixXd MPC::propagate_state(const Eigen::MatrixXd &x_in, const Eigen::MatrixXd &f_in,
+                                     const Eigen::MatrixXd &fsteps_in, double duration) {
+  Eigen::Matrix<double, 12, 1> x_p = x_in.block(0, 0, 12, 1);
+
+  // Footholds of the current phase of the gait (NaN for feet in swing phase, their forces are null)
+  Eigen::Matrix<double, 1, 12> fsteps_row = fsteps_in.row(0);
+  for (int i = 0; i < 12; i++) {
+    if (std::isnan(fsteps_row(0, i))) fsteps_row(0, i) = 0.0;
+  }
+  Eigen::Map<Eigen::Matrix<double, 3, 4>> footholds_p(fsteps_row.data(), 3, 4);
+
+  Eigen::Matrix<double, 12, 12> A_p = Eigen::Matrix<double, 12, 12>::Identity();
+  Eigen::Matrix<double, 12, 12> B_p = Eigen::Matrix<double, 12, 12>::Zero();
+  int j = 0;
+  while (duration > 0.0) {
+    double h = std::min(dts(std::min(j, n_steps - 1), 0), duration);
+
+    // Get inverse of the inertia matrix for the current orientation
+    double c = cos(x_p(5, 0));
+    double s = sin(x_p(5, 0));
+    Eigen::Matrix<double, 3, 3> R;
+    R << c, -s, 0.0, s, c, 0.0, 0.0, 0.0, 1.0;
+    Eigen::Matrix<double, 3, 3> R_gI = R.transpose() * gI * R;
+    Eigen::Matrix<double, 3, 3> I_inv = R_gI.inverse();
+
+    // A and B matrices for a time step of duration h
+    A_p.block(0, 6, 6, 6) = h * Eigen::Matrix<double, 6, 6>::Identity();
+    Eigen::Matrix<double, 3, 4> l_arms = footholds_p - (x_p.block(0, 0, 3, 1) + offset_CoM).replicate<1, 4>();
+    for (int i = 0; i < 4; i++) {
+      B_p.block(6, 3 * i, 3, 3) = (h / mass) * Eigen::Matrix<double, 3, 3>::Identity();
+      B_p.block(9, 3 * i, 3, 3) = h * (I_inv * getSkew(l_arms.col(i)));
+    }
+
+    // One step of the dynamics, forces are held after the end of the horizon
+    x_p = A_p * x_p + B_p * f_in.col(std::min(j, (int)f_in.cols() - 1));
+    x_p(8, 0) += -9.81 * h;
+
+    duration -= h;
+    j++;
+  }
+
+  return x_p;
+}
+
 /*
 Returns the skew matrix of a 3 by 1 column vector
 */
@@ -783,4 +1333,14 @@ Eigen::MatrixXd MPC::get_Sgait() {
   Eigen::MatrixXd tmp;
   tmp = S_gait.cast<double>();
   return tmp;
-}
\ No newline at end of file
+}
+
+/*
+Return the duration of the creation/update of the matrices and the duration of the solver
+(setup included for the first iteration) for the latest iteration [s]
+*/
+Eigen::MatrixXd MPC::get_durations() {
+  Eigen::MatrixXd tmp = Eigen::MatrixXd::Zero(2, 1);
+  tmp << duration_matrices, duration_solver;
+  return tmp;
+}
@@ -14,6 +14,13 @@ Params::Params()
     , N_SIMULATION(0)
     , enable_pyb_GUI(false)
     , enable_multiprocessing(false)
+    , predict_mpc_state(false)
+    , enable_realtime(false)
+    , realtime_cpu_loop(2)
+    , realtime_cpu_mpc(3)
+    , realtime_priority(0)
+    , realtime_lock_memory(false)
+    , enable_load_shedding(false)
     , perfect_estimator(false)
 
     , q_init(12, 0.0) // Fill with zeros, will be filled with values later
@@ -22,6 +29,7 @@ Params::Params()
     , dt_mpc(0.0)
     , T_gait(0.0)
     , T_mpc(0.0)
+    , mpc_grid()
     , type_MPC(0)
     , kf_enabled(false)
     
@@ -33,6 +41,12 @@ Params::Params()
     , osqp_w_states(12, 0.0) // Fill with zeros, will be filled with values later
     , osqp_w_forces(3, 0.0) // Fill with zeros, will be filled with values later
     , osqp_Nz_lim(0.0)
+    , osqp_condensed(false)
+    , osqp_warm_start(false)
+    , osqp_time_budget(0.0)
+    , osqp_timeout_fallback(0)
+    , crocoddyl_nthreads(1)
+    , crocoddyl_time_budget(0.0)
 
     , Kp_flyingfeet(0.0)
     , Kd_flyingfeet(0.0)
@@ -99,6 +113,9 @@ void Params::initialize(const std::string& file_path)
     assert_yaml_parsing(robot_node, "robot", "T_mpc");
     T_mpc = robot_node["T_mpc"].as<double>();
 
+    assert_yaml_parsing(robot_node, "robot", "mpc_grid");
+    mpc_grid = robot_node["mpc_grid"].as<std::vector<double> >();
+
     assert_yaml_parsing(robot_node, "robot", "N_SIMULATION");
     N_SIMULATION = robot_node["N_SIMULATION"].as<int>();
 
@@ -120,6 +137,27 @@ void Params::initialize(const std::string& file_path)
     assert_yaml_parsing(robot_node, "robot", "enable_multiprocessing");
     enable_multiprocessing = robot_node["enable_multiprocessing"].as<bool>();
 
+    assert_yaml_parsing(robot_node, "robot", "predict_mpc_state");
+    predict_mpc_state = robot_node["predict_mpc_state"].as<bool>();
+
+    assert_yaml_parsing(robot_node, "robot", "enable_realtime");
+    enable_realtime = robot_node["enable_realtime"].as<bool>();
+
+    assert_yaml_parsing(robot_node, "robot", "realtime_cpu_loop");
+    realtime_cpu_loop = robot_node["realtime_cpu_loop"].as<int>();
+
+    assert_yaml_parsing(robot_node, "robot", "realtime_cpu_mpc");
+    realtime_cpu_mpc = robot_node["realtime_cpu_mpc"].as<int>();
+
+    assert_yaml_parsing(robot_node, "robot", "realtime_priority");
+    realtime_priority = robot_node["realtime_priority"].as<int>();
+
+    assert_yaml_parsing(robot_node, "robot", "realtime_lock_memory");
+    realtime_lock_memory = robot_node["realtime_lock_memory"].as<bool>();
+
+    assert_yaml_parsing(robot_node, "robot", "enable_load_shedding");
+    enable_load_shedding = robot_node["enable_load_shedding"].as<bool>();
+
     assert_yaml_parsing(robot_node, "robot", "perfect_estimator");
     perfect_estimator = robot_node["perfect_estimator"].as<bool>();
 
@@ -141,6 +179,24 @@ void Params::initialize(const std::string& file_path)
     assert_yaml_parsing(robot_node, "robot", "osqp_Nz_lim");
     osqp_Nz_lim = robot_node["osqp_Nz_lim"].as<double>();
 
+    assert_yaml_parsing(robot_node, "robot", "osqp_condensed");
+    osqp_condensed = robot_node["osqp_condensed"].as<bool>();
+
+    assert_yaml_parsing(robot_node, "robot", "osqp_warm_start");
+    osqp_warm_start = robot_node["osqp_warm_start"].as<bool>();
+
+    assert_yaml_parsing(robot_node, "robot", "osqp_time_budget");
+    osqp_time_budget = robot_node["osqp_time_budget"].as<double>();
+
+    assert_yaml_parsing(robot_node, "robot", "osqp_timeout_fallback");
+    osqp_timeout_fallback = robot_node["osqp_timeout_fallback"].as<int>();
+
+    assert_yaml_parsing(robot_node, "robot", "crocoddyl_nthreads");
+    crocoddyl_nthreads = robot_node["crocoddyl_nthreads"].as<int>();
+
+    assert_yaml_parsing(robot_node, "robot", "crocoddyl_time_budget");
+    crocoddyl_time_budget = robot_node["crocoddyl_time_budget"].as<double>();
+
     assert_yaml_parsing(robot_node, "robot", "Kp_flyingfeet");
     Kp_flyingfeet = robot_node["Kp_flyingfeet"].as<double>();
 
@@ -160,3 +216,28 @@ void Params::initialize(const std::string& file_path)
     Fz_min = robot_node["Fz_min"].as<double>();
 
 }
+
+VectorN Params::getMpcGrid() const
+{
+    int n_steps = (int)std::lround(T_mpc / dt_mpc);
+    if (mpc_grid.empty())
+    {
+        return VectorN::Constant(n_steps, dt_mpc);
+    }
+
+    // Each node lasts a whole number of time steps of the gait, and the nodes cover the prediction horizon
+    VectorN grid = VectorN::Map(mpc_grid.data(), mpc_grid.size());
+    int n_total = 0;
+    for (int i = 0; i < grid.size(); i++)
+    {
+        int n = (int)std::lround(grid(i) / dt_mpc);
+        if (n < 1 || std::abs(grid(i) - n * dt_mpc) > 1e-9)
+            throw std::invalid_argument("Durations of the nodes of mpc_grid have to be multiples of dt_mpc.");
+        grid(i) = n * dt_mpc;
+        n_total += n;
+    }
+    if (n_total != n_steps)
+        throw std::invalid_argument("Durations of the nodes of mpc_grid have to add up to T_mpc.");
+
+    return grid;
+}
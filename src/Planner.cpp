@@ -0,0 +1,40 @@
+#include "qrw/Planner.hpp"
+
+Planner::Planner(Params& params)
+    : k_mpc_((int)std::round(params.dt_mpc / params.dt_wbc))
+    , gait_()
+    , footstepPlanner_()
+    , statePlanner_()
+    , footTrajectoryGenerator_()
+    , targetFootstep_(MatrixN::Zero(3, 4))
+{
+    statePlanner_.initialize(params);
+    gait_.initialize(params);
+    footstepPlanner_.initialize(params, gait_);
+    footTrajectoryGenerator_.initialize(params, gait_);
+}
+
+void Planner::runPlanner(int k, VectorN const& q, Vector6 const& b_v, Vector6 const& b_vref, int joystickCode,
+                         bool updateFeet)
+{
+    // Update gait
+    gait_.updateGait(k, k_mpc_, q, joystickCode);
+
+    // Compute target footstep based on current and reference velocities
+    targetFootstep_ = footstepPlanner_.updateFootsteps(k % k_mpc_ == 0 && k != 0, k_mpc_ - k % k_mpc_, q, b_v, b_vref);
+
+    // Compute the reference trajectory of the base
+    statePlanner_.computeReferenceStates(q, b_v, b_vref, 0.0);
+
+    // Update pos, vel and acc references for feet
+    if (updateFeet)
+    {
+        footTrajectoryGenerator_.update(k, targetFootstep_);
+    }
+}
+
+void Planner::updateFootTrajectories(int k, MatrixN const& targetFootstep)
+{
+    targetFootstep_ = targetFootstep;
+    footTrajectoryGenerator_.update(k, targetFootstep_);
+}
@@ -21,7 +21,7 @@ QPWBC::QPWBC() {
   }
 
   // Set OSQP settings to default
-  osqp_set_default_settings(settings);
+  osqp_set_default_settings(settings.get());
 
 }
 
@@ -136,7 +136,7 @@ int QPWBC::create_ML() {
   acc = st_to_cc_values(nst, r_ML, c_ML, v_ML, ncc, n, icc, ccc);
 
   // Assign values to the csc object
-  ML = (csc *)c_malloc(sizeof(csc));
+  ML.reset((csc *)c_malloc(sizeof(csc)));
   ML->m = 20;
   ML->n = 12;
   ML->nz = -1;
@@ -196,7 +196,7 @@ int QPWBC::create_weight_matrices() {
   acc = st_to_cc_values(nst, r_P, c_P, v_P, ncc, n, icc, ccc);
 
   // Assign values to the csc object
-  P = (csc *)c_malloc(sizeof(csc));
+  P.reset((csc *)c_malloc(sizeof(csc)));
   P->m = 12;
   P->n = 12;
   P->nz = -1;
@@ -225,11 +225,11 @@ int QPWBC::call_solver() {
   // Setup the solver (first iteration) then just update it
   if (not initialized)  // Setup the solver with the matrices
   {
-    data = (OSQPData *)c_malloc(sizeof(OSQPData));
+    data.reset((OSQPData *)c_malloc(sizeof(OSQPData)));
     data->n = 12;            // number of variables
     data->m = 20;            // number of constraints
-    data->P = P;             // the upper triangular part of the quadratic cost matrix P in csc format (size n x n)
-    data->A = ML;            // linear constraints matrix A in csc format (size m x n)
+    data->P = P.get();       // the upper triangular part of the quadratic cost matrix P in csc format (size n x n)
+    data->A = ML.get();      // linear constraints matrix A in csc format (size m x n)
     data->q = Q;         // dense array for linear part of cost function (size n)
     data->l = v_NK_low;  // dense array for lower bound (size m)
     data->u = v_NK_up;   // dense array for upper bound (size m)
@@ -254,26 +254,29 @@ int QPWBC::call_solver() {
     settings->adaptive_rho_interval = (c_int)200;
     settings->adaptive_rho_tolerance = (float)5.0;
     // settings->adaptive_rho_fraction = (float)0.7;
-    settings->verbose = true;
-    osqp_setup(&workspce, data, settings);
+    settings->verbose = false;
+    OSQPWorkspace *work = OSQP_NULL;
+    osqp_setup(&work, data.get(), settings.get());
+    workspce.reset(work);
 
     initialized = true;
   } else  // Code to update the QP problem without creating it again
   {
     // Update P matrix of the OSQP solver
-    osqp_update_P(workspce, &P->x[0], OSQP_NULL, 0);
+    osqp_update_P(workspce.get(), &P->x[0], OSQP_NULL, 0);
 
     // Update Q matrix of the OSQP solver
-    osqp_update_lin_cost(workspce, &Q[0]);
+    osqp_update_lin_cost(workspce.get(), &Q[0]);
 
     // Update upper bound of the OSQP solver
-    osqp_update_upper_bound(workspce, &v_NK_up[0]);
-    osqp_update_lower_bound(workspce, &v_NK_low[0]);
+    osqp_update_upper_bound(workspce.get(), &v_NK_up[0]);
+    osqp_update_lower_bound(workspce.get(), &v_NK_low[0]);
 
   }
 
   // Run the solver to solve the QP problem
-  osqp_solve(workspce);
+  osqp_solve(workspce.get());
+  stats.fill(workspce->info);
 
   // solution in workspce->solution->x
 
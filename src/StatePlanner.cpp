@@ -13,9 +13,18 @@ void StatePlanner::initialize(Params& params)
 {
     dt_ = params.dt_mpc;
     h_ref_ = params.h_ref;
-    n_steps_ = (int)std::lround(params.T_mpc / dt_);
+
+    // Reference states are computed at the end of each node of the prediction horizon
+    VectorN grid = params.getMpcGrid();
+    n_steps_ = (int)grid.size();
     referenceStates_ = MatrixN::Zero(12, 1 + n_steps_);
-    dt_vector_ = VectorN::LinSpaced(n_steps_, dt_, params.T_mpc);
+    dt_vector_ = VectorN::Zero(n_steps_);
+    double t = 0.0;
+    for (int i = 0; i < n_steps_; i++)
+    {
+        t += grid(i);
+        dt_vector_(i) = t;
+    }
 }
 
 void StatePlanner::computeReferenceStates(VectorN const& q, Vector6 const& v, Vector6 const& vref, double z_average)
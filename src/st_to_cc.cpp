@@ -1192,11 +1192,15 @@ void sort_heap_external ( int n, int *indx, int *i, int *j, int isgn )
     otherwise set ISGN positive.
 */
 {
-  static int i_save = 0;
-  static int j_save = 0;
-  static int k = 0;
-  static int k1 = 0;
-  static int n1 = 0;
+/*
+  The state of the sorter is kept between calls, one per thread so that
+  several solvers can be set up at the same time.
+*/
+  static thread_local int i_save = 0;
+  static thread_local int j_save = 0;
+  static thread_local int k = 0;
+  static thread_local int k1 = 0;
+  static thread_local int n1 = 0;
 /*
   INDX = 0: This is the first call.
 */
@@ -0,0 +1,31 @@
+"""Inputs shared by the tests of the OSQP MPC: a trot of Solo12 moving forward"""
+
+import numpy as np
+
+# Mass and composite inertia of Solo12 in its default configuration
+MASS = 2.50000279
+INERTIA = [3.09249e-2, -8.00101e-7, 1.865287e-5, -8.00101e-7, 5.106100e-2, 1.245813e-4,
+           1.865287e-5, 1.245813e-4, 6.939757e-2]
+FOOTHOLDS = np.array([[0.195, 0.195, -0.195, -0.195], [0.147, -0.147, 0.147, -0.147], [0.0, 0.0, 0.0, 0.0]])
+
+
+def trot_inputs(params, n_steps, k):
+    """Return the reference trajectory and the footsteps of a trot moving forward at MPC iteration k"""
+
+    h = 0.22
+    vx = 0.3
+    dt = params.dt_mpc
+    xref = np.zeros((12, n_steps + 1))
+    xref[0, :] = vx * dt * (k + np.arange(n_steps + 1))
+    xref[2, :] = h
+    xref[6, :] = vx
+    xref[:, 0] += 0.002 * np.sin(0.7 * k)  # The initial state moves around the reference
+
+    half_period = int(round(0.5 * params.T_gait / dt))
+    fsteps = np.zeros((params.N_gait, 12))
+    for i in range(n_steps):
+        phase = ((k + i) // half_period) % 2
+        for foot in range(4):
+            if (foot == 0 or foot == 3) == (phase == 0):
+                fsteps[i, (3 * foot):(3 * foot + 3)] = FOOTHOLDS[:, foot] + np.array([xref[0, i], 0.0, 0.0])
+    return xref, fsteps
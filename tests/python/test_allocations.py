@@ -0,0 +1,165 @@
+import contextlib
+import dis
+import os
+import sys
+import tracemalloc
+import unittest
+
+import numpy as np
+import pinocchio as pin
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "scripts"))
+
+import libquadruped_reactive_walking as lqrw  # noqa: E402
+from Controller import Controller, dummyDevice  # noqa: E402
+
+
+# Only look at the data buffers of NumPy arrays, not at Python objects such as views or floats
+NUMPY_DOMAIN = [tracemalloc.DomainFilter(True, np.lib.tracemalloc_domain)]
+
+# Classes of Pinocchio whose properties and methods return copies of their data
+PINOCCHIO_CLASSES = [pin.SE3, pin.Motion, pin.Force, pin.Quaternion]
+
+
+def data_pointer(a):
+    return a.__array_interface__["data"][0]
+
+
+def call_pinocchio(function, *args, **kwargs):
+    return function(*args, **kwargs)
+
+
+# Only the buffers allocated by the bindings of Pinocchio are attributed to the frame of call_pinocchio
+PINOCCHIO_SITES = {(call_pinocchio.__code__.co_filename, line)
+                   for _, line in dis.findlinestarts(call_pinocchio.__code__)}
+
+
+@contextlib.contextmanager
+def pinocchio_frames():
+    """Route the calls to the functions of Pinocchio and to the properties and methods of its objects through
+    call_pinocchio, so that the copies made by the bindings can be told apart from the temporaries of the
+    statements that use them"""
+
+    patched = []
+
+    def patch(owner, name, value):
+        original = vars(owner)[name]
+        try:
+            setattr(owner, name, value)
+        except (AttributeError, TypeError):  # Read-only type
+            return
+        patched.append((owner, name, original))
+
+    try:
+        for name, value in list(vars(pin).items()):
+            if callable(value) and not isinstance(value, type) and not name.startswith("_"):
+                patch(pin, name, lambda *args, _f=value, **kwargs: call_pinocchio(_f, *args, **kwargs))
+        for cls in PINOCCHIO_CLASSES:
+            for name, value in list(vars(cls).items()):
+                if isinstance(value, property) and value.fget is not None:
+                    patch(cls, name, property(lambda self, _f=value.fget: call_pinocchio(_f, self), value.fset))
+                elif isinstance(value, staticmethod):
+                    patch(cls, name, staticmethod(lambda *args, _f=value.__func__, **kwargs:
+                                                  call_pinocchio(_f, *args, **kwargs)))
+                elif callable(value) and not name.startswith("_") and not isinstance(value, classmethod):
+                    patch(cls, name, lambda *args, _f=value, **kwargs: call_pinocchio(_f, *args, **kwargs))
+        yield
+    finally:
+        for owner, name, original in reversed(patched):
+            setattr(owner, name, original)
+
+
+def numpy_allocations(func, *args):
+    """Call func(*args) and return the sites (file, line, size) of the NumPy data buffers it allocates, apart from
+    the copies returned by Pinocchio. The traced buffers are inspected after each bytecode instruction so that
+    temporaries released before the end of the call are found as well as the buffers that are kept
+    """
+
+    sites = set()
+    last = [0]
+
+    def collect():
+        for trace in tracemalloc.take_snapshot().filter_traces(NUMPY_DOMAIN).traces:
+            frame = trace.traceback[0]
+            sites.add((frame.filename, frame.lineno, trace.size))
+
+    def tracer(frame, event, arg):
+        frame.f_trace_opcodes = True
+        if tracemalloc.get_traced_memory()[0] != last[0]:  # Nothing to look for if no memory has been allocated
+            collect()
+            last[0] = tracemalloc.get_traced_memory()[0]
+        return tracer
+
+    with pinocchio_frames():
+        tracemalloc.start()
+        sys.settrace(tracer)
+        try:
+            func(*args)
+        finally:
+            sys.settrace(None)
+            collect()
+            tracemalloc.stop()
+
+    return {site for site in sites if site[:2] not in PINOCCHIO_SITES}
+
+
+class TestAllocations(unittest.TestCase):
+    """Check that the steady-state path of the control loop works in preallocated buffers"""
+
+    @classmethod
+    def setUpClass(cls):
+        params = lqrw.Params()
+        params.enable_pyb_GUI = False
+        params.enable_multiprocessing = False
+        cls.q_init = np.array(params.q_init.tolist())
+        cls.controller = Controller(params, cls.q_init, 0.0)  # Also runs one iteration
+
+    def workspace(self):
+        c = self.controller
+        return [c.q_wbc, c.b_v, c.x_f_wbc, c.oRh, c.oTh, c.feet_p_cmd, c.feet_v_cmd, c.feet_a_cmd,
+                c.result.P, c.result.D, c.result.q_des, c.result.v_des, c.result.tau_ff,
+                c.myController.ddq_cmd, c.myController.ddq_with_delta, c.myController.Jc, c.myController.tau_ff,
+                c.myController.invKin.q_cmd, c.myController.invKin.contacts]
+
+    def test_workspace_reused(self):
+        c = self.controller
+        buffers = self.workspace()
+        pointers = [data_pointer(a) for a in buffers]
+        feet = np.random.random((3, 4))
+        for i in range(10):
+            oRh, oTh = c.updateState()
+            c.update_feet_cmd(oRh, oTh, feet, feet, feet)
+            c.security_check()
+        for a, b, p in zip(buffers, self.workspace(), pointers):
+            self.assertIs(a, b)
+            self.assertEqual(p, data_pointer(b))
+
+    def test_no_numpy_allocation(self):
+        c = self.controller
+
+        def ticks(n):
+            for i in range(n):
+                c.compute(device)
+
+        # Same device as the one of the first iteration, run by the constructor of the controller
+        device = dummyDevice()
+        device.q_mes = self.q_init
+        device.v_mes = np.zeros(12)
+        device.baseLinearAcceleration = np.zeros(3)
+        device.baseAngularVelocity = np.zeros(3)
+        device.baseOrientation = np.array([0.0, 0.0, 0.0, 1.0])
+        device.dummyPos = np.array([0.0, 0.0, self.q_init[2]])
+        device.b_baseVel = np.zeros(3)
+
+        # Warm up, then measure the steady state over two periods of the gait, so that every phase of the gait,
+        # several solves of the MPC and any periodic work of the loop (such as the profiler) happen during the measure
+        ticks(2 * c.k_mpc)
+        n_ticks = 2 * int(round(c.T_gait / c.dt_wbc)) + 1
+        sites = numpy_allocations(ticks, n_ticks)
+
+        self.assertFalse(c.myController.error)  # The whole body control has run
+        self.assertEqual(sorted(sites), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
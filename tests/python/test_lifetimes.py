@@ -0,0 +1,74 @@
+import resource
+import unittest
+
+import numpy as np
+
+import libquadruped_reactive_walking as lqrw
+from mpc_fixtures import MASS, INERTIA, trot_inputs
+
+N_INSTANCES = 10000
+N_WARMUP = 500  # Instances created before the reference memory usage is measured
+MAX_GROWTH = 20 * 1024 * 1024  # Tolerated growth of the resident memory after the warm-up [bytes]
+
+
+def resident_memory():
+    """Return the resident memory of the process [bytes]"""
+
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * resource.getpagesize()
+    except IOError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # Peak usage, in kilobytes on Linux
+
+
+class TestLifetimes(unittest.TestCase):
+    """Check that solvers release the memory of OSQP when they are destroyed, by creating and destroying
+    many instances in the same process"""
+
+    def soak(self, create_and_run):
+        for i in range(N_WARMUP):
+            create_and_run(i)
+        reference = resident_memory()
+        for i in range(N_WARMUP, N_INSTANCES):
+            create_and_run(i)
+        growth = resident_memory() - reference
+        self.assertLess(growth, MAX_GROWTH, "Resident memory grew by {:.1f} MB over {} instances".format(
+            growth / 1024**2, N_INSTANCES - N_WARMUP))
+
+    def test_mpc(self):
+        params = lqrw.Params()
+        params.mass = MASS
+        params.I_mat = INERTIA
+        params.osqp_time_budget = -1.0
+        n_steps = int(round(params.T_mpc / params.dt_mpc))
+        xref, fsteps = trot_inputs(params, n_steps, 0)
+
+        def create_and_run(i):
+            params.osqp_condensed = (i % 2 == 1)  # Both formulations allocate their own matrices
+            mpc = lqrw.MPC(params)
+            mpc.run(0, xref, fsteps)  # The solver is set up during the first iteration
+            mpc.run(1, xref, fsteps)
+
+        self.soak(create_and_run)
+
+    def test_qpwbc(self):
+        params = lqrw.Params()
+        M = np.eye(18)
+        Jc = np.zeros((12, 18))
+        Jc[:, 6:] = np.eye(12)
+        Jc[:, :3] = np.tile(np.eye(3), (4, 1))
+        f_cmd = np.tile([0.0, 0.0, 9.81 * MASS / 4], 4).reshape((12, 1))
+        RNEA = np.zeros((6, 1))
+        k_contact = np.ones((1, 4))
+
+        def create_and_run(i):
+            wbc = lqrw.QPWBC()
+            wbc.initialize(params)
+            wbc.run(M, Jc, f_cmd, RNEA, k_contact)  # The solver is set up during the first call
+            wbc.run(M, Jc, f_cmd, RNEA, k_contact)
+
+        self.soak(create_and_run)
+
+
+if __name__ == '__main__':
+    unittest.main()
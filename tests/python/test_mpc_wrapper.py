@@ -0,0 +1,88 @@
+import os
+import sys
+import time
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "scripts"))
+
+import libquadruped_reactive_walking as lqrw  # noqa: E402
+from MPC_Wrapper import MPC_Wrapper  # noqa: E402
+from mpc_fixtures import MASS, INERTIA, trot_inputs  # noqa: E402
+
+N_SOLVES = 12
+TIMEOUT = 5.0  # Maximum wait for a result of the asynchronous MPC [s]
+
+
+class TestMPCWrapper(unittest.TestCase):
+    """Check that the synchronous OSQP MPC and the asynchronous one (background thread) are warm started the same
+    way, and that the previous solution reused after a timeout is shifted by one node per MPC iteration"""
+
+    def make_wrapper(self, multiprocessing, time_budget=-1.0, timeout_fallback=0):
+        params = lqrw.Params()
+        params.mass = MASS
+        params.I_mat = INERTIA
+        params.type_MPC = 0
+        params.enable_multiprocessing = multiprocessing
+        params.predict_mpc_state = False
+        params.enable_realtime = False
+        params.osqp_warm_start = True
+        params.osqp_time_budget = time_budget  # No limit by default, results must not depend on the load of the machine
+        params.osqp_timeout_fallback = timeout_fallback
+        q_init = np.zeros((19, 1))
+        q_init[2, 0] = 0.22
+        q_init[6, 0] = 1.0
+        wrapper = MPC_Wrapper(params, q_init)
+        wrapper.get_latest_result()  # Default forces of the first iteration of the control loop
+        return params, wrapper
+
+    def run_solves(self, multiprocessing):
+        """Return the results of N_SOLVES consecutive iterations of the MPC, called every k_mpc loop iterations"""
+
+        params, wrapper = self.make_wrapper(multiprocessing)
+        results = []
+        try:
+            for i in range(N_SOLVES):
+                k = i * wrapper.k_mpc
+                xref, fsteps = trot_inputs(params, wrapper.n_steps, i)
+                gait = (fsteps[:, 0::3] != 0.0).astype(float)
+                wrapper.solve(k, xref, fsteps, gait, np.zeros((3, 4)))
+                if multiprocessing:
+                    t_end = time.monotonic() + TIMEOUT
+                    while not wrapper.async_mpc.result_ready():
+                        self.assertLess(time.monotonic(), t_end, "No result from the asynchronous MPC")
+                        time.sleep(1e-4)
+                results.append(wrapper.get_latest_result().copy())
+                self.assertEqual(wrapper.k_result, k)
+        finally:
+            if multiprocessing:
+                wrapper.stop_parallel_loop()
+        return results
+
+    def test_same_warm_start(self):
+        synchronous = self.run_solves(False)
+        asynchronous = self.run_solves(True)
+        for i, (res_sync, res_async) in enumerate(zip(synchronous, asynchronous)):
+            np.testing.assert_allclose(res_sync, res_async, rtol=0.0, atol=1e-9,
+                                       err_msg="Results differ at MPC iteration {}".format(i))
+
+    def test_timeout_fallback(self):
+        # The first solve is not limited, the second one is stopped after a single iteration of OSQP
+        params, wrapper = self.make_wrapper(False, time_budget=1e-9, timeout_fallback=1)
+        results = []
+        for i in range(2):
+            xref, fsteps = trot_inputs(params, wrapper.n_steps, i)
+            xref[2, :] += 0.02 * i  # Jump of the reference height so that the second problem is not solved yet
+            gait = (fsteps[:, 0::3] != 0.0).astype(float)
+            wrapper.solve(i * wrapper.k_mpc, xref, fsteps, gait, np.zeros((3, 4)))
+            results.append(wrapper.get_latest_result().copy())
+        self.assertEqual(wrapper.mpc.get_timeouts(), 1)
+
+        # The previous solution is shifted by one node, the last node being repeated
+        np.testing.assert_array_equal(results[1][:, :-1], results[0][:, 1:])
+        np.testing.assert_array_equal(results[1][:, -1], results[0][:, -1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "scripts"))
+
+from utils_kinematics import (skew, cross, yaw_rotation, rpy_to_rotation, rpy_to_quaternion,  # noqa: E402
+                              quaternion_to_rpy)
+
+
+def quaternion_to_rotation(q):
+    """Rotation matrix of a quaternion [x, y, z, w]"""
+
+    x, y, z, w = q
+    return np.array([[1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)],
+                     [2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)],
+                     [2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)]])
+
+
+class TestUtilsKinematics(unittest.TestCase):
+    """Check the vectorised kinematics helpers against NumPy and their reuse of the out arguments"""
+
+    RPY = np.array([[0.1, -0.2, 0.3, 0.0], [0.2, 0.1, -0.4, 0.0], [0.3, 2.0, -3.0, 0.0]])
+
+    def test_skew(self):
+        v = np.array([0.1, -0.3, 0.7])
+        x = np.array([1.0, 2.0, -0.5])
+        out = np.full((3, 3), np.nan)
+        self.assertIs(skew(v.reshape((3, 1)), out), out)
+        np.testing.assert_allclose(out @ x, np.cross(v, x))
+        np.testing.assert_allclose(skew(v), out)
+
+    def test_cross(self):
+        left = np.array([[0.1], [-0.3], [0.7]])
+        right = np.arange(12.0).reshape((3, 4))
+        out = np.zeros((3, 4))
+        work = np.zeros((3, 3))
+        self.assertIs(cross(left, right, out, work), out)
+        np.testing.assert_allclose(out, np.cross(left[:, 0], right.T).T)
+        np.testing.assert_allclose(work, skew(left))
+
+        # Single vectors, result in a new array
+        np.testing.assert_allclose(cross(left[:, 0], right[:, 1]), np.cross(left[:, 0], right[:, 1]))
+
+    def test_rotations(self):
+        for roll, pitch, yaw in self.RPY.T:
+            R = rpy_to_rotation(roll, pitch, yaw)
+            np.testing.assert_allclose(R @ R.T, np.eye(3), atol=1e-12)
+            self.assertAlmostEqual(np.linalg.det(R), 1.0)
+
+            # R = Rz(yaw) Ry(pitch) Rx(roll)
+            Rx = np.array([[1.0, 0.0, 0.0], [0.0, np.cos(roll), -np.sin(roll)], [0.0, np.sin(roll), np.cos(roll)]])
+            Ry = np.array([[np.cos(pitch), 0.0, np.sin(pitch)], [0.0, 1.0, 0.0], [-np.sin(pitch), 0.0, np.cos(pitch)]])
+            np.testing.assert_allclose(R, yaw_rotation(yaw) @ Ry @ Rx, atol=1e-12)
+
+            out = np.full((3, 3), np.nan)
+            self.assertIs(rpy_to_rotation(roll, pitch, yaw, out), out)
+            np.testing.assert_array_equal(out, R)
+
+        # Only the upper left block is written by yaw_rotation
+        out = np.full((3, 3), 7.0)
+        self.assertIs(yaw_rotation(0.5, out), out)
+        np.testing.assert_allclose(out[:2, :2], rpy_to_rotation(0.0, 0.0, 0.5)[:2, :2])
+        np.testing.assert_array_equal(out[2, :], 7.0)
+        np.testing.assert_array_equal(out[:2, 2], 7.0)
+
+    def test_quaternions(self):
+        quat = rpy_to_quaternion(self.RPY)
+        np.testing.assert_allclose(np.linalg.norm(quat, axis=0), 1.0)
+        np.testing.assert_allclose(quaternion_to_rpy(quat), self.RPY, atol=1e-12)
+        for i in range(self.RPY.shape[1]):
+            np.testing.assert_allclose(quaternion_to_rotation(quat[:, i]), rpy_to_rotation(*self.RPY[:, i]),
+                                       atol=1e-12)
+
+            # Single orientations take a scalar path that gives the same result
+            np.testing.assert_allclose(rpy_to_quaternion(self.RPY[:, i]), quat[:, i], atol=1e-15)
+            np.testing.assert_allclose(quaternion_to_rpy(quat[:, i]), self.RPY[:, i], atol=1e-12)
+
+        # Results are written in the given arrays
+        out_quat = np.zeros((4, self.RPY.shape[1]))
+        out_rpy = np.zeros(self.RPY.shape)
+        self.assertIs(rpy_to_quaternion(self.RPY, out_quat), out_quat)
+        self.assertIs(quaternion_to_rpy(out_quat, out_rpy), out_rpy)
+        np.testing.assert_allclose(out_rpy, self.RPY, atol=1e-12)
+        out_quat = np.zeros(4)
+        out_rpy = np.zeros(3)
+        self.assertIs(rpy_to_quaternion(self.RPY[:, 0], out_quat), out_quat)
+        self.assertIs(quaternion_to_rpy(out_quat, out_rpy), out_rpy)
+
+
+if __name__ == '__main__':
+    unittest.main()